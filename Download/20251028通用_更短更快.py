@@ -1,26 +1,41 @@
 import os
 import re
 import io
+import sys
 import time
 import threading
 import queue
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
-import pandas as pd
 from PIL import Image
 import requests
+try:
+    import aiohttp
+except ImportError:
+    print("异步下载模式需要 aiohttp 库: pip install aiohttp")
+    aiohttp = None
 from pillow_heif import register_heif_opener
 register_heif_opener()
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import (
-    WebDriverException, TimeoutException, NoSuchElementException
-)
 import urllib3
 
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spider_common.status_journal import StatusJournal
+from spider_common.resume_index import ResumeIndex
+from spider_common.catalog import Catalog
+from spider_common.parquet_sink import read_records
+from spider_common.browser_pool import BrowserPool, wait_for_image, fetch_image_bytes
+from spider_common.concurrency import AdaptiveConcurrency, AsyncAdaptiveConcurrency
+from spider_common.http_client import RETRY_STATUS
+from spider_common.download import (
+    TEMP_SUFFIX, PartialFile, fetch_to_temp, check_content_type, remove_quietly, sniff_image_type,
+    HTTPStatusError, ContentTypeError, IncompleteDownload,
+)
+
 # 禁用 SSL 验证警告，这是解决证书问题后的最佳实践
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -28,11 +43,42 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 lock = threading.Lock()
 current = 0
 total = 0
-driver_pool = threading.local()  # 每线程独立driver
+# 截图回退：预热的浏览器池，每个截图线程借用一个 driver，打开 SCREENSHOT_MAX_PAGES 个页面后重建
+SCREENSHOT_WORKERS = 2
+SCREENSHOT_MAX_PAGES = 200
+# True: 先在浏览器内取回图片原始字节（保持原格式），失败再截图；False: 始终截图保存为 PNG
+CAPTURE_ORIGINAL_BYTES = True
+screenshot_pool = None  # 在 __main__ 中创建
 # 任务队列中需要额外携带 Title 信息
 screenshot_queue = queue.Queue()  # 请求失败任务队列
 # 全局变量：下载根路径 (在 __main__ 中设置)
 GLOBAL_DOWNLOAD_PATH = "" 
+# 状态记录由后台线程批量写入，各 TAG 的 CSV 字段保持不变
+STATUS_FIELDS = ["URL", "TAG", "Title", "ImageName", "Status", "Message", "SavedPath"]
+status_journal = None  # 在 __main__ 中创建
+RESUME_INDEX_NAME = "resume_index.sqlite3"  # 已成功下载 URL 的持久化索引，位于下载根目录
+CATALOG_NAME = "catalog.sqlite3"  # 采集记录 + 下载状态的 SQLite 目录，可按 TAG 查询失败的下载
+
+# ---------- 下载模式 ----------
+# "thread": ThreadPoolExecutor + requests（原模式）
+# "async" : asyncio + aiohttp，单线程事件循环承载数千个并发传输
+DOWNLOAD_MODE = "thread"
+# 保存策略：None 表示原样写入下载到的字节（只校验文件头，不解码）；
+# 设置为扩展名（如 ".png"）时才用 PIL 完整解码并转换为该格式
+CONVERT_TO_EXT = None
+THREAD_MAX_WORKERS = 64      # 线程数只是上限，每个 host 的实际并发由 download_concurrency 自适应调整
+ASYNC_MAX_IN_FLIGHT = 2000    # 同时在途的传输总数
+ASYNC_PER_HOST_LIMIT = 32     # 每个 host 的最大连接数
+# 每个 host 的初始并发，成功时逐步加到上限，遇到 429/503/超时/延迟突增时减半
+ADAPTIVE_INITIAL_PER_HOST = 4
+download_concurrency = None   # 在 __main__ 中按下载模式创建
+
+DOWNLOAD_HEADERS = {
+    # 伪装成 Chrome 浏览器
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                  "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+    'Referer': 'https://v2ph.com/'    # 模拟从原始网站发起请求
+}
 
 
 # ---------- 基础函数 (保持不变) ----------
@@ -53,67 +99,97 @@ def is_direct_file_download(url: str) -> bool:
     # 此函数仅用于辅助判断，现在下载主要依赖 Content-Type
     return url.lower().endswith((".svg"))
 
+PIL_EXTS = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif", ".tiff", ".tif", ".heic"]
+DIRECT_EXTS = [".svg"]
+# PIL 的 format 名称 -> 保存时使用的扩展名（其余格式直接用小写名称）
+PIL_FORMAT_EXTS = {"JPEG": ".jpg", "TIFF": ".tif", "HEIF": ".heic"}
+
 def is_downloadable(url: str) -> bool:
     """检查是否为可下载的格式 (PIL 兼容 或 直接保存文件)"""
     # 注意：此函数在新的 request_worker 中不再作为进入截图队列的判断标准
     return is_pil_compatible_image(url) or is_direct_file_download(url)
 
 
-# ---------- 下载函数 (关键优化：流式下载) ----------
-def try_download_with_requests(url: str, retries: int = 2) -> tuple[bytes | None, str]:
+# ---------- 下载函数 (关键优化：流式下载 + 断点续传) ----------
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+REJECT_CONTENT_TYPES = ('html', 'text/plain')
+# 未完成的下载保存在 <文件名>.downloading 中（TEMP_SUFFIX），下次运行时用 HTTP Range 续传
+
+
+def try_download_with_requests(url: str, tmp_path: str, retries: int = 2) -> tuple[bool, str, str | None]:
     """
     requests 流式下载函数，自动重试。
     - 解决了 SSL 证书验证失败问题 (verify=False)。
     - 解决了 HTTP 403 权限问题 (添加 User-Agent)。
-    - 解决了大文件内存占用问题 (stream=True + iter_content)。
-    返回 (内容, 失败消息)
+    - 内容按块直接写入临时文件 tmp_path，已有部分时用 Range 续传。
+    返回 (是否成功, 失败消息, 文件头识别出的类型)
     """
-    headers = {
-        # 伪装成 Chrome 浏览器
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                      "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
-                      'Referer': 'https://v2ph.com/'    # 模拟从原始网站发起请求
-    }
-    
-    for _ in range(retries):
-        resp = None 
+    try:
+        kind = fetch_to_temp(
+            url, tmp_path, headers=DOWNLOAD_HEADERS, timeout=(5, 10), verify=False,
+            retries=retries - 1, reject_content_types=REJECT_CONTENT_TYPES,
+            chunk_size=DOWNLOAD_CHUNK_SIZE, concurrency=download_concurrency,
+        )
+        return True, "OK", kind
+    except (HTTPStatusError, ContentTypeError) as e:
+        # 失败消息以 "HTTP Status Code" / "Content-Type" 开头，不转截图
+        return False, str(e), None
+    except requests.RequestException as e:
+        return False, f"Requests 异常或超时: {e}", None
+
+
+async def try_download_with_aiohttp(session, url: str, tmp_path: str, retries: int = 2,
+                                    retry_wait: float = 0.5) -> tuple[bool, str, str | None]:
+    """
+    aiohttp 版本的下载函数，返回值与 try_download_with_requests 一致：(是否成功, 失败消息, 文件类型)。
+    与 requests 版本共用 PartialFile，同样支持 Range 续传；429/5xx 与 fetch_to_temp 一样按 retry_wait 指数退避重试。
+    """
+    last_error = ""
+    timeout = aiohttp.ClientTimeout(sock_connect=5, sock_read=10)
+
+    for attempt in range(retries):
+        part = PartialFile(tmp_path)
         try:
-            # 启用流式模式 (stream=True) 并禁用 SSL 验证 (verify=False)
-            resp = requests.get(url, headers=headers, timeout=(5, 10), verify=False, stream=True)
-            
-            if resp.status_code != 200:
-                return None, f"HTTP Status Code {resp.status_code}"
-            
-            content_type = resp.headers.get('Content-Type', '').lower()
-            if 'html' in content_type or 'text/plain' in content_type:
-                return None, f"Content-Type: {content_type}"
-                
-            # 使用 iter_content 流式读取内容到内存
-            content = b''
-            for chunk in resp.iter_content(chunk_size=8192): 
-                if chunk:
-                    content += chunk
-            
-            return content, "OK"
-            
-        except requests.RequestException as e:
-            time.sleep(0.5)
+            async with download_concurrency.slot(url) as slot, \
+                    session.get(url, headers=part.request_headers(), timeout=timeout, ssl=False) as resp:
+                slot.feedback(resp.status)
+                if resp.status == 416 and part.offset:
+                    if part.is_complete():
+                        return True, "OK", part.finish()
+                    part.discard()
+                    continue
+                if resp.status not in (200, 206):
+                    raise HTTPStatusError(resp.status)
+                check_content_type(resp.headers, REJECT_CONTENT_TYPES)
+
+                # 64KB 的块写入页缓存耗时极短，直接在事件循环中写入
+                part.begin(resp.status, resp.headers)
+                try:
+                    async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        part.write(chunk)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    part.abort()
+                    raise
+                return True, "OK", part.finish()
+
+        except HTTPStatusError as e:
+            # 状态码已在 slot 内反馈给并发控制，退出 slot 释放名额后再退避
+            if e.status_code not in RETRY_STATUS or attempt + 1 >= retries:
+                return False, str(e), None
             last_error = str(e)
-            
-        finally:
-            # 确保在流模式下关闭连接
-            if resp:
-                resp.close()
-            
-    return None, f"Requests 异常或超时: {last_error}"
+            await asyncio.sleep(retry_wait * 2 ** attempt)
+        except ContentTypeError as e:
+            return False, str(e), None
+        except (aiohttp.ClientError, asyncio.TimeoutError, IncompleteDownload) as e:
+            await asyncio.sleep(0.5)
+            last_error = str(e) or type(e).__name__
 
+    return False, f"Requests 异常或超时: {last_error}", None
 
-# ---------- Selenium 驱动 (保持不变) ----------
-def get_selenium_driver() -> webdriver.Chrome:
-    """线程独立 driver"""
-    if hasattr(driver_pool, "driver") and driver_pool.driver:
-        return driver_pool.driver
 
+# ---------- Selenium 驱动 ----------
+def build_selenium_driver() -> webdriver.Chrome:
+    """创建一个 headless driver，由 screenshot_pool 管理复用"""
     # 请确保您的 ChromeDriver 路径是正确的
     chrome_driver_path = r"C:\Program Files\Google\chromedriver-win64\chromedriver.exe"
     opts = Options()
@@ -124,44 +200,51 @@ def get_selenium_driver() -> webdriver.Chrome:
     opts.add_argument("--disable-notifications")
     opts.add_argument("--window-size=1920,1080")
     opts.add_experimental_option('excludeSwitches', ['enable-logging'])
-    driver_pool.driver = webdriver.Chrome(service=Service(chrome_driver_path), options=opts)
-    driver_pool.driver.set_page_load_timeout(30)
-    return driver_pool.driver
+    driver = webdriver.Chrome(service=Service(chrome_driver_path), options=opts)
+    driver.set_page_load_timeout(30)
+    return driver
 
 
-# ---------- Selenium 截图函数 (保持不变) ----------
-def selenium_capture_image(url: str, save_path: str) -> bool:
-    """截图方式保存大图，等待加载完成"""
+# ---------- Selenium 截图函数 ----------
+def selenium_capture_image(url: str, save_path: str) -> tuple[str | None, str]:
+    """
+    浏览器方式保存大图，等待图片 load 事件后：
+    优先取回浏览器已下载的原始字节，按文件头确定扩展名；取不到时截图保存为 PNG。
+    返回 (实际保存路径, 说明)，失败时路径为 None。
+    """
+    name_root, _ = os.path.splitext(save_path)
     try:
-        driver = get_selenium_driver()
-        driver.get(url)
-
-        WebDriverWait(driver, 15).until(
-            EC.presence_of_element_located((By.TAG_NAME, "img"))
-        )
-        img = driver.find_element(By.TAG_NAME, "img")
-
-        for _ in range(10):
-            width = driver.execute_script("return arguments[0].naturalWidth", img)
-            if width > 300:
-                break
-            time.sleep(0.5)
-
-        driver.execute_script("arguments[0].scrollIntoView(true);", img)
-        time.sleep(0.5)
-
-        img_data = img.screenshot_as_png
-        Image.open(io.BytesIO(img_data)).save(save_path, "PNG")
-        return True
+        with screenshot_pool.driver() as driver:
+            driver.get(url)
+            size = wait_for_image(driver, timeout=15)
+            if not size or size[0] <= 300:
+                print(f"[截图失败] {url} -> 图片未加载或尺寸过小: {size}")
+                return None, "截图失败"
+
+            if CAPTURE_ORIGINAL_BYTES:
+                data = fetch_image_bytes(driver)
+                kind = sniff_image_type(data[:512]) if data else None
+                if kind:
+                    real_path = name_root + kind
+                    with open(real_path, "wb") as f:
+                        f.write(data)
+                    return real_path, "浏览器原图"
+
+            img = driver.find_element(By.TAG_NAME, "img")
+            driver.execute_script("arguments[0].scrollIntoView(true);", img)
+            img_data = img.screenshot_as_png
+        png_path = f"{name_root}.png"
+        Image.open(io.BytesIO(img_data)).save(png_path, "PNG")
+        return png_path, "截图成功"
     except Exception as e:
         print(f"[截图失败] {url} -> {e}")
-        return False
+        return None, "截图失败"
 
 
-# ---------- 状态记录 (保持不变) ----------
+# ---------- 状态记录 ----------
 def record_status(url, tag, name, title, status, msg, path=""):
     """
-    记录下载状态到 CSV 文件。
+    记录下载状态到 CSV 文件（交给 status_journal 后台批量写入，不阻塞下载线程）。
     """
     global current, GLOBAL_DOWNLOAD_PATH
     
@@ -172,103 +255,164 @@ def record_status(url, tag, name, title, status, msg, path=""):
     with lock:
         current += 1
         print(f"[{current}/{total}] {tag_cleaned} | {status} {url}")
-        pd.DataFrame([{
-            "URL": url,
-            "TAG": tag,
-            "Title": title,
-            "ImageName": name,
-            "Status": status,
-            "Message": msg,
-            "SavedPath": path if status == "✅成功" else ""
-        }]).to_csv(status_csv_path, mode='a', index=False,
-                   header=not os.path.exists(status_csv_path), encoding='utf-8-sig')
+        if current % 500 == 0 and download_concurrency:
+            print(f"[并发上限] {download_concurrency.limits()}")
+    status_journal.record(status_csv_path, {
+        "URL": url,
+        "TAG": tag,
+        "Title": title,
+        "ImageName": name,
+        "Status": status,
+        "Message": msg,
+        "SavedPath": path if status == "✅成功" else ""
+    })
 
 
 # ---------- Request 下载线程 (关键修复：始终尝试 requests) ----------
-def request_worker(args):
-    """主下载线程：负责 requests 直接下载，不再根据 URL 后缀将任务丢给截图队列"""
+def prepare_task(args):
+    """解析任务参数，返回 (url, tag, name, title, ext, full_path)，两种下载模式共用"""
     url, row, base_path, tag, title = args 
     
     raw_name = str(row.get('ImageName', 'image')).strip()
     name = sanitize_filename(raw_name)
     
-    pil_exts = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif", ".tiff", ".tif", ".heic"]
-    direct_exts = [".svg"]
-
     name_root, name_ext = os.path.splitext(name)
     ext = name_ext.lower()
     
     # 如果文件名本身没有有效扩展名，默认使用 .png
-    if ext not in pil_exts and ext not in direct_exts:
+    if ext not in PIL_EXTS and ext not in DIRECT_EXTS:
         ext = ".png"
     
     # 构造保存路径：使用规范化后的 TAG 作为文件夹名
     folder = os.path.join(base_path, sanitize_filename(tag))
     os.makedirs(folder, exist_ok=True)
     full_path = os.path.join(folder, f"{name_root}{ext}")
+    return url, tag, name, title, ext, full_path
+
+
+def verify_image_header(path: str) -> str | None:
+    """魔数无法识别时，用 PIL 只解析文件头并校验 (verify 不解码像素)，返回扩展名"""
+    try:
+        with Image.open(path) as im:
+            im.verify()
+            fmt = im.format or ""
+    except Exception:
+        return None
+    return PIL_FORMAT_EXTS.get(fmt, f".{fmt.lower()}") if fmt else None
+
+
+def handle_download_result(url, tag, name, title, ext, full_path, ok, fail_msg, kind):
+    """处理已写入临时文件的下载结果，或决定是否转入截图队列，两种下载模式共用"""
+    tmp_path = full_path + TEMP_SUFFIX
+    if ok:
+        name_root, _ = os.path.splitext(full_path)
+
+        if ext in DIRECT_EXTS or kind in DIRECT_EXTS:
+            # SVG 等直接原子重命名为最终文件
+            os.replace(tmp_path, full_path)
+            record_status(url, tag, name, title, "✅成功", "直接下载", full_path)
+
+        elif CONVERT_TO_EXT:
+            # 显式要求格式转换时才完整解码并重新编码
+            save_path = f"{name_root}{CONVERT_TO_EXT}"
+            try:
+                with Image.open(tmp_path) as im:
+                    im.save(save_path)
+                record_status(url, tag, name, title, "✅成功", "PIL转换", save_path)
+            except Exception as pil_e:
+                print(f"[PIL处理失败] {url} -> {pil_e}")
+                # PIL 处理失败，转入截图队列（以防是某种特殊格式，虽然可能性小）
+                screenshot_queue.put((url, tag, name, title, full_path))
+            finally:
+                remove_quietly(tmp_path)
+
+        else:
+            # 原样保存：只校验文件头，字节不做任何改动（保留动图帧和元数据）
+            real_ext = kind or verify_image_header(tmp_path)
+            if real_ext:
+                # 扩展名以实际格式为准，避免 .jpg 文件里装着 webp 数据
+                save_path = f"{name_root}{real_ext}"
+                os.replace(tmp_path, save_path)
+                record_status(url, tag, name, title, "✅成功", "原样保存", save_path)
+            else:
+                print(f"[格式无法识别] {url}")
+                remove_quietly(tmp_path)
+                screenshot_queue.put((url, tag, name, title, full_path))
+    
+    else:
+        # 下载失败
+        if fail_msg.startswith("HTTP Status Code") or fail_msg.startswith("Content-Type"):
+            # 明确的 HTTP 协议错误，不转截图
+            record_status(url, tag, name, title, "❌失败", fail_msg)
+        else:
+            # 其他下载失败原因（如请求异常、超时），转入截图队列尝试
+            screenshot_queue.put((url, tag, name, title, full_path))
+
+
+def request_worker(args):
+    """主下载线程：负责 requests 直接下载，不再根据 URL 后缀将任务丢给截图队列"""
+    url, tag, name, title, ext, full_path = prepare_task(args)
     
     # ------------------------------------------------------------------------
     # 核心修复：强制执行 try_download_with_requests
     # ------------------------------------------------------------------------
     
     try:
-        content, fail_msg = try_download_with_requests(url)
-        
-        if content:
-            # 无论 URL 后缀如何，只要拿到了二进制内容，就尝试保存
-            if ext in direct_exts:
-                # SVG 等直接写入文件
-                with open(full_path, 'wb') as f:
-                    f.write(content)
-                record_status(url, tag, name, title, "✅成功", "直接下载", full_path)
-            
-            elif ext in pil_exts or True: # True确保了所有拿到 content 的都至少尝试 PIL
-                # 图片格式尝试用 PIL 处理
-                try:
-                    Image.open(io.BytesIO(content)).save(full_path)
-                    record_status(url, tag, name, title, "✅成功", "PIL保存", full_path)
-                except Exception as pil_e:
-                    print(f"[PIL处理失败] {url} -> {pil_e}")
-                    # PIL 处理失败，转入截图队列（以防是某种特殊格式，虽然可能性小）
-                    screenshot_queue.put((url, tag, name, title, full_path))
-        
-        else:
-            # requests 下载失败 (content is None)
-            if fail_msg.startswith("HTTP Status Code") or fail_msg.startswith("Content-Type"):
-                # 明确的 HTTP 协议错误，不转截图
-                record_status(url, tag, name, title, "❌失败", fail_msg)
-            else:
-                # 其他下载失败原因（如请求异常、超时），转入截图队列尝试
-                screenshot_queue.put((url, tag, name, title, full_path))
+        ok, fail_msg, kind = try_download_with_requests(url, full_path + TEMP_SUFFIX)
+        handle_download_result(url, tag, name, title, ext, full_path, ok, fail_msg, kind)
 
     except Exception as e:
         print(f"[requests异常] {url} -> {e}")
         record_status(url, tag, name, title, "❌失败", f"未知异常: {e}")
 
 
-# ---------- Selenium 截图消费者 (保持不变) ----------
+# ---------- asyncio 下载引擎 (DOWNLOAD_MODE = "async") ----------
+async def async_request_worker(session, args):
+    """协程版 request_worker：网络部分在事件循环中完成，保存/记录交给线程池，避免阻塞事件循环"""
+    url, tag, name, title, ext, full_path = await asyncio.to_thread(prepare_task, args)
+    try:
+        ok, fail_msg, kind = await try_download_with_aiohttp(session, url, full_path + TEMP_SUFFIX)
+        await asyncio.to_thread(
+            handle_download_result, url, tag, name, title, ext, full_path, ok, fail_msg, kind
+        )
+    except Exception as e:
+        print(f"[aiohttp异常] {url} -> {e}")
+        await asyncio.to_thread(record_status, url, tag, name, title, "❌失败", f"未知异常: {e}")
+
+
+async def run_async_downloads(tasks):
+    """
+    固定数量的消费协程从任务迭代器中取任务，在途传输数恒定为 ASYNC_MAX_IN_FLIGHT，
+    不会为几十万个任务一次性创建协程；每个 host 的连接数由 TCPConnector 限制。
+    """
+    connector = aiohttp.TCPConnector(
+        limit=ASYNC_MAX_IN_FLIGHT,
+        limit_per_host=ASYNC_PER_HOST_LIMIT,
+        ttl_dns_cache=300,
+    )
+    task_iter = iter(tasks)
+
+    async def consumer():
+        for args in task_iter:
+            await async_request_worker(session, args)
+
+    async with aiohttp.ClientSession(connector=connector, headers=DOWNLOAD_HEADERS) as session:
+        await asyncio.gather(*(consumer() for _ in range(min(ASYNC_MAX_IN_FLIGHT, len(tasks)) or 1)))
+
+
+# ---------- Selenium 截图消费者 ----------
 def screenshot_worker():
-    """后台截图线程"""
+    """后台截图线程，常驻到程序结束（下载阶段随时可能有新的截图任务）"""
     while True:
-        try:
-            url, tag, name, title, full_path = screenshot_queue.get(timeout=10)
-        except queue.Empty:
-            break
-
-        ok = selenium_capture_image(url, full_path)
-        
-        if ok:
-            name_root, _ = os.path.splitext(full_path)
-            png_path = f"{name_root}.png"
-            if full_path != png_path:
-                 os.rename(full_path, png_path) 
-            full_path = png_path 
+        url, tag, name, title, full_path = screenshot_queue.get()
+
+        saved_path, msg = selenium_capture_image(url, full_path)
 
         record_status(
             url, tag, name, title,
-            "✅成功" if ok else "❌失败",
-            "截图成功" if ok else "截图失败",
-            full_path if ok else ""
+            "✅成功" if saved_path else "❌失败",
+            msg,
+            saved_path or ""
         )
         screenshot_queue.task_done()
 
@@ -282,52 +426,71 @@ if __name__ == "__main__":
     # 设置全局下载路径
     GLOBAL_DOWNLOAD_PATH = download_path 
 
+    # 断点续传索引：首次运行时导入已有的 {tag}_records.csv，之后由状态日志随写随更新
+    resume_index = ResumeIndex(
+        os.path.join(download_path, RESUME_INDEX_NAME),
+        records_glob=os.path.join(download_path, "*_records.csv"),
+    )
+    status_journal = StatusJournal(STATUS_FIELDS)
+    status_journal.add_listener(resume_index.on_journal_batch)
+    catalog = Catalog(os.path.join(download_path, CATALOG_NAME))
+    status_journal.add_listener(catalog.on_journal_batch)
+
+    # 也可以指向爬虫的 Parquet 输出目录（v2ph_data.parquet），按列读取，速度远快于 CSV
     csv_path = r"R:\py\Auto_Image-Spider\Requests\v2ph\v2ph_data.csv"
     
-    df = pd.read_csv(csv_path)
-    # 确保 TAG 存在且非空
-    df = df[df['TAG'].notna() & (df['TAG'] != '')]
-    
-    downloaded_urls = set()
+    df = read_records(csv_path)
+    # 确保 TAG 和 URL 存在且非空
+    df = df[df['TAG'].notna() & (df['TAG'] != '') & df['URL'].notna()]
     
-    # 遍历所有独特的 TAG，查找已下载的 URL
-    unique_tags = df['TAG'].unique()
-    for tag in unique_tags:
-        tag_cleaned = sanitize_filename(tag)
-        # 独立的状态记录文件路径
-        status_csv_path = os.path.join(GLOBAL_DOWNLOAD_PATH, f"{tag_cleaned}_records.csv")
-        
-        if os.path.exists(status_csv_path):
-            try:
-                df_s = pd.read_csv(status_csv_path)
-                # 收集该 TAG 下已成功下载的 URL
-                downloaded_urls.update(df_s.loc[df_s["Status"] == "✅成功", "URL"].astype(str))
-            except Exception as e:
-                print(f"Warning: 无法读取或解析 {status_csv_path}. 错误: {e}")
-                pass
-
+    downloaded_urls = resume_index.load_done()
+    print(f"已完成: {len(downloaded_urls)} 个 (来自 {RESUME_INDEX_NAME})")
 
-    # 任务列表构造
-    tasks = [(r.URL, r, download_path, r['TAG'], r['Title']) 
-              for _, r in df.iterrows() if pd.notna(r.URL) and r.URL not in downloaded_urls]
+    # 任务列表构造：向量化过滤已完成的 URL
+    df = df[~df['URL'].astype(str).isin(downloaded_urls)]
+    tasks = [(r['URL'], r, download_path, r['TAG'], r['Title'])
+             for r in df.to_dict('records')]
     
     total = len(tasks)
     print(f"待下载: {total} 个")
 
-    # 启动后台截图线程（建议 2-3 个）
-    for _ in range(1):
+    # 启动后台截图线程，每个线程对应浏览器池中的一个 driver（首次需要截图时才启动浏览器）
+    screenshot_pool = BrowserPool(build_selenium_driver, size=SCREENSHOT_WORKERS,
+                                  max_pages=SCREENSHOT_MAX_PAGES, warm=False)
+    for _ in range(SCREENSHOT_WORKERS):
         threading.Thread(target=screenshot_worker, daemon=True).start()
 
-    # 高并发requests下载
-    with ThreadPoolExecutor(max_workers=20) as ex:
-        ex.map(request_worker, tasks)
+    mode = input(f"下载模式 thread/async (回车默认): {DOWNLOAD_MODE}").strip().lower() or DOWNLOAD_MODE
+    start_time = time.time()
+
+    if mode == "async" and aiohttp is not None:
+        # asyncio 高并发下载：按 host 自适应并发，数千个传输同时在途
+        download_concurrency = AsyncAdaptiveConcurrency(
+            initial=ADAPTIVE_INITIAL_PER_HOST, max_limit=ASYNC_PER_HOST_LIMIT)
+        asyncio.run(run_async_downloads(tasks))
+    else:
+        if mode == "async":
+            print("⚠️ 未安装 aiohttp，回退到线程池模式")
+        # 高并发requests下载
+        download_concurrency = AdaptiveConcurrency(
+            initial=ADAPTIVE_INITIAL_PER_HOST, max_limit=THREAD_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=THREAD_MAX_WORKERS) as ex:
+            ex.map(request_worker, tasks)
+
+    elapsed = time.time() - start_time
+    print(f"下载阶段耗时 {elapsed:.1f}s，吞吐 {total / elapsed if elapsed else 0:.1f} 个/秒 (模式: {mode})")
+    print(f"各 host 最终并发上限: {download_concurrency.limits()}")
 
     # 等待截图任务完成
     screenshot_queue.join()
 
     # 关闭所有 Selenium 驱动
-    if hasattr(driver_pool, "driver") and driver_pool.driver:
-        driver_pool.driver.quit()
-        driver_pool.driver = None
+    screenshot_pool.close()
+
+    # 写入剩余的状态记录（同时更新断点续传索引）
+    status_journal.close()
+    resume_index.close()
+    print(f"下载目录统计: {catalog.stats()}")
+    catalog.close()
 
     print("\n✅ 全部任务完成")
\ No newline at end of file
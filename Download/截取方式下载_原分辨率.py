@@ -10,11 +10,21 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import NoSuchElementException
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spider_common.browser_pool import BrowserPool, wait_for_image, fetch_image_bytes
+from spider_common.download import sniff_image_type
+from spider_common.parquet_sink import read_records
 
 # 全局计数器和锁
 current = 0
 lock = threading.Lock()
 total = 0  # 总任务数
+browser_pool = None  # 在主程序中创建，每个下载线程借用一个预热的 driver
+BROWSER_MAX_PAGES = 200  # 每个 driver 打开多少个页面后重建
+# True: 优先保存浏览器已下载的原始字节（保持原格式和大小），取不到时再截图
+CAPTURE_ORIGINAL_BYTES = True
 
 # 清理文件名中的非法字符
 def sanitize_filename(s):
@@ -37,42 +47,40 @@ def download_image_by_screenshot(args):
         
     full_path = os.path.join(download_path, file_name)
 
-    chrome_driver_path = r'C:\Program Files\Google\chromedriver-win32\chromedriver.exe'
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-notifications")
-    options.add_argument("--disable-background-networking")
-    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36")
-    options.add_argument(f"referer=https://inspgr.id/") 
-
-    driver = None
     max_retries = 3
 
     for attempt in range(max_retries):
         try:
-            service = Service(chrome_driver_path)
-            driver = webdriver.Chrome(service=service, options=options)
-            
-            # 访问图片链接
-            driver.get(url)
-            time.sleep(5)
-
-            # 通过 JavaScript 获取图片元素的原始尺寸
-            img_element = driver.find_element("tag name", "img")
-            img_width = driver.execute_script("return arguments[0].naturalWidth", img_element)
-            img_height = driver.execute_script("return arguments[0].naturalHeight", img_element)
-            
-            # 动态调整浏览器窗口大小，以适应图片原始尺寸
-            # 加上一些边距，避免滚动条
-            driver.set_window_size(img_width + 100, img_height + 100) 
-            time.sleep(1)
-            
-            # 重新定位图片元素
-            img_element = driver.find_element("tag name", "img")
-            
-            # 截取图片并保存
-            img_data = img_element.screenshot_as_png
+            with browser_pool.driver() as driver:
+                # 访问图片链接，等待图片 load 事件而不是固定等待
+                driver.get(url)
+                size = wait_for_image(driver, timeout=15)
+                if not size:
+                    raise NoSuchElementException("图片未加载完成")
+                img_width, img_height = size
+
+                if CAPTURE_ORIGINAL_BYTES:
+                    data = fetch_image_bytes(driver)
+                    kind = sniff_image_type(data[:512]) if data else None
+                    if kind:
+                        # 扩展名以文件头识别的真实格式为准
+                        saved_path = os.path.splitext(full_path)[0] + kind
+                        with open(saved_path, "wb") as f:
+                            f.write(data)
+                        with lock:
+                            current += 1
+                            print(f"[{current}/{total}] 成功保存原图到：{saved_path}")
+                        return True
+
+                # 动态调整浏览器窗口大小，以适应图片原始尺寸
+                # 加上一些边距，避免滚动条
+                driver.set_window_size(img_width + 100, img_height + 100)
+
+                # 重新定位图片元素
+                img_element = driver.find_element("tag name", "img")
+
+                # 截取图片并保存
+                img_data = img_element.screenshot_as_png
             image = Image.open(io.BytesIO(img_data))
             image.save(full_path, "PNG")
 
@@ -84,7 +92,7 @@ def download_image_by_screenshot(args):
         except NoSuchElementException:
             if attempt < max_retries - 1:
                 print(f"[{current+1}/{total}] ⚠️ 未找到图片元素，第 {attempt + 1} 次重试...")
-                time.sleep(5)
+                time.sleep(1)
                 continue
             else:
                 with lock:
@@ -95,20 +103,29 @@ def download_image_by_screenshot(args):
         except Exception as e:
             if attempt < max_retries - 1:
                 print(f"[{current+1}/{total}] ⚠️ 下载被中止，第 {attempt + 1} 次重试...")
-                time.sleep(5)
+                time.sleep(1)
                 continue
             else:
                 with lock:
                     current += 1
                     print(f"[{current}/{total}] ❌ 下载失败：{url}, 错误：{e}")
                 return False
-
-        finally:
-            if driver:
-                driver.quit()
     return False
 
 
+def build_driver():
+    chrome_driver_path = r'C:\Program Files\Google\chromedriver-win32\chromedriver.exe'
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-notifications")
+    options.add_argument("--disable-background-networking")
+    options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36")
+    options.add_argument(f"referer=https://inspgr.id/") 
+    service = Service(chrome_driver_path)
+    return webdriver.Chrome(service=service, options=options)
+
+
 
 ### 主程序入口
 
@@ -119,7 +136,7 @@ if __name__ == "__main__":
 
     csv_path = r"D:\work\爬虫\爬虫数据\Theinspirationgrid\all_records - 副本.csv"
     try:
-        df = pd.read_csv(csv_path)
+        df = read_records(csv_path)   # CSV 或同名的 .parquet 数据集
     except Exception as e:
         print(f"读取 CSV 文件失败：{e}")
         exit()
@@ -134,8 +151,11 @@ if __name__ == "__main__":
     print(f"共 {total} 张图片待下载...")
 
     max_workers = 5
+    # 预热与线程数相同的浏览器，整个任务期间复用
+    browser_pool = BrowserPool(build_driver, size=max_workers, max_pages=BROWSER_MAX_PAGES)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        results = executor.map(download_image_by_screenshot, tasks)
+        results = list(executor.map(download_image_by_screenshot, tasks))
+    browser_pool.close()
 
     success_count = sum(1 for r in results if r)
     print(f"\n下载完成！成功：{success_count}/{total}，失败：{total - success_count}")
\ No newline at end of file
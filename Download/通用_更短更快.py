@@ -1,6 +1,7 @@
 import os
 import re
 import io
+import sys
 import time
 import threading
 import queue
@@ -21,6 +22,10 @@ from selenium.common.exceptions import (
 )
 import urllib3
 
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from spider_common.status_journal import StatusJournal
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # ---------- 全局控制 ----------
@@ -29,6 +34,8 @@ current = 0
 total = 0
 driver_pool = threading.local()  # 每线程独立driver
 screenshot_queue = queue.Queue()  # 请求失败任务队列
+STATUS_FIELDS = ["URL", "TAG", "ImageName", "Status", "Message", "SavedPath"]
+status_journal = None  # 在 __main__ 中创建，后台批量写入状态记录
 
 
 # ---------- 基础函数 ----------
@@ -124,21 +131,20 @@ def selenium_capture_image(url: str, save_path: str) -> bool:
         return False
 
 
-# ---------- 状态记录 (保持不变) ----------
+# ---------- 状态记录 ----------
 def record_status(status_csv_path, url, tag, name, status, msg, path=""):
     global current
     with lock:
         current += 1
         print(f"[{current}/{total}] {status} {url}")
-        pd.DataFrame([{
-            "URL": url,
-            "TAG": tag,
-            "ImageName": name,
-            "Status": status,
-            "Message": msg,
-            "SavedPath": path if status == "✅成功" else ""
-        }]).to_csv(status_csv_path, mode='a', index=False,
-                   header=not os.path.exists(status_csv_path), encoding='utf-8-sig')
+    status_journal.record(status_csv_path, {
+        "URL": url,
+        "TAG": tag,
+        "ImageName": name,
+        "Status": status,
+        "Message": msg,
+        "SavedPath": path if status == "✅成功" else ""
+    })
 
 
 # ---------- Request 下载线程 (已修改) ----------
@@ -249,6 +255,8 @@ if __name__ == "__main__":
         except Exception:
             pass
 
+    status_journal = StatusJournal(STATUS_FIELDS)
+
     tasks = [(r.URL, r, download_path, r.TAG, status_csv_path)
              for _, r in df.iterrows() if pd.notna(r.URL) and r.URL not in downloaded]
     total = len(tasks)
@@ -265,4 +273,7 @@ if __name__ == "__main__":
     # 等待截图任务完成
     screenshot_queue.join()
 
+    # 写入剩余的状态记录
+    status_journal.close()
+
     print("\n✅ 全部任务完成")
\ No newline at end of file
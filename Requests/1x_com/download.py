@@ -1,11 +1,14 @@
 import requests
-import pandas as pd
 import os
 import time
 # 修复：导入 threading 库，用于在日志中显示线程名称
 import threading 
-import concurrent.futures
-from typing import List, Tuple, Dict, Any, Optional
+from typing import Dict, Any, Optional
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_tasks import MissingColumns, iter_csv_rows, run_bounded
 
 # --- 配置 ---
 CSV_PATH = r'R:\py\Auto_Image-Spider\Requests\1x_com\1x_com_awarded.csv'
@@ -19,11 +22,12 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
     'Connection': 'keep-alive',
     'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Referer': BASE_REFERER_URL,
 }
 THREAD_START_DELAY = 0.1 
 
 
-def download_image(image_url: str, save_path: str, referer_url: str) -> bool:
+def download_image(image_url: str, save_path: str) -> bool:
     """
     下载单张图片到指定路径，并添加反爬必要的请求头。
     此函数将在单独的线程中运行。
@@ -31,9 +35,6 @@ def download_image(image_url: str, save_path: str, referer_url: str) -> bool:
     # 在线程启动时加入微小延迟，增强隐秘性
     time.sleep(THREAD_START_DELAY)
 
-    custom_headers = HEADERS.copy()
-    custom_headers['Referer'] = referer_url
-    
     filename = os.path.basename(save_path)
     thread_name = threading.current_thread().name # 使用已导入的 threading 模块获取线程名
     
@@ -43,19 +44,17 @@ def download_image(image_url: str, save_path: str, referer_url: str) -> bool:
         return True
 
     try:
-        # 使用 with requests.Session() 来管理单个线程内的连接
-        with requests.Session() as session:
-            # 2. 发送 GET 请求
-            response = session.get(image_url, headers=custom_headers, stream=True, timeout=20)
+        # 所有线程共享 http_client 中按 host 复用的连接池，不再每张图片新建 Session
+        with http_client.get(image_url, headers=HEADERS, stream=True, timeout=20) as response:
             response.raise_for_status() # 检查 HTTP 错误
             
-            # 3. 写入文件
+            # 写入文件
             with open(save_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
-                    
-            print(f"[{thread_name}] ✅ 成功下载: {filename}")
-            return True
+                
+        print(f"[{thread_name}] ✅ 成功下载: {filename}")
+        return True
             
     except requests.exceptions.RequestException as e:
         print(f"[{thread_name}] ❌ 下载失败 ({filename}): {e}")
@@ -67,7 +66,7 @@ def download_image(image_url: str, save_path: str, referer_url: str) -> bool:
 
 def main_downloader_threaded():
     """
-    主下载逻辑：读取 CSV，使用 ThreadPoolExecutor 进行并发下载。
+    主下载逻辑：流式读取 CSV，边读边提交到线程池并发下载。
     """
     
     # 1. 检查并创建下载目录
@@ -75,53 +74,40 @@ def main_downloader_threaded():
         os.makedirs(DOWNLOAD_DIR)
         print(f"已创建下载目录: {DOWNLOAD_DIR}")
         
-    # 2. 读取 CSV 文件
-    try:
-        df = pd.read_csv(CSV_PATH)
-        image_urls: List[str] = df['图片地址'].tolist() 
-        
-    except FileNotFoundError:
+    # 2. 流式读取 CSV 文件，准备任务 (url, save_path)
+    if not os.path.exists(CSV_PATH):
         print(f"错误：未找到 CSV 文件: {CSV_PATH}")
         return
-    except KeyError:
-        print("错误：CSV 文件中未找到名为 '图片地址' 的列。请检查 CSV 格式。")
-        return
-    except Exception as e:
-        print(f"读取 CSV 文件失败: {e}")
-        return
 
-    total_images = len(image_urls)
-    tasks: List[Tuple[str, str, str]] = [] # 存储 (url, save_path, referer)
-    
-    # 3. 准备任务列表
-    for url in image_urls:
-        filename = url.split('/')[-1]
-        save_path = os.path.join(DOWNLOAD_DIR, filename)
-        referer = BASE_REFERER_URL 
-        tasks.append((url, save_path, referer))
+    def iter_tasks():
+        for row in iter_csv_rows(CSV_PATH, required=['图片地址']):
+            url = row['图片地址']
+            filename = url.split('/')[-1]
+            save_path = os.path.join(DOWNLOAD_DIR, filename)
+            yield url, save_path
 
-    print(f"\n--- 开始多线程下载 (最大线程数: {MAX_WORKERS})，总共 {total_images} 张图片 ---")
+    print(f"\n--- 开始多线程下载 (最大线程数: {MAX_WORKERS}) ---")
     
     downloaded_count = 0
+
+    def on_done(task, result, exc):
+        nonlocal downloaded_count
+        if exc:
+            # 处理线程执行过程中的异常
+            print(f"线程执行图片下载时发生异常 ({task[0]}): {exc}")
+        elif result:
+            downloaded_count += 1
     
-    # 4. 使用 ThreadPoolExecutor 并发执行任务
-    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # 使用 submit 将任务提交给线程池
-        future_to_url = {
-            executor.submit(download_image, url, save_path, referer): url 
-            for url, save_path, referer in tasks
-        }
-        
-        # 使用 as_completed 遍历已完成的任务结果
-        for future in concurrent.futures.as_completed(future_to_url):
-            url = future_to_url[future]
-            try:
-                # 获取任务结果 (True/False)
-                if future.result():
-                    downloaded_count += 1
-            except Exception as e:
-                # 处理线程执行过程中的异常
-                print(f"线程执行图片下载时发生异常 ({url}): {e}")
+    # 3. 边读边提交到线程池，在途任务有上限
+    try:
+        total_images = run_bounded(lambda task: download_image(*task), iter_tasks(),
+                                   max_workers=MAX_WORKERS, on_done=on_done)
+    except MissingColumns:
+        print("错误：CSV 文件中未找到名为 '图片地址' 的列。请检查 CSV 格式。")
+        return
+    except Exception as e:
+        print(f"读取 CSV 文件失败: {e}")
+        return
 
     print("\n--- 多线程下载完成 ---")
     print(f"总结: 共 {total_images} 个目标，成功下载/跳过 {downloaded_count} 个。")
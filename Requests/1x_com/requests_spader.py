@@ -3,6 +3,11 @@ import re
 import pandas as pd
 from bs4 import BeautifulSoup
 from typing import List, Dict, Any, Optional
+import os
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- 全局配置 ---
 BASE_URL = 'https://1x.com/backend/lm2.php'
@@ -10,6 +15,12 @@ TARGET_URL = 'https://1x.com/gallery/fine-art-nude/awarded' # 用于 Referer 头
 CSV_PATH = r'R:\py\Auto_Image-Spider\Requests\1x_com\1x_com_awarded.csv'
 ITEMS_PER_PAGE = 20 # 观察到的 from 参数增量
 
+# 模拟浏览器的 XHR 请求，请求头在模块加载时注册一次，之后对该 host 的请求自动带上
+http_client.register_site(BASE_URL, referer=TARGET_URL, headers={
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'X-Requested-With': 'XMLHttpRequest', # 模拟 XHR 请求
+})
+
 # 初始请求参数 (第一页)
 INITIAL_PARAMS = {
     'style': 'normal',
@@ -94,15 +105,8 @@ def fetch_page_data(params: Dict[str, Any]) -> Optional[str]:
     """
     print(f"正在请求 page: from={params['from']}, 已加载ID数量={len(params['alreadyloaded'].split(':')) - 1}")
     try:
-        # 模拟浏览器行为，添加 headers
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': TARGET_URL,
-            'X-Requested-With': 'XMLHttpRequest', # 模拟 XHR 请求
-        }
-        
-        # 发送请求
-        response = requests.get(BASE_URL, params=params, headers=headers, timeout=30)
+        # 发送请求（请求头已通过 register_site 注册）
+        response = http_client.get(BASE_URL, params=params, timeout=30)
         response.raise_for_status() # 检查HTTP错误
         
         # 提取 <data><![CDATA[...]]></data> 中的内容
@@ -7,6 +7,12 @@ import redis
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.dedup import DedupSet
+from spider_common.fingerprint import url_fingerprint
 
 # --- 配置常量 ---
 REDIS_HOST = 'localhost'
@@ -52,11 +58,12 @@ class BabesourceSpider:
         except redis.exceptions.ConnectionError as e:
             print(f"⚠️ Redis 连接失败 ({e})，将使用内存去重。")
             self.redis = None
-            self.visited_urls = set()
         except Exception as e:
             print(f"⚠️ Redis 初始化遇到其他错误 ({e})，将使用内存去重。")
             self.redis = None
-            self.visited_urls = set()
+        # 写入失败时要撤销标记（discard_many），不使用无法删除的本地 Bloom 层
+        self.dedup = DedupSet.fingerprinted(self.redis, REDIS_KEY, url_fingerprint, legacy_member=str,
+                                            local_dir=None)
             
         # 确保 CSV 文件头部存在
         if not os.path.exists(self.csv_path) or os.path.getsize(self.csv_path) == 0:
@@ -65,44 +72,31 @@ class BabesourceSpider:
                 writer.writeheader()
 
 
-    def is_url_visited(self, url):
-        """检查 URL 是否已访问 (去重)"""
-        if self.redis:
-            # Redis: SADD 返回 1 表示添加成功（未重复），返回 0 表示已存在（重复）
-            return not self.redis.sadd(REDIS_KEY, url)
-        else:
-            # 内存去重
-            if url in self.visited_urls:
-                return True
-            self.visited_urls.add(url)
-            return False
+    def write_to_csv(self, data_rows):
+        """将一个相册的数据批量写入 CSV 文件 (线程安全)，返回实际写入的行"""
+        # 在写入前先进行去重检查：整个相册一次 Redis 往返，SADD 原子地检查并标记
+        duplicate_mask = self.dedup.check_and_add_many([data['图片URL'] for data in data_rows])
+        new_rows = [data for data, is_duplicate in zip(data_rows, duplicate_mask) if not is_duplicate]
+        if not new_rows:
+            return []
 
-    def write_to_csv(self, data):
-        """将数据写入 CSV 文件 (线程安全)"""
-        # 在写入前先进行去重检查
-        if self.is_url_visited(data['图片URL']):
-            return False
-            
         with self.csv_lock:
             try:
                 with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
                     writer = csv.DictWriter(f, fieldnames=self.csv_fieldnames)
-                    writer.writerow(data)
-                return True
+                    writer.writerows(new_rows)
+                return new_rows
             except Exception as e:
                 print(f"❌ 写入 CSV 失败: {e}")
                 # 写入失败则从去重集合中移除
-                if self.redis:
-                    self.redis.srem(REDIS_KEY, data['图片URL'])
-                else:
-                    self.visited_urls.remove(data['图片URL'])
-                return False
+                self.dedup.discard_many([data['图片URL'] for data in new_rows])
+                return []
 
     def get_html(self, url):
         """发送 HTTP 请求并返回 BeautifulSoup 对象"""
         try:
             # verify=False 忽略 SSL 证书验证，因为网站可能使用自签名或旧协议
-            response = requests.get(url, headers=self.headers, verify=False, timeout=10)
+            response = http_client.get(url, headers=self.headers, verify=False, timeout=10)
             response.raise_for_status() # 检查 HTTP 错误
             # 使用 lxml 解析器提高解析速度
             return BeautifulSoup(response.text, 'lxml') 
@@ -170,6 +164,7 @@ class BabesourceSpider:
             # print(f"   -> 相册中没有找到图片链接，跳过: {album_name}")
             return
 
+        data_rows = []
         for link_tag in image_links:
             image_url = link_tag['href'] if 'href' in link_tag.attrs else None
             
@@ -182,17 +177,17 @@ class BabesourceSpider:
                 file_with_ext = image_url.split('/')[-1]
                 image_name = os.path.splitext(file_with_ext)[0]
                 
-                data = {
+                data_rows.append({
                     '图片URL': image_url,
                     '标题': title,
                     '名称': image_name,
                     '相册': album_name,       # 例如: nancy-heal-fit-190563
                     '所属集合': tag_name     # 例如: nancy-12284
-                }
-                
-                # 写入 CSV (已包含去重逻辑)
-                if self.write_to_csv(data):
-                    print(f"   -> 写入数据: {album_name}/{image_name} (URL: {image_url[:50]}...)")
+                })
+
+        # 写入 CSV (已包含去重逻辑)
+        for data in self.write_to_csv(data_rows):
+            print(f"   -> 写入数据: {album_name}/{data['名称']} (URL: {data['图片URL'][:50]}...)")
             
             
     # --- 第三部分：启动下载图片 ---
@@ -218,7 +213,7 @@ class BabesourceSpider:
             return True # 文件已存在，跳过下载
         
         try:
-            response = requests.get(url, headers=self.headers, stream=True, verify=False, timeout=20)
+            response = http_client.get(url, headers=self.headers, stream=True, verify=False, timeout=20)
             response.raise_for_status()
 
             with open(file_path, 'wb') as f:
@@ -292,10 +287,10 @@ class BabesourceSpider:
         try:
             with open(self.csv_path, 'r', newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f) # 自动使用第一行作为字段名
-                for row in reader:
-                    # 仅下载那些 URL 没有被去重过的（虽然理论上写入时已经去重，这里是双重保险）
-                    if not self.is_url_visited(row['图片URL']):
-                        image_list_to_download.append(row)
+                rows = list(reader)
+            # 仅下载那些 URL 没有被去重过的（虽然理论上写入时已经去重，这里是双重保险）
+            duplicate_mask = self.dedup.check_and_add_many([row['图片URL'] for row in rows])
+            image_list_to_download = [row for row, is_duplicate in zip(rows, duplicate_mask) if not is_duplicate]
         except FileNotFoundError:
             print(f"❌ CSV 文件未找到: {self.csv_path}。请先运行爬取部分。")
             return
@@ -9,6 +9,10 @@ from threading import Lock
 from bs4 import BeautifulSoup
 from lxml import etree
 from tqdm import tqdm
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- 配置常量 ---
 BASE_URL = "https://www.elitebabes.com/"
@@ -52,6 +56,10 @@ class ElitebabesSpider:
             'Accept': 'application/json, text/javascript, */*; q=0.01',
             'X-Requested-With': 'XMLHttpRequest'
         }
+        # 站点页面的请求头只注册一次，之后 http_client 对该 host 的请求自动带上
+        http_client.register_site(BASE_URL, headers=self.headers)
+        # 图片可能在其他 host（CDN）上，下载用的请求头（Referer 换成首页）也只构造一次
+        self.download_headers = dict(self.headers, Referer=BASE_URL)
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
         # 确保目录存在
@@ -116,7 +124,7 @@ class ElitebabesSpider:
             url = API_URL_TEMPLATE.format(page)
             print(f"   => 正在爬取第 {page} 页: {url}")
             try:
-                response = requests.get(url, headers=self.headers, verify=False, timeout=15)
+                response = http_client.get(url, verify=False, timeout=15)
                 # API 返回的不是标准的 JSON，而是包含 HTML 的文本
                 if response.status_code == 200 and response.text.strip():
                     # 检查响应内容是否包含相册列表的 HTML
@@ -162,7 +170,7 @@ class ElitebabesSpider:
         album_title = album_info['album_title']
         
         try:
-            response = requests.get(album_url, headers=self.headers, verify=False, timeout=15)
+            response = http_client.get(album_url, verify=False, timeout=15)
             if response.status_code != 200:
                 print(f"   [WARN] 访问相册页失败 {album_url}: 状态码 {response.status_code}")
                 return None
@@ -356,11 +364,8 @@ class ElitebabesSpider:
 
         # 4. 下载图片
         try:
-            # 添加 Referer 头以避免 403 错误
-            download_headers = self.headers.copy()
-            download_headers['Referer'] = BASE_URL # 随便一个 referrer 
-            
-            response = requests.get(image_url, headers=download_headers, stream=True, verify=False, timeout=30)
+            # 带 Referer 头以避免 403 错误
+            response = http_client.get(image_url, headers=self.download_headers, stream=True, verify=False, timeout=30)
             
             if response.status_code == 200:
                 with open(final_file_path, 'wb') as f:
@@ -4,6 +4,10 @@ import csv
 import os
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- 配置常量 ---
 BASE_URL = "https://www.eporner.com"
@@ -34,7 +38,7 @@ HEADERS = {
 def get_html(url):
     """发送GET请求并返回响应文本，处理常见异常。"""
     try:
-        response = requests.get(url, headers=HEADERS, timeout=15) 
+        response = http_client.get(url, headers=HEADERS, timeout=15) 
         response.raise_for_status() 
         return response
     except requests.exceptions.HTTPError as e:
@@ -202,7 +206,7 @@ def download_image(image_info):
         return f"Skipped (Exists in '{safe_collection_name}'): {filename}"
         
     try:
-        response = requests.get(url, headers=HEADERS, stream=True, timeout=30)
+        response = http_client.get(url, headers=HEADERS, stream=True, timeout=30)
         response.raise_for_status()
 
         with open(filepath, 'wb') as f:
@@ -8,6 +8,10 @@ import urllib3
 import redis
 from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- Redis 配置常量 ---
 REDIS_HOST = 'localhost'
@@ -159,7 +163,7 @@ class FreenaturestockScraper:
             
             try:
                 # 使用 verify=False 忽略 SSL 警告，如果你在本地遇到相关问题
-                response = requests.get(url, headers=self.headers, timeout=15, verify=False)
+                response = http_client.get(url, headers=self.headers, timeout=15, verify=False)
                 
                 # 检查状态码
                 if response.status_code == 404:
@@ -8,6 +8,10 @@ import redis
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # ----------------- 配置常量 -----------------
 # 网站基础信息
@@ -177,7 +181,7 @@ class ImageScraper:
         
         try:
             # 网站可能有多页，但伪代码只给出了单页信息，我们暂时只爬取第一页
-            response = requests.get(url, headers=self.headers, verify=False, timeout=60)    # 60 秒超时
+            response = http_client.get(url, headers=self.headers, verify=False, timeout=60)    # 60 秒超时
             response.raise_for_status() # 检查 HTTP 状态码
             
             self._parse_and_save(response.text, tag)
@@ -8,6 +8,10 @@ from concurrent.futures import ThreadPoolExecutor
 import urllib3
 import time # 引入时间库
 import random # 引入随机库
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- Redis 配置 ---
 REDIS_HOST = 'localhost'
@@ -150,7 +154,7 @@ class IsorepublicCrawler:
 
             try:
                 # 【更新】使用更长的超时时间
-                response = requests.get(
+                response = http_client.get(
                     current_url, 
                     headers=self.headers, 
                     verify=False, 
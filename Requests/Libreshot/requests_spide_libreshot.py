@@ -8,6 +8,10 @@ import redis
 from lxml import etree
 from threading import Lock
 from concurrent.futures import ThreadPoolExecutor
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- 配置常量 ---
 BASE_URL = "https://libreshot.com/?s={tag}"
@@ -186,7 +190,7 @@ class LibreshotScraper:
         
         try:
             # 建议的请求头和 SSL 忽略设置
-            response = requests.get(url, headers=self.headers, verify=False, timeout=15)
+            response = http_client.get(url, headers=self.headers, verify=False, timeout=15)
             response.raise_for_status()  # 检查 HTTP 错误
             
             self.parse_page(response.content, tag)
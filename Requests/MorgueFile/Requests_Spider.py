@@ -2,11 +2,15 @@ import requests
 import urllib3
 import json
 import os
-import csv
 import time
 import redis # 引入 redis 库
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_sink import open_record_sink
 
 # --- 配置常量 ---
 TAG_FILE_PATH = r'D:\myproject\Code\爬虫\爬虫数据\morguefile\ram_tag_list_备份.txt'
@@ -31,7 +35,8 @@ class MorgueFileSpider:
         """
         self.csv_dir_path = csv_dir_path
         self.csv_path = os.path.join(self.csv_dir_path, csv_filename) 
-        self.csv_lock = Lock() # 用于 CSV 写入的线程锁
+        self.visited_lock = Lock() # 内存去重用的线程锁
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'TAG'], site='morguefile')
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
@@ -79,7 +84,7 @@ class MorgueFileSpider:
         """
         url = API_URL_TEMPLATE.format(page=page, tag=tag)
         try:
-            response = requests.get(url, headers=self.headers, timeout=10, verify=False) 
+            response = http_client.get(url, headers=self.headers, timeout=10, verify=False) 
             response.raise_for_status()
             data = response.json()
             return data
@@ -106,7 +111,7 @@ class MorgueFileSpider:
             return self.redis.sadd(REDIS_KEY, unique_key) == 0
         else:
             # 使用内存集合进行去重，需要线程锁来保证操作的原子性
-            with self.csv_lock: # 使用写入锁也可以（或者创建一个单独的去重锁）
+            with self.visited_lock:
                 if unique_key in self.visited_urls:
                     return True
                 self.visited_urls.add(unique_key)
@@ -144,22 +149,9 @@ class MorgueFileSpider:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """
-        写入 CSV 方法，已集成线程锁，确保多线程安全。
+        提交给后台写入线程，立即返回（表头与批量落盘由后台写入器处理）。
         """
-        try:
-            with self.csv_lock: # 使用线程锁
-                os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-                is_file_empty = not os.path.exists(csv_path) or os.stat(csv_path).st_size == 0
-                
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    
-                    if is_file_empty:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'TAG'])
-                        
-                    writer.writerow([title, name, url, tag])
-        except Exception as e:
-            print(f"[{tag}] [✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(csv_path, [title, name, url, tag])
 
     def crawl_tag(self, tag):
         """
@@ -205,6 +197,7 @@ class MorgueFileSpider:
 
         with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
             executor.map(self.crawl_tag, tags)
+        self.csv_sink.close()
 
         end_time = time.time()
         print(f"\n[!!!] 所有标签爬取完成。数据写入至: {self.csv_path}")
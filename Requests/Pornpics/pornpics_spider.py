@@ -8,6 +8,13 @@ import redis
 from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
 from bs4 import BeautifulSoup
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_tasks import iter_csv_rows, run_bounded
+from spider_common.dedup import DedupSet
+from spider_common.fingerprint import url_fingerprint
 
 # --- 配置常量 ---
 BASE_SEARCH_URL = "https://www.pornpics.com/search/srch.php"
@@ -41,6 +48,8 @@ class PornpicsSpider:
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Referer': 'https://www.pornpics.com/' # 有时 Referer 是必须的
         }
+        # 搜索接口和相册页都在站点 host 上，请求头只注册一次；图片在 CDN 上，下载时仍显式传入
+        http_client.register_site(BASE_GALLERY_URL, headers=self.headers)
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         self._setup_redis_duplication(redis_host, redis_port)
         self._ensure_csv_headers()
@@ -54,14 +63,13 @@ class PornpicsSpider:
             self.redis.ping()
             print("✅ Redis 连接成功，使用 Redis 集合进行去重。")
         except redis.exceptions.ConnectionError as e:
-            print(f"⚠️ Redis 连接失败 ({e})，将使用内存去重。")
+            print(f"⚠️ Redis 连接失败 ({e})，将使用本地去重文件。")
             self.redis = None
-            # 内存去重集合，用于在当前程序生命周期内的去重
-            self.visited_urls = set()
         except Exception as e:
-            print(f"⚠️ Redis 初始化遇到其他错误 ({e})，将使用内存去重。")
+            print(f"⚠️ Redis 初始化遇到其他错误 ({e})，将使用本地去重文件。")
             self.redis = None
-            self.visited_urls = set()
+        # Redis 不可用时 DedupSet 使用本地持久化的 Bloom 过滤器，重启后仍然有效
+        self.dedup = DedupSet.fingerprinted(self.redis, REDIS_KEY, url_fingerprint, legacy_member=str)
 
     def _ensure_csv_headers(self):
         """ 确保 CSV 文件及其表头存在 """
@@ -73,17 +81,17 @@ class PornpicsSpider:
                 writer.writeheader()
             print(f"📄 已创建 CSV 文件：{self.csv_path} 并写入表头。")
 
-    def _is_url_visited(self, image_url):
-        """ 检查 URL 是否已被访问（去重） """
-        if self.redis:
-            # 使用 Redis 的 sadd 方法，如果元素已存在，返回 0
-            return self.redis.sadd(REDIS_KEY, image_url) == 0
-        else:
-            # 内存去重
-            if image_url in self.visited_urls:
-                return True
-            self.visited_urls.add(image_url)
-            return False
+    def _filter_visited(self, data_rows):
+        """ 批量去重：整个相册的图片 URL 一次 Redis 往返，返回未访问过的行 """
+        duplicate_mask = self.dedup.check_and_add_many([row['图片URL'] for row in data_rows])
+        new_rows = []
+        for row, is_duplicate in zip(data_rows, duplicate_mask):
+            if is_duplicate:
+                print(f"   [-] 跳过重复图片: {row['图片名称']}")
+            else:
+                print(f"   [+] 收集图片: {row['图片名称']}")
+                new_rows.append(row)
+        return new_rows
 
     def _read_tags(self, file_path):
         """ 从文件读取人名 Tag 列表 """
@@ -116,7 +124,7 @@ class PornpicsSpider:
             print(f"🔍 正在搜索 Tag: {tag} - 页码 Offset: {offset}")
 
             try:
-                response = requests.get(search_url, headers=self.headers, verify=False, timeout=15)
+                response = http_client.get(search_url, verify=False, timeout=15)
                 response.raise_for_status()
                 data = response.json()
             except requests.exceptions.RequestException as e:
@@ -159,7 +167,7 @@ class PornpicsSpider:
         print(f"🖼️ 正在解析相册: {gallery_title} ({gallery_url})")
 
         try:
-            response = requests.get(gallery_url, headers=self.headers, verify=False, timeout=15)
+            response = http_client.get(gallery_url, verify=False, timeout=15)
             response.raise_for_status()
             response.encoding = 'utf-8' # 确保中文标题正确解析
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -199,13 +207,10 @@ class PornpicsSpider:
                     '人名Tag标签': tag
                 }
 
-                # 检查 URL 是否已存在（去重）
-                if not self._is_url_visited(image_url):
-                    image_data_list.append(data_row)
-                    print(f"   [+] 收集图片: {image_name}")
-                else:
-                    print(f"   [-] 跳过重复图片: {image_name}")
+                image_data_list.append(data_row)
 
+        # 检查 URL 是否已存在（去重）
+        image_data_list = self._filter_visited(image_data_list)
 
         # 批量写入 CSV
         if image_data_list:
@@ -263,34 +268,27 @@ class PornpicsSpider:
             print(f"❌ 下载终止：CSV 文件不存在于 {self.csv_path}")
             return
 
-        print(f"⬇️ 正在从 {self.csv_path} 读取下载任务...")
-        
-        download_tasks = []
+        print(f"⬇️ 正在从 {self.csv_path} 流式读取下载任务，使用 {MAX_WORKERS_DOWNLOAD} 线程。")
+
+        # 边读边提交，在途任务有上限，大 CSV 不会一次性读入内存
+        rows = iter_csv_rows(self.csv_path, required=['图片URL', '所属相册', '图片名称'])
+        download_tasks = ({
+            'image_url': row['图片URL'],
+            'album_name': row['所属相册'],
+            'filename': row['图片名称'],
+            'tag': row.get('人名Tag标签')
+        } for row in rows)
         try:
-            with open(self.csv_path, 'r', newline='', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # 准备下载所需信息
-                    download_tasks.append({
-                        'image_url': row['图片URL'],
-                        'album_name': row['所属相册'],
-                        'filename': row['图片名称'],
-                        'tag': row['人名Tag标签']
-                    })
+            submitted = run_bounded(self._download_image_task, download_tasks, max_workers=MAX_WORKERS_DOWNLOAD)
         except Exception as e:
             print(f"❌ 读取 CSV 文件时发生错误: {e}")
             return
 
-        if not download_tasks:
+        if not submitted:
             print("ℹ️ CSV 文件中没有找到下载任务。")
             return
 
-        print(f"🚀 启动 {len(download_tasks)} 个图片的下载任务，使用 {MAX_WORKERS_DOWNLOAD} 线程。")
-
-        # 使用多线程执行下载任务
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS_DOWNLOAD) as executor:
-            executor.map(self._download_image_task, download_tasks)
-
+        print(f"🚀 共处理 {submitted} 个图片下载任务。")
         print("\n--- ✅ 所有图片下载任务完成 ---")
 
 
@@ -319,7 +317,7 @@ class PornpicsSpider:
 
         try:
             # 流式下载图片
-            response = requests.get(image_url, headers=self.headers, verify=False, stream=True, timeout=30)
+            response = http_client.get(image_url, headers=self.headers, verify=False, stream=True, timeout=30)
             response.raise_for_status()
 
             with open(file_path, 'wb') as f:
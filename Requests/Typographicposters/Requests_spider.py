@@ -8,6 +8,10 @@ import re
 import json
 import requests
 from redis.exceptions import ConnectionError as RedisConnectionError
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # 配置常量
 # 修正：定义 API 的基础 URL 和图片存储的基础域名
@@ -87,7 +91,7 @@ class typographicposters:
         print(f"\n==== 正在请求 API: {api_url} (第 {page_num} 页) ====")
         
         try:
-            response = requests.get(api_url, headers=self.headers, timeout=15)
+            response = http_client.get(api_url, headers=self.headers, timeout=15)
             response.raise_for_status() # 检查 HTTP 错误
             data = response.json()
         except requests.exceptions.RequestException as e:
@@ -10,14 +10,27 @@ from queue import Queue
 
 import redis
 import csv
-from selenium import webdriver
-from selenium.common.exceptions import (NoSuchElementException, TimeoutException,
-                                        WebDriverException)
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.tab_pool import TabPool
+from spider_common.xhr_replay import XhrCapture
+
+# 只记录站点自身的 JSON/文本响应，第三方统计、CDN 图片等请求不取响应体
+XHR_PATTERNS = ['creativemarket.com/']
+XHR_MIME_TYPES = ('application/json', 'text/plain', 'text/html')
+XHR_WAIT = 5.0    # 等待目标 JSON 响应的最长秒数
+
+
+def _has_f_nw_r(req) -> bool:
+    text = req.text or ''
+    return '"f-nw-r":' in text and text.lstrip().startswith('{')
 
 # --- 全局共享配置和锁（用于解耦） ---
 # 请修改为你的实际路径
@@ -25,7 +38,8 @@ CHROME_DRIVER_PATH = r'C:\Program Files\Google\chromedriver-win64\chromedriver.e
 SAVE_PATH_ALL = r'D:\myproject\Code\爬虫\爬虫数据\creativemarket'
 TAG_FILE_PATH = r"D:\myproject\Code\爬虫\爬虫数据\creativemarket\ram_tag_list_备份.txt"
 CSV_PATH = os.path.join(SAVE_PATH_ALL, 'all_records_multithread.csv')
-MAX_THREADS = 20  # 设置最大线程数
+MAX_THREADS = 20  # 设置最大线程数（每个线程借用一个浏览器窗口）
+BROWSER_COUNT = 1  # 所有线程共享的 Chrome 进程数，窗口平均分配到各浏览器
 
 # Redis 配置 (所有线程共享)
 REDIS_HOST = 'localhost'
@@ -39,16 +53,39 @@ CSV_LOCK = threading.Lock()
 # 标签任务队列 (所有线程共享)
 TAG_QUEUE = Queue()
 
+def make_options() -> Options:
+    """启动共享浏览器的参数（对浏览器中的所有窗口生效）"""
+    options = Options()
+    # 常见反爬配置
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument("--headless") 
+        
+    # 性能和稳定性配置
+    options.add_argument('--disable-gpu')
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    options.add_argument(f'user-agent={user_agent}')
+    return options
+
+
+# 每个附加会话都要启用性能日志，以便获取网络请求信息
+SESSION_CAPABILITIES = {'goog:loggingPrefs': {'performance': 'ALL'}}
+
+
 class creativemarket:
     """
-    负责单个 Selenium 实例的初始化和单个标签（Tag）的爬取。
-    每个线程将创建一个此类的独立实例。
+    负责单个标签（Tag）的爬取。
+    每个任务从共享浏览器中借用一个窗口，用完归还，不再为每个线程启动独立的 Chrome。
     """
-    def __init__(self, chrome_driver_path: str):
+    def __init__(self, driver):
         """
-        初始化爬虫类。每个实例拥有独立的 WebDriver。
+        初始化爬虫类。driver 是 TabPool 借出的窗口，只在本窗口内导航。
         """
-        self.driver = None
+        self.driver = driver
         self.base_url = 'https://creativemarket.com/search/'
         
         # 共享资源，直接使用全局变量
@@ -56,102 +93,32 @@ class creativemarket:
         self.redis_key = REDIS_KEY
         self.csv_lock = CSV_LOCK
         
-        try:
-            service = Service(executable_path=chrome_driver_path)
-        except Exception as e:
-            print(f"[错误] ChromeDriver 路径错误或服务启动失败: {e}")
-            return
-            
-        options = Options()
-        # 1. 启用性能日志，以便获取网络请求信息
-        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
-        
-        # 常见反爬配置
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        options.add_argument("--headless") 
-            
-        # 性能和稳定性配置
-        options.add_argument('--disable-gpu')
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-
-        user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        options.add_argument(f'user-agent={user_agent}')
-        
-        try:
-            self.driver = webdriver.Chrome(service=service, options=options)
-            self.driver.set_page_load_timeout(30)
-            print(f"[√] Thread-{threading.get_ident()} WebDriver 初始化成功。")
-            
-        except WebDriverException as e:
-            print(f"[致命错误] Thread-{threading.get_ident()} WebDriver 启动失败: {e}")
-            self.driver = None
+        self.driver.set_page_load_timeout(30)
+        # 同一浏览器的其他窗口也在产生日志，只看本窗口的请求
+        self.xhr_capture = XhrCapture(self.driver, XHR_PATTERNS, XHR_MIME_TYPES,
+                                      webview=self.driver.current_window_handle)
+        # 丢弃上一个借用者遗留在会话中的日志
+        self.xhr_capture.poll()
 
     # --- 数据提取和网络监听方法 (_get_xhr_json_with_f_nw_r, _extract_base64_paths, _build_url_map_from_json) ---
-    # 注：这些方法保持不变，因为它们只依赖于 self.driver，而每个线程都有自己的 driver。
+    # 注：这些方法只依赖于 self.driver，每个任务借用的窗口有自己的 chromedriver 会话。
     
     def _get_xhr_json_with_f_nw_r(self) -> str:
-        """ 读取 Performance 日志，解析所有请求 ID，并循环获取响应体，直到找到包含 'f-nw-r' 键的 JSON。 """
-        # ... (此方法保持不变)
-        requests_info = {}
-
+        """
+        增量读取 Performance 日志（只对 creativemarket.com 的 JSON/文本响应取响应体），
+        等待包含 'f-nw-r' 键的 JSON，最多等待 XHR_WAIT 秒。
+        """
         try:
-            time.sleep(1) 
-            logs = self.driver.get_log('performance')
+            req = self.xhr_capture.wait_for(_has_f_nw_r, timeout=XHR_WAIT, with_body=True)
         except Exception as e:
-            print(f"[✗] Thread-{threading.get_ident()} 无法获取 Performance 日日志: {e}")
+            print(f"[✗] Thread-{threading.get_ident()} 无法获取 Performance 日志，可能是驱动不支持: {e}")
             return ""
 
-        for log_entry in logs:
-            try:
-                message_data = json.loads(log_entry['message'])
-                message = message_data['message']
-                method = message.get('method')
-                params = message.get('params')
-                request_id = params.get('requestId')
-                
-                if not request_id:
-                    continue
-                
-                if method == 'Network.responseReceived':
-                    response = params.get('response')
-                    if response and response['mimeType'] in ['application/json', 'text/plain', 'text/html']: 
-                        requests_info[request_id] = {'loaded': False, 'url': response['url']}
-                        
-                elif method == 'Network.loadingFinished' and request_id in requests_info:
-                    requests_info[request_id]['loaded'] = True
-
-            except Exception:
-                continue
-        
-        if not requests_info:
+        if req is None:
+            print(f"[✗] Thread-{threading.get_ident()} 检查了所有已完成的 API 响应，未找到包含 \"f-nw-r\": 键的 JSON 文本。")
             return ""
-
-        for request_id, info in requests_info.items():
-            if info['loaded']:
-                try:
-                    response = self.driver.execute_cdp_cmd(
-                        'Network.getResponseBody', 
-                        {'requestId': request_id}
-                    )
-                    
-                    body = response['body']
-                    
-                    if '"f-nw-r":' in body and body.strip().startswith('{'):
-                        print(f"[√] Thread-{threading.get_ident()} 成功捕获目标 JSON 响应！URL: {info['url'][:80]}...")
-                        
-                        if response.get('base64Encoded'):
-                            import base64
-                            return base64.b64decode(body).decode('utf-8', errors='ignore')
-                        return body
-                        
-                except Exception:
-                    continue
-        
-        print(f"[✗] Thread-{threading.get_ident()} 未找到包含 \"f-nw-r\": 键的 JSON 文本。")
-        return ""
+        print(f"[√] Thread-{threading.get_ident()} 成功通过 Performance Log 捕获目标 JSON 响应！URL: {req.url[:80]}...")
+        return req.text
 
 
     def _extract_base64_paths(self) -> List[Tuple[str, str, str]]:
@@ -362,62 +329,44 @@ class creativemarket:
                 print(f"[✗] Thread-{thread_id} 翻页时发生错误: {e}")
                 return False
 
-    def close(self):
-        """关闭 WebDriver 实例。"""
-        if self.driver:
-            try:
-                self.driver.quit()
-                print(f"[关闭] Thread-{threading.get_ident()} WebDriver 已安全关闭。")
-            except Exception:
-                pass
-
 
-def worker_task(tag_queue: Queue, chrome_driver_path: str, csv_path: str):
+def worker_task(tag_queue: Queue, pool: TabPool, csv_path: str):
     """
-    单个线程的执行函数。从队列中取出任务（tag）并执行爬取。
+    单个线程的执行函数。从队列中取出任务（tag），借用一个浏览器窗口执行爬取。
     """
     thread_id = threading.get_ident()
     print(f"--- Thread-{thread_id} 启动，准备处理任务。")
-    spider = None
     
-    # 在线程中创建独立的爬虫实例
-    try:
-        spider = creativemarket(chrome_driver_path)
-        if not spider.driver:
-            print(f"[致命错误] Thread-{thread_id} 爬虫实例初始化失败，退出线程。")
-            return
-            
-        while True:
-            try:
-                # 1. 从队列中获取标签任务 (非阻塞，超时 1 秒)
-                tag = tag_queue.get(timeout=1) 
-            except Exception:
-                # 队列为空，所有任务已分配完毕
-                break 
+    while True:
+        try:
+            # 1. 从队列中获取标签任务 (非阻塞，超时 1 秒)
+            tag = tag_queue.get(timeout=1) 
+        except Exception:
+            # 队列为空，所有任务已分配完毕
+            break 
 
-            try:
-                print(f"\n[任务分配] Thread-{thread_id} 获得标签任务：【{tag}】")
-                spider.crawl_page(tag, csv_path)
-                print(f"[任务完成] Thread-{thread_id} 标签【{tag}】处理完毕。")
-            except Exception as e:
-                print(f"[✗] Thread-{thread_id} 爬取任务中发生未捕获异常：{e}")
-            finally:
-                # 任务完成，通知队列
-                tag_queue.task_done()
-                
-    finally:
-        # 确保 WebDriver 在线程退出前被关闭
-        if spider:
-            spider.close()
-        print(f"--- Thread-{thread_id} 退出。")
+        try:
+            print(f"\n[任务分配] Thread-{thread_id} 获得标签任务：【{tag}】")
+            with pool.tab() as driver:
+                creativemarket(driver).crawl_page(tag, csv_path)
+            print(f"[任务完成] Thread-{thread_id} 标签【{tag}】处理完毕。")
+        except Exception as e:
+            print(f"[✗] Thread-{thread_id} 爬取任务中发生未捕获异常：{e}")
+        finally:
+            # 任务完成，通知队列
+            tag_queue.task_done()
+            
+    print(f"--- Thread-{thread_id} 退出。")
 
 
 class CrawlerManager:
     """
     管理多线程爬取任务的中央调度器。
     """
-    def __init__(self, driver_path: str, tags_file: str, csv_output: str, max_threads: int):
+    def __init__(self, driver_path: str, tags_file: str, csv_output: str, max_threads: int,
+                 browser_count: int = BROWSER_COUNT):
         self.driver_path = driver_path
+        self.browser_count = browser_count
         self.tags_file = tags_file
         self.csv_output = csv_output
         self.max_threads = max_threads
@@ -440,7 +389,13 @@ class CrawlerManager:
             print("[致命错误] 没有标签任务，爬虫终止。")
             return
             
-        print(f"--- 找到 {len(tags)} 个标签，准备启动 {self.max_threads} 个线程。")
+        print(f"--- 找到 {len(tags)} 个标签，准备启动 {self.max_threads} 个线程，"
+              f"共享 {self.browser_count} 个浏览器。")
+
+        # 所有线程共享少数几个 Chrome，每个线程任务借用其中一个窗口（启动失败的窗口在借用时重试）
+        pool = TabPool(make_options, lambda: Service(executable_path=self.driver_path),
+                       size=self.max_threads, browsers=self.browser_count,
+                       capabilities=SESSION_CAPABILITIES)
 
         # 将所有标签放入任务队列
         for tag in tags:
@@ -451,7 +406,7 @@ class CrawlerManager:
             # 传递 worker_task 所需的共享和独立资源
             t = threading.Thread(
                 target=worker_task, 
-                args=(TAG_QUEUE, self.driver_path, self.csv_output),
+                args=(TAG_QUEUE, pool, self.csv_output),
                 daemon=True # 设置为守护线程，主程序退出时线程也退出
             )
             threads.append(t)
@@ -459,7 +414,10 @@ class CrawlerManager:
             print(f"Manager 启动 Thread-{t.ident}...")
 
         # 阻塞主线程，直到队列中的所有任务完成
-        TAG_QUEUE.join() 
+        try:
+            TAG_QUEUE.join() 
+        finally:
+            pool.close()
         
         print("\n====================================")
         print("所有标签任务已分配并完成处理。")
@@ -17,6 +17,20 @@ from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.xhr_replay import XhrCapture
+
+# 只记录站点自身的 JSON/文本响应，第三方统计、CDN 图片等请求不取响应体
+XHR_PATTERNS = ['creativemarket.com/']
+XHR_MIME_TYPES = ('application/json', 'text/plain', 'text/html')
+XHR_WAIT = 5.0    # 等待目标 JSON 响应的最长秒数
+
+
+def _has_f_nw_r(req) -> bool:
+    text = req.text or ''
+    return '"f-nw-r":' in text and text.lstrip().startswith('{')
 
 
 class creativemarket:
@@ -48,6 +62,7 @@ class creativemarket:
         try:
             self.driver = webdriver.Chrome(service=service, options=options)
             self.driver.set_page_load_timeout(30)
+            self.xhr_capture = XhrCapture(self.driver, XHR_PATTERNS, XHR_MIME_TYPES)
             
         except WebDriverException as e:
             print(f"[致命错误] WebDriver 启动失败: {e}")
@@ -64,65 +79,20 @@ class creativemarket:
     # --- 数据提取和网络监听方法 ---
     def _get_xhr_json_with_f_nw_r(self) -> str:
         """
-        读取 Performance 日志，解析所有请求 ID，并循环获取响应体，直到找到包含 'f-nw-r' 键的 JSON。
+        增量读取 Performance 日志（只对 creativemarket.com 的 JSON/文本响应取响应体），
+        等待包含 'f-nw-r' 键的 JSON，最多等待 XHR_WAIT 秒。
         """
-        requests_info = {}
-
         try:
-            time.sleep(1) 
-            logs = self.driver.get_log('performance')
+            req = self.xhr_capture.wait_for(_has_f_nw_r, timeout=XHR_WAIT, with_body=True)
         except Exception as e:
-            print(f"[✗] 无法获取 Performance 日日志，可能是驱动不支持: {e}")
+            print(f"[✗] 无法获取 Performance 日志，可能是驱动不支持: {e}")
             return ""
 
-        for log_entry in logs:
-            try:
-                message_data = json.loads(log_entry['message'])
-                message = message_data['message']
-                method = message.get('method')
-                params = message.get('params')
-                request_id = params.get('requestId')
-                
-                if not request_id:
-                    continue
-                
-                if method == 'Network.responseReceived':
-                    response = params.get('response')
-                    if response and response['mimeType'] in ['application/json', 'text/plain', 'text/html']: 
-                        requests_info[request_id] = {'loaded': False, 'url': response['url']}
-                        
-                elif method == 'Network.loadingFinished' and request_id in requests_info:
-                    requests_info[request_id]['loaded'] = True
-
-            except Exception:
-                continue
-        
-        if not requests_info:
+        if req is None:
+            print("[✗] 检查了所有已完成的 API 响应，未找到包含 \"f-nw-r\": 键的 JSON 文本。")
             return ""
-
-        for request_id, info in requests_info.items():
-            if info['loaded']:
-                try:
-                    response = self.driver.execute_cdp_cmd(
-                        'Network.getResponseBody', 
-                        {'requestId': request_id}
-                    )
-                    
-                    body = response['body']
-                    
-                    if '"f-nw-r":' in body and body.strip().startswith('{'):
-                        print(f"[√] 成功通过 Performance Log 捕获目标 JSON 响应！URL: {info['url'][:80]}...")
-                        
-                        if response.get('base64Encoded'):
-                            import base64
-                            return base64.b64decode(body).decode('utf-8', errors='ignore')
-                        return body
-                        
-                except Exception:
-                    continue
-        
-        print("[✗] 检查了所有已完成的 API 响应，未找到包含 \"f-nw-r\": 键的 JSON 文本。")
-        return ""
+        print(f"[√] 成功通过 Performance Log 捕获目标 JSON 响应！URL: {req.url[:80]}...")
+        return req.text
 
 
     def _extract_base64_paths(self) -> List[Tuple[str, str, str]]:
@@ -6,6 +6,18 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
 import os, time, hashlib, redis, csv, threading, random, re, urllib.parse, sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.dom_extract import largest_srcset_url
+from spider_common.scroll_loader import ScrollLoader
+
+# 卡片字段（一次 execute_script 提取）：img 的 src / data-src / srcset，标题优先 a.link，备用 figcaption
+CARD_FIELDS = {
+    'src': (('img', 'src'), ('img', 'data-src')),
+    'srcset': (('img', 'srcset'),),
+    'title': (('div.collection-object_title__1MnJJ a.collection-object_link__qM3YR', 'text'),),
+    'caption': (('figcaption', 'text'),),
+}
 
 
 class metmuseum:
@@ -52,98 +64,29 @@ class metmuseum:
             print("[✗] 页面加载超时，找不到主图片容器。")
             return
 
-        # === 分步平滑滚动加载（在你原来思路上增强判断） ===
+        # === 分步滚动加载：每轮新卡片插入且 DOM 安静后即继续滚动，连续 2 轮无新卡片且到底部时停止 ===
         SCROLL_STEP = 1080  # 每次滚动像素
-        MAX_IDLE_ROUNDS = 2  # 当多次滚动页面高度没有变化则停止
-        scroll_round = 0
-        idle_rounds = 0
-        last_height = self.driver.execute_script("return document.body.scrollHeight")
-        window_height = self.driver.execute_script("return window.innerHeight;")
-
         print(f"🚀 开始分步滚动加载 (step={SCROLL_STEP}px)...")
-        while True:
-            scroll_round += 1
-            # 计算新的位置并滚动
-            new_pos = min(last_height, (scroll_round * SCROLL_STEP))
-            self.driver.execute_script(f"window.scrollTo(0, window.pageYOffset + {SCROLL_STEP});")
-            time.sleep(1.0 + random.random() * 1.0)  # 随机等待，降低被阻断的概率
-
-            current_height = self.driver.execute_script("return document.body.scrollHeight")
-            current_offset = self.driver.execute_script("return window.pageYOffset;")
-
-            # 打印进度（简短）
-            # print(f"  scroll_round={scroll_round}, offset={current_offset}, pageHeight={current_height}")
-
-            # 如果页面高度增加，重置 idle 计数
-            if current_height > last_height:
-                idle_rounds = 0
-                last_height = current_height
-            else:
-                idle_rounds += 1
-
-            # 到达底部判断：offset + window_height >= total_height - small_margin
-            if (current_offset + window_height) >= (current_height - 20):
-                print(f"✅ 检测到滚动到底部 (offset+win >= total). rounds={scroll_round}")
-                break
-
-            if idle_rounds >= MAX_IDLE_ROUNDS:
-                print(f"✅ 停止滚动：已连续 {idle_rounds} 次没有发现页面高度变化。")
-                break
-
-            # 安全上限，避免无限循环
-            if scroll_round >= 80:
-                print("⚠️ 达到最大滚动次数，停止滚动以避免无限循环。")
-                break
-
-        # === 滚动加载结束，开始提取 ===
-        post_containers = self.driver.find_elements(By.CSS_SELECTOR, self.main_container_selector)
-        last_count = len(post_containers)
-        print(f"🖼️ 共检测到 {last_count} 个图片容器。")
+        loader = ScrollLoader(self.driver, self.main_container_selector, CARD_FIELDS,
+                              step=SCROLL_STEP, idle_rounds=2, max_rounds=80)
+        cards = loader.load_all()
+        if loader.rounds_done >= loader.max_rounds:
+            print("⚠️ 达到最大滚动次数，停止滚动以避免无限循环。")
+        else:
+            print(f"✅ 停止滚动：已连续 2 轮没有新卡片 (bottom={loader.reached_bottom}). rounds={loader.rounds_done}")
+        print(f"🖼️ 共检测到 {len(cards)} 个图片容器。")
 
         successful_writes = 0
-        for idx, card_ele in enumerate(post_containers):
+        for idx, card in enumerate(cards):
             try:
-                # 尝试多种方式获取图片元素 / 链接
-                img_ele = None
-                try:
-                    img_ele = card_ele.find_element(By.TAG_NAME, 'img')
-                except NoSuchElementException:
-                    # 如果没有 img，可寻找 background-image 或 a>img 之类
-                    try:
-                        img_ele = card_ele.find_element(By.CSS_SELECTOR, 'div img')
-                    except NoSuchElementException:
-                        img_ele = None
-
-                if not img_ele:
-                    print(f"[跳过] 容器序号 {idx}：未找到 img 元素。")
-                    continue
-
-                # 先尝试 src，再尝试 data-src 或 srcset
-                image_url = img_ele.get_attribute('src') or img_ele.get_attribute('data-src') or ''
-                if not image_url:
-                    srcset = img_ele.get_attribute('srcset') or ''
-                    if srcset:
-                        # 从 srcset 中选最大的 (通常最后一个)
-                        parts = [p.strip() for p in srcset.split(',') if p.strip()]
-                        if parts:
-                            last = parts[-1].split()[0]
-                            image_url = last
-
+                # 先尝试 src，再尝试 data-src 或 srcset（从 srcset 中选最大的）
+                image_url = card['src'] or largest_srcset_url(card['srcset'])
                 if not image_url:
                     print(f"[跳过] 容器序号 {idx}：图片 URL 为空。")
                     continue
 
-                # --- 提取标题（优先从 a.link 或 caption） ---
-                try:
-                    title_ele = card_ele.find_element(By.CSS_SELECTOR, 'div.collection-object_title__1MnJJ a.collection-object_link__qM3YR')
-                    title = title_ele.text.strip()
-                except NoSuchElementException:
-                    # 备用： figcaption 直接文本
-                    try:
-                        figcap = card_ele.find_element(By.TAG_NAME, 'figcaption')
-                        title = figcap.text.splitlines()[0].strip() if figcap.text else "NAN"
-                    except Exception:
-                        title = "NAN"
+                # --- 提取标题（优先从 a.link，备用 figcaption 第一行） ---
+                title = card['title'] or (card['caption'].splitlines()[0].strip() if card['caption'] else "NAN")
 
                 # --- 清理图片 URL (把常见的移动尺寸替换为 original) ---
                 # 例如: .../mobile-large/DP701752.jpg  -> .../original/DP701752.jpg
@@ -170,7 +113,7 @@ class metmuseum:
             except Exception as e:
                 print(f"[✗] 容器序号 {idx} 提取图片信息失败: {e}")
 
-        print(f"✅ 【{tag}】本页共检测 {len(post_containers)} 个容器，成功写入 {successful_writes} 条记录。")
+        print(f"✅ 【{tag}】本页共检测 {len(cards)} 个容器，成功写入 {successful_writes} 条记录。")
 
     # ---------------------- 去重逻辑 ----------------------
     def is_duplicate(self, md5_hash):
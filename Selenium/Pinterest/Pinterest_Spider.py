@@ -6,12 +6,24 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import TimeoutException
-import os, time, hashlib, redis, csv, threading, random, urllib.parse
+import os, redis, csv, threading, urllib.parse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.dedup import DedupSet, md5_hex
+from spider_common.fingerprint import md5_fingerprint
+from spider_common.scroll_loader import ScrollLoader
 
 # ---------- 全局滚动策略 ----------
 MAX_SCROLLS = 200
 NO_NEW_ROUNDS_TO_STOP = 2
-SCROLL_WAIT_RANGE = (1.5, 3.5)
+# 图片元素本身就是卡片：取 srcset / src / alt
+IMAGE_SELECTOR = 'img[srcset], img[src]'
+IMAGE_FIELDS = {
+    'srcset': (('', 'srcset'),),
+    'src': (('', 'src'),),
+    'alt': (('', 'alt'),),
+}
 
 class PinterestSpider:
     def __init__(self, chrome_driver_path, use_headless=True, redis_host='localhost', redis_port=6379):
@@ -40,28 +52,16 @@ class PinterestSpider:
         self.base_url = 'https://za.pinterest.com/'
         self.csv_lock = threading.Lock()
         self.redis_key = 'image_md5_set_pinterest'
-        self.visited_md5 = set()
 
         try:
             self.redis = redis.Redis(host=redis_host, port=redis_port, db=0, decode_responses=True)
             self.redis.ping()
             print("✅ Redis 连接成功。")
         except Exception as e:
-            print(f"⚠️ Redis 初始化失败 ({e})，使用内存去重。")
+            print(f"⚠️ Redis 初始化失败 ({e})，使用本地去重文件。")
             self.redis = None
-
-    # ---------------------- JS 抓取图片 ----------------------
-    def get_all_image_data_js(self):
-        js = """
-        const imgs = Array.from(document.querySelectorAll('img[srcset], img[src]'));
-        return imgs.map(img => {
-            const srcset = img.getAttribute('srcset') || '';
-            const src = img.getAttribute('src') || '';
-            const alt = img.getAttribute('alt') || '';
-            return { srcset, src, alt };
-        });
-        """
-        return self.driver.execute_script(js)
+        # 成员为图片 URL 的 MD5，每轮滚动抓到的一批图片一次 Redis 往返
+        self.dedup = DedupSet.fingerprinted(self.redis, self.redis_key, md5_fingerprint, legacy_member=md5_hex)
 
     # ---------------------- 清除遮挡层 ----------------------
     def remove_overlays(self):
@@ -86,22 +86,6 @@ class PinterestSpider:
         if removed:
             print(f"[清理] 已移除 {removed} 个遮罩层。")
 
-    # ---------------------- 等待图片懒加载稳定 ----------------------
-    def wait_for_images_stable(self, timeout=8):
-        prev_count = 0
-        stable_rounds = 0
-        for _ in range(int(timeout * 2)):
-            curr_count = len(self.driver.find_elements(By.CSS_SELECTOR, "img[srcset], img[src]"))
-            if curr_count == prev_count:
-                stable_rounds += 1
-                if stable_rounds >= 3:
-                    print(f"[√] 图片数稳定: {curr_count}")
-                    break
-            else:
-                stable_rounds = 0
-            prev_count = curr_count
-            time.sleep(0.5)
-
     # ---------------------- 高分辨率 URL 选择 ----------------------
     def get_highest_res_url(self, srcset_str, src_url):
         urls = []
@@ -119,22 +103,6 @@ class PinterestSpider:
             return src_url.replace('/236x/', '/736x/').replace('/474x/', '/736x/')
         return None
 
-    # ---------------------- 去重逻辑 ----------------------
-    def is_duplicate(self, md5_hash):
-        if self.redis:
-            try:
-                if self.redis.sismember(self.redis_key, md5_hash):
-                    return True
-                self.redis.sadd(self.redis_key, md5_hash)
-                return False
-            except Exception as e:
-                print(f"⚠️ Redis 出错 ({e})，改用内存。")
-                self.redis = None
-        if md5_hash in self.visited_md5:
-            return True
-        self.visited_md5.add(md5_hash)
-        return False
-
     # ---------------------- CSV 写入 ----------------------
     def write_to_csv(self, title, name, url, csv_path, tag):
         try:
@@ -161,33 +129,36 @@ class PinterestSpider:
             print("[✗] 页面加载超时。")
             return False
 
-        scroll_cycle = 0
+        # 滚到底部后等新图片插入、DOM 安静即读取，每轮只返回新出现的 img，不再固定等待
+        self.remove_overlays()
+        loader = ScrollLoader(self.driver, IMAGE_SELECTOR, IMAGE_FIELDS, max_rounds=MAX_SCROLLS,
+                              idle_rounds=NO_NEW_ROUNDS_TO_STOP)
         no_new_rounds = 0
 
-        while scroll_cycle < MAX_SCROLLS:
-            print(f"\n==== 第 {scroll_cycle + 1} 次滚动 ====")
+        for image_data_list in loader.rounds():
+            print(f"\n==== 第 {loader.rounds_done} 次滚动 ====")
             self.remove_overlays()
+            print(f"[INFO] JS 抓取到 {len(image_data_list)} 张新图片。")
 
-            image_data_list = self.get_all_image_data_js()
-            print(f"[INFO] JS 抓取到 {len(image_data_list)} 张图片。")
-
-            written = 0
+            candidates = []
             for img_data in image_data_list:
                 srcset = img_data.get('srcset', '')
                 src = img_data.get('src', '')
                 alt = img_data.get('alt', '')
                 image_url = self.get_highest_res_url(srcset, src)
-                if not image_url:
-                    continue
+                if image_url:
+                    candidates.append((alt, image_url))
 
-                md5_hash = hashlib.md5(image_url.encode('utf-8')).hexdigest()
-                if self.is_duplicate(md5_hash):
+            written = 0
+            duplicate_mask = self.dedup.check_and_add_many([url for _, url in candidates])
+            for (alt, image_url), is_duplicate in zip(candidates, duplicate_mask):
+                if is_duplicate:
                     continue
 
                 title = alt or "N/A"
                 image_name = os.path.basename(urllib.parse.urlparse(image_url).path)
                 if not image_name:
-                    image_name = md5_hash + ".jpg"
+                    image_name = md5_hex(image_url) + ".jpg"
 
                 self.write_to_csv(title, image_name, image_url, csv_path, tag)
                 written += 1
@@ -199,18 +170,11 @@ class PinterestSpider:
             else:
                 no_new_rounds = 0
 
+            # 虚拟列表会重新渲染旧图片，连续几轮全是重复图片时同样结束
             if no_new_rounds >= NO_NEW_ROUNDS_TO_STOP:
                 print("[完成] 已连续无新内容，结束滚动。")
                 break
 
-            # 滚动到底部并等待新图片加载
-            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            self.wait_for_images_stable()
-            wait_time = random.uniform(*SCROLL_WAIT_RANGE)
-            print(f"[等待] 滚动后等待 {wait_time:.2f} 秒...")
-            time.sleep(wait_time)
-            scroll_cycle += 1
-
         print(f"[√] '{tag}' 抓取完成。")
         return True
 
@@ -3,11 +3,13 @@ import os
 import re
 import threading
 from concurrent.futures import ThreadPoolExecutor
-from PIL import Image
-import io
 import time
-import requests
 import urllib3
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.download import download_file, ContentTypeError
 
 # 禁用 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -16,8 +18,6 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 current = 0
 lock = threading.Lock()
 total = 0
-# 定义重定向目标，用于 requests 检查
-REDIRECT_TARGET = 'https://wallpaperswide.com/' 
 
 # --- 工具函数 ---
 def sanitize_filename(s):
@@ -43,7 +43,7 @@ def download_image_by_request(args):
     if ext not in [".jpg", ".jpeg", ".png", ".webp", ".bmp"]:
          # 尝试根据 headers 确定，否则默认 .png
         try:
-            head_response = requests.head(url, timeout=10, verify=False)
+            head_response = http_client.head(url, timeout=10, verify=False)
             content_type = head_response.headers.get('content-type', '').lower()
             if 'jpeg' in content_type or 'jpg' in content_type:
                 ext = ".jpg"
@@ -96,43 +96,25 @@ def download_image_by_request(args):
     }
 
     try:
-        # 直接使用 verify=False 和更长的超时时间（因为没有重试）
-        response = requests.get(
+        # 流式写入临时文件后重命名；大文件且服务器支持 Range 时自动分段并行下载
+        # 直链被重定向到主页时返回的是 HTML，按 Content-Type 识别后跳过
+        download_file(
             url,
+            full_path,
             headers=headers,
             timeout=120, # 增加超时时间以应对网络慢的情况
-            proxies={"http": None, "https": None},
-            verify=False 
+            verify=False,
+            retries=0,
+            reject_content_types=("html",),
         )
-        
-        # 检查重定向 
-        if response.url.startswith(REDIRECT_TARGET):
-            record_status("❌跳过", f"直链重定向到主页: {response.url}")
-            return False
-
-        response.raise_for_status() # 检查HTTP状态码
-
+    except ContentTypeError as e:
+        record_status("❌跳过", f"直链重定向到主页: {e}")
+        return False
     except Exception as e:
         # 下载失败，直接记录失败并跳过
         record_status("❌失败", f"下载错误: {e.__class__.__name__} - {e}")
         return False
 
-    # 保存文件逻辑
-    try:
-        # 尝试用 PIL 打开和保存
-        image = Image.open(io.BytesIO(response.content))
-        # 根据推断出的扩展名选择保存格式
-        image_format = "PNG" if ext == ".png" else ("JPEG" if ext in ['.jpg', '.jpeg'] else "WEBP")
-        image.save(full_path, image_format)
-    except Exception as e:
-        # 如果 PIL 失败，直接写入文件内容
-        try:
-            with open(full_path, "wb") as f:
-                f.write(response.content)
-        except Exception as file_e:
-             record_status("❌失败", f"保存/写入文件失败: {file_e}")
-             return False
-
     record_status("✅成功")
     return True
 
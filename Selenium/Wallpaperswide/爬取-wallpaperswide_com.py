@@ -15,6 +15,16 @@ import random
 import re 
 import urllib.parse 
 from urllib.parse import urlparse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.dom_extract import extract_cards
+
+# 卡片字段（一次 execute_script 提取）：a[itemprop="significantLinks"] 内 img 的 alt 和缩略图地址
+CARD_FIELDS = {
+    'alt': (('a[itemprop="significantLinks"] img', 'alt'),),
+    'src': (('a[itemprop="significantLinks"] img', 'src'),),
+}
 
 class wallpaperswide:
     def __init__(self, chrome_driver_path):
@@ -56,7 +66,7 @@ class wallpaperswide:
         self.target_resolution = "2560x1440" # 可根据需要修改，默认 5K 5120x2880 分辨率，适合大多数高分屏幕，也可改为 "3840x2160" (4K) 或 "2560x1440" (2K)
 
     def scroll_and_load_images(self):
-        """滚动页面，加载所有图片元素，返回图片卡片元素列表"""
+        """滚动页面，加载所有图片元素，返回图片卡片字段列表（extract_cards 一次取回）"""
         image_card_selector = 'li.wall'
         wait = WebDriverWait(self.driver, 20)
         try:
@@ -86,18 +96,18 @@ class wallpaperswide:
                 print(f"滚动到第 {current_count} 个元素，继续加载...")
             last_count = current_count
             time.sleep(random.uniform(2.0, 4.0))
-        image_elements = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-        print(f"找到 {len(image_elements)} 个图片卡片进行解析。")
-        return image_elements
+        cards = extract_cards(self.driver, image_card_selector, CARD_FIELDS)
+        print(f"找到 {len(cards)} 个图片卡片进行解析。")
+        return cards
 
-    def parse_and_save_images(self, image_elements, tag, csv_path):
-        """解析图片卡片元素，提取信息并保存"""
-        for card_ele in image_elements:
+    def parse_and_save_images(self, cards, tag, csv_path):
+        """解析图片卡片字段，提取信息并保存"""
+        for card in cards:
             try:
-                a_element = card_ele.find_element(By.CSS_SELECTOR, 'a[itemprop="significantLinks"]')
-                img_element = a_element.find_element(By.TAG_NAME, 'img')
-                title = img_element.get_attribute('alt').split(' 4K UHD Wallpaper')[0].strip()
-                image_url = img_element.get_attribute('src')
+                if not card['src']:
+                    continue
+                title = card['alt'].split(' 4K UHD Wallpaper')[0].strip()
+                image_url = card['src']
                 image_url_cleaned = image_url.replace('/thumbs/', '/download/')
                 image_url_cleaned = image_url_cleaned.replace('-t1.jpg', f'-{self.target_resolution}.jpg')
                 if image_url_cleaned and title:
@@ -117,9 +127,9 @@ class wallpaperswide:
     def get_images(self, tag, csv_path):
         """解析当前页面上的图片信息，处理滚动加载并存储 URL 和标题"""
         print(f"--- 正在解析【{tag}】的图片列表...")
-        image_elements = self.scroll_and_load_images()
-        if image_elements:
-            self.parse_and_save_images(image_elements, tag, csv_path)
+        cards = self.scroll_and_load_images()
+        if cards:
+            self.parse_and_save_images(cards, tag, csv_path)
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """使用 pandas 写入 CSV，支持断点续写和更强的数据处理能力"""
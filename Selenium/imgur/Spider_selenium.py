@@ -1,14 +1,16 @@
 import os
-import csv
 import time
 import redis
 import urllib3
-import requests
-from threading import Lock
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_sink import open_record_sink
 
 
 # === 常量配置 ===
@@ -27,7 +29,7 @@ class ImgurCrawler:
     def __init__(self, csv_dir_path, csv_filename, redis_host=REDIS_HOST, redis_port=REDIS_PORT):
         self.csv_dir_path = csv_dir_path
         self.csv_path = os.path.join(self.csv_dir_path, csv_filename)
-        self.csv_lock = Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'TAG'], site='imgur')
 
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -60,25 +62,14 @@ class ImgurCrawler:
             return False
 
     def write_to_csv(self, title, name, url, tag):
-        """写入 CSV"""
-        try:
-            with self.csv_lock:
-                os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
-                is_file_empty = not os.path.exists(self.csv_path) or os.stat(self.csv_path).st_size == 0
-
-                with open(self.csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if is_file_empty:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'TAG'])
-                    writer.writerow([title, name, url, tag])
-        except Exception as e:
-            print(f"[{tag}] [✗] 写入 CSV 出错: {e}")
+        """写入 CSV（交给后台写入线程，立即返回）"""
+        self.csv_sink.write(self.csv_path, [title, name, url, tag])
 
     def fetch_tag_page(self, tag, page):
         """请求单页"""
         api_url = f"https://api.imgur.com/post/v1/posts/t/{tag}?client_id={CLIENT_ID}&filter%5Bwindow%5D=week&include=adtiles%2Cadconfig%2Ccover&location=desktoptag&page={page}&sort=-viral"
         try:
-            response = requests.get(api_url, headers=self.headers, timeout=10, verify=False)
+            response = http_client.get(api_url, headers=self.headers, timeout=10, verify=False)
             if response.status_code == 404:
                 return None
             data = response.json()
@@ -126,6 +117,7 @@ class ImgurCrawler:
             futures = [executor.submit(self.crawl_tag, tag.strip()) for tag in tags if tag.strip()]
             for f in as_completed(futures):
                 f.result()
+        self.csv_sink.close()
 
 
 # === 启动 Selenium 打开主页 ===
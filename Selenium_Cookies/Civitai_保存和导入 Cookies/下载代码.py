@@ -1,11 +1,12 @@
 import os
-import csv
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 import random
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_tasks import iter_csv_rows, run_bounded
 
 # ---------------- 配置区 ----------------
 # 这是爬虫生成的 CSV 文件的目录
@@ -36,22 +37,7 @@ class Downloader:
         self.failed_count = 0
         self.total_tasks = 0
 
-    def get_session(self):
-        """配置带有重试机制的 requests.Session"""
-        session = requests.Session()
-        # 设置重试策略
-        retry_strategy = Retry(
-            total=3,                # 总重试次数
-            backoff_factor=1,       # 重试之间的等待时间倍数 (1s, 2s, 4s...)
-            status_forcelist=[429, 500, 502, 503, 504],  # 触发重试的 HTTP 状态码
-            allowed_methods=["HEAD", "GET", "OPTIONS"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
-
-    def download_image(self, session, image_name, url, tag):
+    def download_image(self, image_name, url, tag):
         """下载单个图片并保存到文件"""
         file_path = os.path.join(DOWNLOAD_DIR_PATH, tag, image_name)
 
@@ -64,7 +50,7 @@ class Downloader:
             time.sleep(random.uniform(0.1, 0.5)) 
             
             # 使用流式下载 (stream=True) 配合分块写入
-            response = session.get(url, headers=HEADERS, timeout=TIMEOUT, stream=True)
+            response = http_client.get(url, headers=HEADERS, timeout=TIMEOUT, stream=True)
             response.raise_for_status()  # 如果状态码不是 200，则抛出异常
 
             # 确保子目录存在
@@ -90,37 +76,25 @@ class Downloader:
     def process_csv_file(self, csv_file_path, tag):
         """读取 CSV 文件并提交下载任务"""
         print(f"\n📂 正在读取文件: {tag}.csv")
-        tasks = []
-        with open(csv_file_path, 'r', newline='', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            next(reader)  # 跳过表头
-            
-            for row in reader:
-                if len(row) >= 2:
-                    image_name = row[0]
-                    url = row[1]
-                    tasks.append((image_name, url, tag))
-
-        self.total_tasks += len(tasks)
-        print(f"    - 发现 {len(tasks)} 条下载任务。")
-
-        session = self.get_session()
-        
+        # CSV 列结构: ['ImageName', 'URL', 'TAG']，边读边提交，在途任务有上限
+        tasks = ((row['ImageName'], row['URL'], tag)
+                 for row in iter_csv_rows(csv_file_path, required=['ImageName', 'URL']))
+
+        def on_done(task, result, exc):
+            self.total_tasks += 1
+            if result == 1:
+                self.downloaded_count += 1
+            elif exc:
+                self.failed_count += 1
+            # 实时显示进度
+            if (self.downloaded_count + self.failed_count) % 10 == 0:
+                print(f"    -> 进度: {self.downloaded_count}/{self.total_tasks} 成功 | {self.failed_count} 失败", end='\r')
+
+        # 连接池与重试策略 (429/5xx 指数退避) 由共享的 http_client 统一配置
         # 使用线程池并发下载
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_download = {
-                executor.submit(self.download_image, session, name, url, tag): name 
-                for name, url, tag in tasks
-            }
-            
-            for future in as_completed(future_to_download):
-                result = future.result()
-                if result == 1:
-                    self.downloaded_count += 1
-                
-                # 实时显示进度
-                if (self.downloaded_count + self.failed_count) % 10 == 0 or (self.downloaded_count + self.failed_count) == self.total_tasks:
-                     print(f"    -> 进度: {self.downloaded_count}/{self.total_tasks} 成功 | {self.failed_count} 失败", end='\r')
+        submitted = run_bounded(lambda task: self.download_image(*task), tasks,
+                                max_workers=MAX_WORKERS, on_done=on_done)
+        print(f"\n    - 共处理 {submitted} 条下载任务。")
 
 
     def run(self):
@@ -1,11 +1,10 @@
 import os
 import re
-import csv
+import sys
 import time
 import random
 import urllib.parse
 import hashlib
-import threading
 
 import redis
 from selenium import webdriver
@@ -14,13 +13,17 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys # 引入 Keys 模块
 from selenium.common.exceptions import (
     NoSuchElementException,
     WebDriverException,
     TimeoutException,
 )
 
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.scroll_loader import ScrollLoader
+
 # ----------------------------- 配置区（请根据需要修改路径） -----------------------------
 START_URL = 'https://www.civitai.com/'
 # ！！！请务必检查并修改以下路径！！！
@@ -29,7 +32,6 @@ USER_DATA_DIR = r"R:\py\Auto_Image-Spider\保存和导入 Cookies\civitai_data"
 PROFILE_DIR = "Default"    # profile 目录名（Default 或者 Profile 1 等）
 TAG_TXT_DIR = r'R:\py\Auto_Image-Spider\保存和导入 Cookies\civitai'  # 存放 tag.txt 的目录
 # 滚动与加载参数
-SMALL_SCROLL_AMOUNT = 1080  # 每次微调滚动的像素数
 MAX_SCROLLS = 200    # 最大滚动次数（防止死循环）
 # 当连续 N 轮没有新图片时就认为已到底部
 NO_NEW_ROUNDS_TO_STOP = 3    # 连续 N 轮无新图片时认为已到底部
@@ -78,7 +80,7 @@ class CivitaiSpider:
             self.seen_set = set()
 
         self.redis_key = REDIS_KEY
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Prompt', 'ImageName', 'URL', 'TAG'], site='civitai')
         self.base_url = START_URL
 
     # ... (辅助函数 _clean_url, _get_image_id_from_url, _md5, write_to_csv, get_images 保持不变)
@@ -103,19 +105,9 @@ class CivitaiSpider:
         return hashlib.md5(text.encode('utf-8')).hexdigest()
 
     def write_to_csv(self, prompt: str, name: str, url: str, csv_path: str, tag: str):
-        """以线程安全方式写入 CSV（带表头检测）"""
-        try:
-            with self.csv_lock:
-                file_exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(['Prompt', 'ImageName', 'URL', 'TAG'])
-                    writer.writerow([prompt, name, url, tag])
-                    f.flush()
-            print(f"[√] 已写入 CSV：{name}")
-        except Exception as e:
-            print(f"[✗] 写入 CSV 失败：{name} -> {e}")
+        """提交给后台写入线程（表头检测与批量落盘由后台写入器处理）"""
+        self.csv_sink.write(csv_path, [prompt, name, url, tag])
+        print(f"[√] 已加入 CSV 写入队列：{name}")
 
     def get_images(self, tag: str, csv_path: str, image_card_elements: list):
         """解析给定的一组图片卡片，提取图片 URL 并写入 CSV。"""
@@ -173,7 +165,7 @@ class CivitaiSpider:
     # ---------------------- 页面滚动并抓取直到稳定（强化滚动操作） ----------------------
     def crawl_page(self, search_url: str, tag: str, csv_path: str) -> bool:
         """
-        打开 search_url 并滚动加载图片，使用更可靠的键盘操作来确保滚动发生。
+        打开 search_url 并滚动加载图片，每轮只解析新出现的图片卡片。
         """
         wait = WebDriverWait(self.driver, 10)  # 等待超时设为 10 秒
         image_card_selector = 'div.relative.flex-1'  # 图片卡片选择器
@@ -191,94 +183,21 @@ class CivitaiSpider:
             print(f"[✗] 页面加载异常：{e}")
             return False
 
-        # ---------------------- 滚动主循环 (强化) ----------------------
-        scroll_cycle_count = 0
-        processed_count = 0
-        no_new_content_rounds = 0
-
-        # 在循环开始前尝试点击 body 元素，确保焦点在页面上
-        try:
-            self.driver.find_element(By.TAG_NAME, 'body').click()
-        except Exception:
-            pass # 忽略点击失败
-
-        while scroll_cycle_count < MAX_SCROLLS:
-            print(f"\n==== 开始第 {scroll_cycle_count + 1} 轮滚动周期和解析 ====")
-
-            # 1. 解析当前已加载但未处理的图片
-            all_elements = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-            current_count = len(all_elements)
-
-            if current_count > processed_count:
-                print(f"[INFO] 发现新加载的图片 (当前总数: {current_count})，进行解析...")
-                new_elements = all_elements[processed_count:]
-                self.get_images(tag, csv_path, new_elements)
-                processed_count = current_count
-            else:
-                 print("[INFO] 当前未发现新图片卡片。")
-
-            # 2. **强化滚动操作：使用键盘模拟 Page Down 或 End**
-            print("[INFO] 尝试使用 Page Down 模拟滚动...")
-            try:
-                # 尝试使用 END 键滚动到页面底部，这通常比 JavaScript 滚动更可靠
-                self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.END)
-                time.sleep(random.uniform(1.0, 2.0)) # 给予加载时间
-            except Exception as e:
-                print(f"[WARN] 键盘操作失败 ({e})，回退到 JavaScript 滚动...")
-                try:
-                    # 回退到 JavaScript 滚动到底部
-                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    time.sleep(random.uniform(1.0, 2.0))
-                except Exception as js_e:
-                    print(f"[FATAL] JavaScript 滚动也失败: {js_e}")
-                    break # 滚动失败，直接退出循环
-
-            # 3. 等待新内容出现 (逻辑保持不变，依靠元素总数)
-            try:
-                wait.until(
-                    lambda driver: len(driver.find_elements(By.CSS_SELECTOR, image_card_selector)) > processed_count
-                )
-                print("[√] 成功加载了新的一批图片！")
-                no_new_content_rounds = 0 
-
-            except TimeoutException:
-                # 10秒内没有新图片出现
-                no_new_content_rounds += 1
-                print(f"[⚠] 等待超时，未发现新图片。({no_new_content_rounds}/{NO_NEW_ROUNDS_TO_STOP})")
-
-                # 检查是否真的到底部
-                scroll_height = self.driver.execute_script("return document.body.scrollHeight")
-                current_scroll = self.driver.execute_script("return window.scrollY + window.innerHeight")
-                
-                if abs(scroll_height - current_scroll) < 50:
-                    print("[INFO] 滚动条已到达页面最底部。")
-                else:
-                    # 如果未到底部，尝试微调向下滚动
-                    self.driver.execute_script(f"window.scrollBy(0, {SMALL_SCROLL_AMOUNT});")
-                    print(f"[INFO] 未到底部，微调向下滚动 {SMALL_SCROLL_AMOUNT} 像素。")
-                    time.sleep(1) 
-
-                # 检查退出条件
-                if no_new_content_rounds >= NO_NEW_ROUNDS_TO_STOP:
-                    print(f"[完成] 已连续 {NO_NEW_ROUNDS_TO_STOP} 轮未发现新内容，判定'{tag}'已抓取完毕。")
-                    # 退出前再检查一次是否有未解析的元素
-                    all_elements_final = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-                    final_count = len(all_elements_final)
-                    if final_count > processed_count:
-                         print(f"[INFO] 退出前发现最后一批未解析的图片 ({final_count - processed_count} 张)，正在解析...")
-                         new_elements_final = all_elements_final[processed_count:]
-                         self.get_images(tag, csv_path, new_elements_final)
-                    break
-
-
-            scroll_cycle_count += 1
-            if scroll_cycle_count >= MAX_SCROLLS:
-                print(f"[⚠] 达到最大滚动次数 {MAX_SCROLLS}，强制停止。")
-                break
-
-            time.sleep(random.uniform(0.5, 1.5)) 
-
-        print(f"[√] 标签 '{tag}' 滚动抓取完成，共找到约 {processed_count} 张图片。")
+        # ---------------------- 滚动主循环（事件驱动） ----------------------
+        # 滚到底部后，新卡片插入且 DOM 安静即解析并继续滚动；没有新卡片时等到 DOM 与网络请求都安静，
+        # 连续 NO_NEW_ROUNDS_TO_STOP 轮无新卡片且已到底部时结束
+        loader = ScrollLoader(self.driver, image_card_selector, max_rounds=MAX_SCROLLS,
+                              idle_rounds=NO_NEW_ROUNDS_TO_STOP)
+        for new_elements in loader.rounds():
+            print(f"\n==== 第 {loader.rounds_done} 轮滚动：发现新加载的图片 (当前总数: {loader.total})，进行解析... ====")
+            self.get_images(tag, csv_path, new_elements)
+
+        if loader.rounds_done >= MAX_SCROLLS:
+            print(f"[⚠] 达到最大滚动次数 {MAX_SCROLLS}，强制停止。")
+        else:
+            print(f"[完成] 已连续 {NO_NEW_ROUNDS_TO_STOP} 轮未发现新内容，判定'{tag}'已抓取完毕。")
+
+        print(f"[√] 标签 '{tag}' 滚动抓取完成，共找到约 {loader.total} 张图片。")
         return True
 
     # ---------------------- 主流程 ----------------------
@@ -313,6 +232,7 @@ class CivitaiSpider:
                 print(f"[✗] 处理标签 {tag} 时发生异常：{e}")
                 continue
 
+        self.csv_sink.close()
         print("[√] 所有标签处理完毕，退出浏览器。")
 
 if __name__ == '__main__':
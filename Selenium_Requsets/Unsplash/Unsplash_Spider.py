@@ -6,9 +6,13 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import redis
 import redis.exceptions # 用于更具体的 Redis 异常处理
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.dom_extract import extract_cards, largest_srcset_url
 
 # ---------- 全局滚动策略常量（可根据需要调整） ----------
 MAX_SCROLLS = 100  # 最大的滚动次数限制，防止无限循环
@@ -17,6 +21,16 @@ SMALL_SCROLL_AMOUNT = 200   # 滚动量（像素）。用于在接近底部时
 # 🚀 新增：默认并发线程数
 DEFAULT_MAX_THREADS = 5 
 
+# 卡片字段（一次 execute_script 提取）：最高质量下载链接、IMG 备选地址、标题的三个来源
+CARD_FIELDS = {
+    'download': (("a[data-testid='non-sponsored-photo-download-button']", 'href'),),
+    'srcset': (('img', 'srcset'),),
+    'src': (('img', 'src'),),
+    'alt': (('img', 'alt'),),
+    'link_title': (('a.photoInfoLink-mG0SPO', 'title'),),
+    'caption': (('figcaption, .photo-info, .photoMeta', 'text'),),
+}
+
 
 class UnsplashSpider:
     """
@@ -69,115 +83,42 @@ class UnsplashSpider:
 
 
     # ---------------------- 增量解析新加载的图片元素 ----------------------
-    def get_images(self, tag, csv_path, elements):
+    def get_images(self, tag, csv_path, cards):
         """
-        解析图片卡片元素，提取图片URL、标题，进行去重并写入CSV。
-        集成了 Stale Element 引用失效的重试处理。
+        解析 extract_cards 返回的卡片字段，提取图片URL、标题，进行去重并写入CSV。
+        卡片字段在浏览器内一次取回，不再持有 WebElement，不会出现 Stale Element。
         """
         successful_writes = 0
-        for card_ele in elements:
-            
-            # 🚀 Stale Element 重试逻辑
-            max_retries = 2
-            attempt = 0
-            processed_successfully = False
-            
-            while attempt < max_retries and not processed_successfully:
-                try:
-                    # --- 原始的处理逻辑块 START ---
-                    
-                    # 【关键抓取元素 2：最高质量下载链接】
-                    image_url = None
-                    try:
-                        download_btn = card_ele.find_element(
-                            By.CSS_SELECTOR,
-                            "a[data-testid='non-sponsored-photo-download-button']"
-                        )
-                        image_url = download_btn.get_attribute('href') or ''
-                    except NoSuchElementException:
-                        pass
-                    
-                    # 【关键抓取元素 3：IMG 标签及 URL 备选方案】
-                    if not image_url:
-                        try:
-                            img_ele = card_ele.find_element(By.CSS_SELECTOR, 'img')
-                            # 优先 srcset
-                            srcset = img_ele.get_attribute('srcset') or ''
-                            if srcset:
-                                parts = [p.strip() for p in srcset.split(',') if p.strip()]
-                                if parts:
-                                    image_url = parts[-1].split()[0]
-                            if not image_url:
-                                image_url = img_ele.get_attribute('src') or ''
-                        except Exception:
-                            image_url = None
-
-                    if not image_url:
-                        processed_successfully = True # 标记为成功处理(跳过)，退出while
-                        continue
-
-                    # 规范化链接
-                    image_url_cleaned = urllib.parse.urljoin(self.base_url, image_url)
-
-                    # 【关键抓取元素 4：图片标题提取】
-                    title = "N/A"
-                    try:
-                        img_for_title = card_ele.find_element(By.CSS_SELECTOR, 'img')
-                        alt = img_for_title.get_attribute('alt') # 1. 优先 alt 属性
-                        if alt and alt.strip():
-                            title = alt.strip()
-                        else:
-                            a_link = card_ele.find_element(By.CSS_SELECTOR, 'a.photoInfoLink-mG0SPO') # 2. 备选：信息链接
-                            a_title = a_link.get_attribute('title')
-                            if a_title and a_title.strip():
-                                title = a_title.strip()
-                            elif title == "N/A": 
-                                try:
-                                    # 3. 最终备选：图注/说明文字
-                                    caption = card_ele.find_element(By.CSS_SELECTOR, 'figcaption, .photo-info, .photoMeta')
-                                    txt = caption.text.strip()
-                                    if txt:
-                                        title = txt
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
+        for card in cards:
+            try:
+                # 【关键抓取元素 2：最高质量下载链接】，【关键抓取元素 3：IMG 标签及 URL 备选方案】优先 srcset
+                image_url = card['download'] or largest_srcset_url(card['srcset']) or card['src']
+                if not image_url:
+                    continue
 
-                    # 去重：使用 URL 的 md5
-                    md5_hash = hashlib.md5(image_url_cleaned.encode('utf-8')).hexdigest()
-                    if self.is_duplicate(md5_hash):
-                        processed_successfully = True # 标记为成功处理(重复)，退出while
-                        continue
-
-                    # image name
-                    image_name = os.path.basename(urllib.parse.urlparse(image_url_cleaned).path)
-                    if not image_name or len(image_name) < 5:
-                        image_name = md5_hash + ".jpg"
-
-                    # 写入 CSV
-                    self.write_to_csv(title, image_name, image_url_cleaned, csv_path, tag)
-                    successful_writes += 1
-                    print(f"[{tag}] ✔️ 写入：{image_name}")
-                    
-                    processed_successfully = True # 标记为成功处理，退出while
-                    
-                    # --- 原始的处理逻辑块 END ---
+                # 规范化链接
+                image_url_cleaned = urllib.parse.urljoin(self.base_url, image_url)
 
-                except NoSuchElementException:
-                    print(f"[{tag}] [WARN] 元素结构异常，跳过当前卡片。")
-                    processed_successfully = True # 退出while
-                
-                except StaleElementReferenceException:
-                    attempt += 1
-                    print(f"[{tag}] [STALE] 元素引用失效，重试第 {attempt} 次...")
-                    time.sleep(0.5) # 短暂等待 DOM 稳定
-                    if attempt >= max_retries:
-                        print(f"[{tag}] [FAIL] 元素引用重试 {max_retries} 次后仍失效，跳过该元素。")
-                        processed_successfully = True # 退出while
-                
-                except Exception as e:
-                    print(f"[{tag}] [✗] 处理元素出错: {e}")
-                    processed_successfully = True # 退出while
+                # 【关键抓取元素 4：图片标题提取】1. alt 属性 2. 信息链接 title 3. 图注/说明文字
+                title = card['alt'] or card['link_title'] or card['caption'] or "N/A"
+
+                # 去重：使用 URL 的 md5
+                md5_hash = hashlib.md5(image_url_cleaned.encode('utf-8')).hexdigest()
+                if self.is_duplicate(md5_hash):
+                    continue
+
+                # image name
+                image_name = os.path.basename(urllib.parse.urlparse(image_url_cleaned).path)
+                if not image_name or len(image_name) < 5:
+                    image_name = md5_hash + ".jpg"
+
+                # 写入 CSV
+                self.write_to_csv(title, image_name, image_url_cleaned, csv_path, tag)
+                successful_writes += 1
+                print(f"[{tag}] ✔️ 写入：{image_name}")
+
+            except Exception as e:
+                print(f"[{tag}] [✗] 处理元素出错: {e}")
 
         return successful_writes
 
@@ -216,14 +157,11 @@ class UnsplashSpider:
 
         while scroll_cycle_count < MAX_SCROLLS:
             
-            # 1. 解析当前已加载但未处理的图片
-            all_elements = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-            current_count = len(all_elements)
-
-            if current_count > processed_count:
-                new_elements = all_elements[processed_count:]
-                written = self.get_images(tag, csv_path, new_elements)
-                processed_count = current_count
+            # 1. 解析当前已加载但未处理的图片（一次 execute_script 取回所有新卡片）
+            new_cards = extract_cards(self.driver, image_card_selector, CARD_FIELDS, start=processed_count)
+            if new_cards:
+                written = self.get_images(tag, csv_path, new_cards)
+                processed_count += len(new_cards)
             
             # 2. 滚动操作 (优先使用 END 键)
             try:
@@ -289,11 +227,10 @@ class UnsplashSpider:
                     print(f"[{tag}] [完成] 已连续 {NO_NEW_ROUNDS_TO_STOP} 轮未发现新内容，判定'{tag}'已抓取完毕。")
                     
                     # 退出前最后一次解析
-                    all_elements_final = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-                    final_count = len(all_elements_final)
-                    if final_count > processed_count:
-                        new_elements_final = all_elements_final[processed_count:]
-                        self.get_images(tag, csv_path, new_elements_final)
+                    new_cards_final = extract_cards(self.driver, image_card_selector, CARD_FIELDS, start=processed_count)
+                    if new_cards_final:
+                        self.get_images(tag, csv_path, new_cards_final)
+                        processed_count += len(new_cards_final)
                     break
 
             scroll_cycle_count += 1
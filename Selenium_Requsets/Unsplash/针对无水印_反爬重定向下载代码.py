@@ -14,6 +14,10 @@ from selenium.common.exceptions import (
 )
 import urllib3
 import glob
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # 导入 HEIC 支持
 from pillow_heif import register_heif_opener
@@ -163,7 +167,7 @@ def requests_downloader(url: str, target_folder: str, title: str) -> str | None:
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         }
-        response = requests.get(url, stream=True, timeout=30, headers=headers, verify=False)
+        response = http_client.get(url, stream=True, timeout=30, headers=headers, verify=False)
         response.raise_for_status() 
 
         content_type = response.headers.get('Content-Type', '')
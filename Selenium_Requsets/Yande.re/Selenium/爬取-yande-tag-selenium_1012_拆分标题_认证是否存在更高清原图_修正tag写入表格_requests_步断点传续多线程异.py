@@ -7,42 +7,85 @@ from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 # <--- 新增：导入并发处理库 --->
 from concurrent.futures import ThreadPoolExecutor
-import os, time, hashlib, redis, csv, threading, random, re, urllib.parse, requests
+import os, time, redis, threading, random, re, urllib.parse, requests
 from datetime import datetime, timedelta
+from lxml import etree
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
+from spider_common import http_client
+from spider_common.concurrency import AdaptiveConcurrency, BoundedExecutor
+from spider_common.dedup import DedupSet, md5_hex
+from spider_common.fingerprint import md5_fingerprint
+from spider_common.download import download_file, TEMP_SUFFIX
+from spider_common.csv_sink import open_record_sink
+from spider_common.parquet_sink import dataset_path, read_records
+from spider_common.catalog import Catalog
+
+
+def _has_class(name):
+    """XPath 条件：class 属性包含完整的类名 name（等价于 CSS 的 .name）"""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+# 与 main_container_selector 对应的 XPath，以及卡片内的原图链接 / 标题
+CARD_XPATH = '//div[@id="post-list-posts"]//li[starts-with(@id, "p")] | //div[@id="content"]//li[starts-with(@id, "p")]'
+CARD_HREF_XPATHS = (f'.//a[{_has_class("directlink")} and {_has_class("largeimg")}]/@href',
+                    './/a[contains(@href, "files.yande.re")]/@href')
+CARD_TITLE_XPATH = f'.//a[{_has_class("thumb")}]//img[{_has_class("preview")}]/@title'
+
+# 一次 execute_script 返回整页卡片（snapshot_mode='js'），a.href 已是绝对地址
+CARD_SNAPSHOT_JS = """
+return Array.from(document.querySelectorAll(arguments[0])).map(function (card) {
+    var link = card.querySelector('a.directlink.largeimg') || card.querySelector('a[href*="files.yande.re"]');
+    var img = card.querySelector('a.thumb img.preview');
+    return {href: link ? link.href : '', title: img ? (img.getAttribute('title') || '') : ''};
+});
+"""
 
 
 class yande_re:
-    def __init__(self, chrome_driver_path, use_headless=True, redis_host='localhost', redis_port=6379, download_workers=10, parser_workers=3, tag_workers=3):
+    def __init__(self, chrome_driver_path, use_headless=True, redis_host='localhost', redis_port=6379, download_workers=10, parser_workers=3, tag_workers=3, max_pending_downloads=None, snapshot_mode='html'):
         self.chrome_driver_path = chrome_driver_path
         self.use_headless = use_headless
         self.base_url = 'https://yande.re/'
-        self.csv_lock = threading.Lock()
+        # 后台线程批量写入 CSV，解析线程不再逐行加锁打开文件
+        self.csv_sink = open_record_sink(['Rating', 'Score', 'Tags', 'User', 'ImageName', 'URL', 'WeekLabel'], site='yande', partition_col='WeekLabel')
         self.redis_key = 'image_md5_set_yande.re'
         self.image_save_dir = ''
         self.progress_file_path = ''  # 将在main方法中设置
+        self.catalog = None  # 采集记录 / 进度的 SQLite 目录，将在main方法中按保存目录创建
         self.set_lock = threading.Lock()
         self.parser_workers = parser_workers
         self.download_workers = download_workers
         self.tag_workers = tag_workers
+        # 列表页提取方式：'html' 取一次 page_source 用 lxml 解析；'js' 一次 execute_script 返回所有卡片；
+        # 'elements' 为逐个卡片调用 find_element/get_attribute（每张卡片多次 WebDriver 往返）
+        self.snapshot_mode = snapshot_mode
         # 仅初始化下载线程池，解析线程池在每个tag任务中临时创建
-        self.download_executor = ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix='Downloader')
-        print(f"✅ 下载线程池已启动，最大线程数: {self.download_workers}")
+        # 排队的下载任务有上限：下载跟不上时 submit 阻塞，解析/补全线程随之放慢，不会堆积大量 Future
+        self.download_executor = BoundedExecutor(self.download_workers, max_pending_downloads or self.download_workers * 10,
+                                                 thread_name_prefix='Downloader')
+        print(f"✅ 下载线程池已启动，最大线程数: {self.download_workers}，排队上限: {self.download_executor.max_pending}")
+        # 每个图片 host 的实际并发按 429/503/超时自适应调整，不超过下载线程数
+        self.download_concurrency = AdaptiveConcurrency(initial=min(4, self.download_workers), max_limit=self.download_workers)
         self.main_container_selector = 'div#post-list-posts li[id^="p"], div#content li[id^="p"]'
         try:
             self.redis = redis.Redis(host=redis_host, port=redis_port, db=0, decode_responses=True)
             self.redis.ping()
             print("✅ Redis 连接成功。")
         except Exception:
-            print("⚠️ Redis 不可用，将使用内存去重。")
+            print("⚠️ Redis 不可用，将使用本地去重文件。")
             self.redis = None
-            self.visited_md5 = set()
+        # 成员为图片 URL 的 MD5；一页的卡片解析完后一次 Redis 往返完成去重
+        self.dedup = DedupSet.fingerprinted(self.redis, self.redis_key, md5_fingerprint, legacy_member=md5_hex)
 
     def resume_incomplete_downloads(self, csv_path):
-        import pandas as pd
-        if not os.path.exists(csv_path):
+        if not os.path.exists(csv_path) and not os.path.isdir(dataset_path(csv_path)):
             return
         try:
-            df = pd.read_csv(csv_path)
+            # CSV 或 Parquet 输出都可以读取，只加载需要的三列
+            df = read_records(csv_path, columns=['ImageName', 'WeekLabel', 'URL'])
         except Exception as e:
             print(f"[断点补全] 读取CSV失败: {e}")
             return
@@ -54,10 +97,18 @@ class yande_re:
                 continue
             safe_week_folder_name = re.sub(r'[\\/*?:"<>|]', '_', str(week_label))
             save_path = os.path.join(self.image_save_dir, safe_week_folder_name, image_name)
-            temp_path = save_path + ".downloading"
+            temp_path = save_path + TEMP_SUFFIX
             if not os.path.exists(save_path) or os.path.exists(temp_path):
-                print(f"[断点补全] 重新下载未完成图片: {image_name}")
+                print(f"[断点补全] 续传未完成图片: {image_name}")
                 self.download_executor.submit(self.download_image, image_url, save_path)
+        self.print_download_stats()
+
+    def print_download_stats(self):
+        """打印下载队列指标：排队/执行中的任务数，以及提交因队列已满而阻塞的次数和时长"""
+        s = self.download_executor.stats()
+        print(f"📊 [下载队列] 排队 {s['queued']} | 执行中 {s['running']} | 峰值 {s['peak_pending']}/{s['max_pending']} | "
+              f"已完成 {s['completed']}/{s['submitted']} | 背压阻塞 {s['blocked']} 次, {s['blocked_seconds']:.1f}s")
+
     def process_tag(self, tag, csv_path, enable_download=True):
         # 独立创建Selenium实例
         service = Service(executable_path=self.chrome_driver_path)
@@ -79,18 +130,22 @@ class yande_re:
             wait = WebDriverWait(driver, 30)
             wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.main_container_selector)))
             print("[√] 主图片容器加载完成。")
-            post_containers = driver.find_elements(By.CSS_SELECTOR, self.main_container_selector)
-            total_cards = len(post_containers)
-            print(f"🖼️ 共检测到 {total_cards} 个图片容器，开始并行处理...")
-            futures = []
-            for card_ele in post_containers:
-                future = parser_executor.submit(self.process_image_card, card_ele, tag, csv_path, enable_download)
-                futures.append(future)
-            processed_count = 0
-            for future in futures:
-                if future.result():
-                    processed_count += 1
+            if self.snapshot_mode == 'elements':
+                post_containers = driver.find_elements(By.CSS_SELECTOR, self.main_container_selector)
+                total_cards = len(post_containers)
+                print(f"🖼️ 共检测到 {total_cards} 个图片容器，开始并行处理...")
+                futures = [parser_executor.submit(self.process_image_card, card_ele, tag) for card_ele in post_containers]
+            else:
+                # 整页一次往返取回，解析线程不再访问 WebDriver
+                cards = self.snapshot_cards(driver)
+                total_cards = len(cards)
+                print(f"🖼️ 共检测到 {total_cards} 个图片容器（{self.snapshot_mode} 快照），开始并行处理...")
+                futures = [parser_executor.submit(self.process_card_snapshot, href, title, tag) for href, title in cards]
+            records = [future.result() for future in futures]
+            processed_count = self.save_new_records(records, csv_path, enable_download)
             print(f"✅ 标签【{tag}】处理完成: 成功处理 {processed_count}/{total_cards} 个图片")
+            if enable_download:
+                self.print_download_stats()
             self.mark_tag_as_processed(tag)
             delay = random.uniform(1, 3)
             print(f"⏳ 随机等待 {delay:.1f} 秒后处理下一个标签...")
@@ -101,47 +156,37 @@ class yande_re:
             parser_executor.shutdown(wait=True)
             driver.quit()
 
-    # 下载功能（已包含断点下载逻辑）
+    # 下载功能（HTTP Range 断点续传）
     def download_image(self, image_url, save_path):
-        temp_path = save_path + ".downloading"
         try:
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             if os.path.exists(save_path):
                 print(f"🟡 [已完成] 跳过: {os.path.basename(save_path)}")
                 return
-            if os.path.exists(temp_path):
-                print(f"� [断点续传] 检测到未完成下载，重新下载: {os.path.basename(save_path)}")
-                os.remove(temp_path)
+            if os.path.exists(save_path + TEMP_SUFFIX):
+                print(f"🔄 [断点续传] 检测到未完成下载，从已下载位置继续: {os.path.basename(save_path)}")
             print(f"\n📥 开始下载: {os.path.basename(save_path)}")
-            response = requests.get(image_url, stream=True, timeout=60)
-            response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            block_size = 8192
-            downloaded = 0
-            with open(temp_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=block_size):
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size:
-                        percent = int((downloaded / total_size) * 100)
-                        print(f"\r💾 下载进度: {percent}% [{downloaded}/{total_size} bytes]", end='', flush=True)
-            os.rename(temp_path, save_path)
+
+            def show_progress(downloaded, total_size):
+                if total_size:
+                    percent = int((downloaded / total_size) * 100)
+                    print(f"\r💾 下载进度: {percent}% [{downloaded}/{total_size} bytes]", end='', flush=True)
+
+            # 未完成的部分保留在 .downloading 文件中，网络中断后续传而不是从头下载
+            download_file(image_url, save_path, timeout=60, retries=2, chunk_size=8192, on_progress=show_progress,
+                          concurrency=self.download_concurrency)
             print(f"\n✅ 下载完成: {os.path.basename(save_path)}")
         except requests.exceptions.RequestException as e:
             print(f"❌ [下载失败] 网络请求错误: {e} | URL: {image_url}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
         except Exception as e:
             print(f"❌ [下载失败] 未知错误: {e} | 保存路径: {save_path}")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
 
     # 原图检测逻辑
     def get_hq_image_url(self, lowres_url):
         try:
             if "/jpeg/" in lowres_url or lowres_url.endswith(".jpg"):
                 hq_url = lowres_url.replace("/jpeg/", "/image/").rsplit(".", 1)[0] + ".png"
-                resp = requests.head(hq_url, timeout=10)    # 如果网络慢可以设置更大超时
+                resp = http_client.head(hq_url, timeout=10)    # 如果网络慢可以设置更大超时
                 if resp.status_code == 200:
                     print(f"🟢 检测到更高清原图: {hq_url[:100]}...") # 打印前100个字符，避免日志过长
                     return hq_url
@@ -187,6 +232,7 @@ class yande_re:
         post_containers = self.driver.find_elements(By.CSS_SELECTOR, self.main_container_selector)
         print(f"🖼️ 共检测到 {len(post_containers)} 个图片容器。")
 
+        records = []
         for idx, card_ele in enumerate(post_containers):
             try:
                 try:
@@ -209,26 +255,14 @@ class yande_re:
                 except NoSuchElementException:
                     title = "N/A"
 
-                rating, score, tags_text, user = self.parse_title_info(title)
-
-                md5_hash = hashlib.md5(image_url.encode('utf-8')).hexdigest()
-                if self.is_duplicate(md5_hash):
-                    continue
-
-                week_label = self.parse_tag_to_week_label(tag)
-                image_name = os.path.basename(urllib.parse.urlparse(image_url).path)
-                
-                # 写入CSV是快速操作，保持在主线程
-                self.write_to_csv(rating, score, tags_text, user, image_name, image_url, csv_path, week_label)
-
-                # <--- 修改：将下载任务提交到线程池，实现异步下载 --->
-                safe_week_folder_name = re.sub(r'[\\/*?:"<>|]', '_', week_label)
-                full_save_path = os.path.join(self.image_save_dir, safe_week_folder_name, image_name)
-                self.download_executor.submit(self.download_image, image_url, full_save_path)
+                records.append(self.build_record(image_url, title, tag))
 
             except Exception as e:
                 print(f"[✗] 提取失败 idx={idx}: {e}")
 
+        # <--- 修改：将下载任务提交到线程池，实现异步下载 --->
+        self.save_new_records(records, csv_path)
+
     # 标题解析
     def parse_title_info(self, title_text):
         rating, score, tags, user = "N/A", "N/A", "N/A", "N/A"
@@ -240,55 +274,59 @@ class yande_re:
             print(f"[⚠️] 标题解析失败: {e} | 原始: {title_text}")
         return rating.strip(), score.strip(), tags.strip(), user.strip()
 
-    # <--- 修改：为内存Set操作增加线程锁 --->
-    def is_duplicate(self, md5_hash):
-        if hasattr(self, 'redis') and self.redis:
-            try:
-                if not self.redis.sadd(self.redis_key, md5_hash): # sadd返回0表示已存在
-                    return True
-            except Exception as e:
-                print(f"⚠️ Redis 操作失败: {e}，临时使用内存去重。")
-                # Fallback to memory set with lock
-                with self.set_lock:
-                    if md5_hash in self.visited_md5:
-                        return True
-                    self.visited_md5.add(md5_hash)
-        else:
-            with self.set_lock:
-                if md5_hash in self.visited_md5:
-                    return True
-                self.visited_md5.add(md5_hash)
-        return False
+    def build_record(self, image_url, title, tag):
+        """由图片 URL 和卡片标题组成一条待写入的记录"""
+        rating, score, tags_text, user = self.parse_title_info(title)
+        return {
+            'rating': rating, 'score': score, 'tags': tags_text, 'user': user,
+            'image_name': os.path.basename(urllib.parse.urlparse(image_url).path),
+            'image_url': image_url,
+            'week_label': self.parse_tag_to_week_label(tag),
+        }
+
+    # <--- 修改：整页批量去重，SADD 原子地检查并标记，多个解析/标签线程之间没有竞争 --->
+    def save_new_records(self, records, csv_path, enable_download=True):
+        """去重后写入 CSV 并提交下载，返回新增记录数"""
+        records = [r for r in records if r]
+        duplicate_mask = self.dedup.check_and_add_many([r['image_url'] for r in records])
+        new_records = [r for r, is_duplicate in zip(records, duplicate_mask) if not is_duplicate]
+        if self.catalog:
+            self.catalog.add_images([{'url': r['image_url'], 'site': 'yande', 'tag': r['week_label'],
+                                      'title': r['tags'], 'name': r['image_name']} for r in new_records])
+        saved = 0
+        for record in new_records:
+            self.write_to_csv(record['rating'], record['score'], record['tags'], record['user'],
+                              record['image_name'], record['image_url'], csv_path, record['week_label'])
+            # 可选下载
+            if enable_download:
+                safe_week_folder_name = re.sub(r'[\\/*?:"<>|]', '_', record['week_label'])
+                full_save_path = os.path.join(self.image_save_dir, safe_week_folder_name, record['image_name'])
+                self.download_executor.submit(self.download_image, record['image_url'], full_save_path)
+            saved += 1
+        return saved
 
     # CSV写入
     def write_to_csv(self, rating, score, tags, user, name, url, csv_path, tag_label):
-        try:
-            with self.csv_lock:
-                is_file_empty = not os.path.exists(csv_path) or os.stat(csv_path).st_size == 0
-                os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if is_file_empty:
-                        writer.writerow(['Rating', 'Score', 'Tags', 'User', 'ImageName', 'URL', 'WeekLabel'])
-                    writer.writerow([rating, score, tags, user, name, url, tag_label])
-                    print(f"[✓] 已写入CSV 评分: {score} | URL: {url[:50]}... ")
-        except Exception as e:
-            print(f"[✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(csv_path, [rating, score, tags, user, name, url, tag_label])
+        print(f"[✓] 已加入CSV写入队列 评分: {score} | URL: {url[:50]}... ")
 
     # <--- 新增：断点爬取相关方法 --->
     def load_processed_tags(self):
-        """加载已处理的标签列表"""
+        """加载已处理的标签列表（进度文件与 SQLite 目录中的记录合并）"""
+        done_tags = self.catalog.done_tags('yande') if self.catalog else set()
         if not os.path.exists(self.progress_file_path):
-            return set()
+            return done_tags
         try:
             with open(self.progress_file_path, 'r', encoding='utf-8') as f:
-                return {line.strip() for line in f}
+                return {line.strip() for line in f} | done_tags
         except Exception as e:
             print(f"⚠️ 加载进度文件失败: {e}")
-            return set()
+            return done_tags
 
     def mark_tag_as_processed(self, tag):
         """将处理完成的标签写入进度文件"""
+        if self.catalog:
+            self.catalog.save_progress('yande', tag, done=True)
         try:
             with open(self.progress_file_path, 'a', encoding='utf-8') as f:
                 f.write(tag + '\n')
@@ -300,8 +338,34 @@ class yande_re:
         except Exception as e:
             print(f"⚠️ 写入进度文件失败: {e}")
 
-    def process_image_card(self, card_ele, tag, csv_path, enable_download=True):
-        """异步处理单个图片卡片"""
+    def snapshot_cards(self, driver):
+        """一次 WebDriver 往返取得整页卡片，返回 [(原图链接, 标题), ...]"""
+        if self.snapshot_mode == 'js':
+            cards = driver.execute_script(CARD_SNAPSHOT_JS, self.main_container_selector) or []
+            return [(card.get('href') or '', card.get('title') or '') for card in cards]
+        html = etree.HTML(driver.page_source)
+        if html is None:
+            return []
+        cards = []
+        for post_li in html.xpath(CARD_XPATH):
+            href = next((hrefs[0] for hrefs in (post_li.xpath(x) for x in CARD_HREF_XPATHS) if hrefs), '')
+            title = post_li.xpath(CARD_TITLE_XPATH)
+            cards.append((urllib.parse.urljoin(self.base_url, href) if href else '', title[0] if title else ''))
+        return cards
+
+    def process_card_snapshot(self, href, title, tag):
+        """解析线程中处理快照中的一张卡片（原图检测 + 标题解析），返回记录"""
+        try:
+            if not href:
+                return None
+            image_url = self.get_hq_image_url(href)
+            return self.build_record(image_url, title.strip() or "N/A", tag)
+        except Exception as e:
+            print(f"[✗] 处理图片卡片失败: {e}")
+            return None
+
+    def process_image_card(self, card_ele, tag):
+        """异步解析单个图片卡片，返回记录；去重、写入和下载在整页解析完后批量进行"""
         try:
             try:
                 img_ele = card_ele.find_element(By.CSS_SELECTOR, 'a.directlink.largeimg')
@@ -323,22 +387,7 @@ class yande_re:
             except NoSuchElementException:
                 title = "N/A"
 
-            rating, score, tags_text, user = self.parse_title_info(title)
-
-            md5_hash = hashlib.md5(image_url.encode('utf-8')).hexdigest()
-            if self.is_duplicate(md5_hash):
-                return None
-
-            week_label = self.parse_tag_to_week_label(tag)
-            image_name = os.path.basename(urllib.parse.urlparse(image_url).path)
-            # 写入CSV是快速操作，保持在主线程
-            self.write_to_csv(rating, score, tags_text, user, image_name, image_url, csv_path, week_label)
-            # 可选下载
-            if enable_download:
-                safe_week_folder_name = re.sub(r'[\\/*?:"<>|]', '_', week_label)
-                full_save_path = os.path.join(self.image_save_dir, safe_week_folder_name, image_name)
-                self.download_executor.submit(self.download_image, image_url, full_save_path)
-            return True
+            return self.build_record(image_url, title, tag)
         except Exception as e:
             print(f"[✗] 处理图片卡片失败: {e}")
             return None
@@ -358,6 +407,7 @@ class yande_re:
         os.makedirs(self.image_save_dir, exist_ok=True)
         print(f"ℹ️ 图片将保存到: {self.image_save_dir}")
         self.progress_file_path = os.path.join(save_dir, 'processed_tags.txt')
+        self.catalog = Catalog(os.path.join(save_dir, 'catalog.sqlite3'))
         if not os.path.exists(self.progress_file_path):
             open(self.progress_file_path, 'a').close()
             print(f"✅ 已创建断点续传记录文件: {self.progress_file_path}")
@@ -392,6 +442,10 @@ class yande_re:
         print("\n正在等待所有下载任务完成...")
         self.download_executor.shutdown(wait=True)  # 等待所有下载任务完成
         print("✅ 所有下载任务已完成")
+        self.print_download_stats()
+        self.csv_sink.close()
+        if self.catalog:
+            self.catalog.close()
 
 
 if __name__ == '__main__':
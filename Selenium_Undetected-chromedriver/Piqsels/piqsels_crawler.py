@@ -1,15 +1,19 @@
 import os
-import csv
 import time
 import redis
 import urllib3
 import undetected_chromedriver as uc 
-from threading import Lock
 from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import random 
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.dedup import DedupSet
+from spider_common.fingerprint import url_fingerprint
+from spider_common.csv_sink import open_record_sink
 
 # --- 配置常量 ---
 REDIS_HOST = 'localhost'
@@ -38,7 +42,7 @@ class PiqselsImageCrawler:
         """
         self.csv_dir_path = csv_dir_path
         self.csv_path = os.path.join(self.csv_dir_path, csv_filename) 
-        self.csv_lock = Lock() 
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'TAG'], site='piqsels')
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
@@ -48,7 +52,6 @@ class PiqselsImageCrawler:
         
         # --- Redis/内存 去重初始化逻辑 ---
         self.redis = None
-        self.visited_urls = set()
         self._init_deduplication(redis_host, redis_port)
 
         # --- Selenium 初始化 (使用指定路径) ---
@@ -85,48 +88,35 @@ class PiqselsImageCrawler:
             self.redis.ping()
             print("✅ Redis 连接成功，使用 Redis 集合进行去重。")
         except redis.exceptions.ConnectionError as e:
-            print("⚠️ Redis 连接失败，将使用内存去重。") 
+            print("⚠️ Redis 连接失败，将使用本地去重文件。") 
             self.redis = None
-            self.visited_urls = set()
         except Exception as e:
-            print(f"⚠️ Redis 初始化遇到其他错误 ({e})，将使用内存去重。")
+            print(f"⚠️ Redis 初始化遇到其他错误 ({e})，将使用本地去重文件。")
             self.redis = None
-            self.visited_urls = set()
+        # 以文件名作为唯一标识，整页一次 Redis 往返
+        self.dedup = DedupSet.fingerprinted(
+            self.redis, REDIS_KEY, lambda url: url_fingerprint(os.path.basename(url)),
+            legacy_member=os.path.basename)
 
 
-    def _is_url_visited(self, url):
-        """检查 URL 是否已被访问（即已保存）。"""
-        unique_id = os.path.basename(url) 
-        
-        if self.redis:
-            return not self.redis.sadd(REDIS_KEY, unique_id)
-        else:
-            if unique_id in self.visited_urls:
-                return True
-            self.visited_urls.add(unique_id)
-            return False
+    def _filter_visited(self, data_list, tag):
+        """批量检查 URL 是否已被访问（即已保存），返回未访问过的条目。"""
+        duplicate_mask = self.dedup.check_and_add_many([data['url'] for data in data_list])
+        new_items = []
+        for data, is_duplicate in zip(data_list, duplicate_mask):
+            if is_duplicate:
+                print(f"[{tag}] [~] URL 已存在，跳过: {data['name']}")
+            else:
+                new_items.append(data)
+        return new_items
 
 
     def write_to_csv(self, title, name, url, tag):
         """
-        写入 CSV 方法，已集成线程锁，确保线程安全。
+        提交给后台写入线程，立即返回（表头与批量落盘由后台写入器处理）。
         """
-        csv_path = self.csv_path
-        try:
-            with self.csv_lock: 
-                os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-                is_file_empty = not os.path.exists(csv_path) or os.stat(csv_path).st_size == 0
-                
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    
-                    if is_file_empty:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'TAG'])
-                        
-                    writer.writerow([title, name, url, tag])
-            print(f"[{tag}] [✓] 成功写入 CSV: {name}")
-        except Exception as e:
-            print(f"[{tag}] [✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(self.csv_path, [title, name, url, tag])
+        print(f"[{tag}] [✓] 已加入 CSV 写入队列: {name}")
 
 
     def _get_page_source(self, url, tag, page_num):
@@ -220,11 +210,6 @@ class PiqselsImageCrawler:
                 else:
                     continue 
 
-                # 4. 去重检查
-                if self._is_url_visited(full_url):
-                    print(f"[{tag}] [~] URL 已存在，跳过: {image_name}")
-                    continue
-
                 data_list.append({
                     'title': title,
                     'name': image_name,
@@ -236,7 +221,8 @@ class PiqselsImageCrawler:
                 print(f"[{tag}] [✗] 解析单个图片信息时出错: {e}")
                 continue
 
-        return data_list
+        # 4. 去重检查
+        return self._filter_visited(data_list, tag)
 
 
     def start_crawl_for_tag(self, tag):
@@ -319,6 +305,7 @@ class PiqselsImageCrawler:
 
         for tag in tag_list:
             self.start_crawl_for_tag(tag)
+        self.csv_sink.close()
         
         if self.driver:
             self.driver.quit()
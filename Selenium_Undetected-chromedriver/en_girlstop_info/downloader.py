@@ -1,11 +1,14 @@
 import os
-import csv
 import re
 import requests
 import urllib3
 from threading import Lock
-from concurrent.futures import ThreadPoolExecutor 
-from typing import List, Optional, Set, Tuple
+from typing import List, Optional, Set
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
+from spider_common.csv_tasks import iter_csv_rows, run_bounded
 
 # --- 配置常量 ---
 # 【必须修改】CSV 文件所在的目录
@@ -79,7 +82,7 @@ def download_worker(url: str, title: str, model_name: str) -> bool:
 
     # 3. 下载文件
     try:
-        response = requests.get(url, headers=headers, stream=True, verify=False, timeout=20)
+        response = http_client.get(url, headers=headers, stream=True, verify=False, timeout=20)
         response.raise_for_status() 
         
         # 写入文件
@@ -103,8 +106,6 @@ def run_downloader():
     # 检查相册限制，如果 <= 0 则设置为不限制 (None)
     album_limit = ALBUM_LIMIT_PER_CSV if ALBUM_LIMIT_PER_CSV > 0 else None
     
-    all_tasks: List[Tuple[str, str, str]] = []
-    
     # 获取目标文件名集合，如果为空则处理所有文件
     target_filenames: Optional[Set[str]] = set(TARGET_CSV_FILENAMES) if TARGET_CSV_FILENAMES else None
     
@@ -118,70 +119,47 @@ def run_downloader():
     else:
         print("   -> 限制模式: 不限制相册数量。")
 
-
-    # 1. 遍历 CSV 目录，读取所有任务
-    for filename in os.listdir(CSV_LOGS_DIR):
-        if filename.endswith('_results.csv'):
-            
+    # 1. 流式读取任务，边读边下载；同一相册的行是连续的，超出相册限制后直接停止读取当前文件
+    def iter_tasks():
+        for filename in os.listdir(CSV_LOGS_DIR):
+            if not filename.endswith('_results.csv'):
+                continue
             # 过滤逻辑
             if target_filenames and filename not in target_filenames:
                 continue
-            
+
             csv_path = os.path.join(CSV_LOGS_DIR, filename)
             print(f"   -> 读取任务文件: {filename}")
-            
-            processed_albums: Set[str] = set()
-            
+            albums: Set[str] = set()
             try:
-                with open(csv_path, 'r', newline='', encoding='utf-8-sig') as f:
-                    reader = csv.reader(f)
-                    try:
-                        next(reader) # 跳过表头
-                    except StopIteration:
-                        continue
-                        
-                    for row in reader:
-                        # CSV 列结构: ['Title', 'ImageName', 'URL', 'model_name']
-                        if len(row) >= 4:
-                            title, _, url, model_name = row
-                            
-                            # 【核心修改点】
-                            # 1. 判断当前相册标题是否已在集合中
-                            is_new_album = title not in processed_albums
-                            
-                            # 2. 如果是新的相册，并且达到限制，则不再添加任务，直接退出读取当前文件
-                            if is_new_album and album_limit is not None and len(processed_albums) >= album_limit:
-                                break 
-                            
-                            # 3. 将当前相册标题加入集合
-                            processed_albums.add(title)
-                            
-                            # 4. 添加下载任务 (所有属于前 N 个相册的图片都会被添加)
-                            all_tasks.append((url, title, model_name))
+                # CSV 列结构: ['Title', 'ImageName', 'URL', 'model_name']
+                for row in iter_csv_rows(csv_path, required=['Title', 'URL', 'model_name'],
+                                         album_key='Title', album_limit=album_limit, albums_contiguous=True):
+                    albums.add(row['Title'])
+                    yield row['URL'], row['Title'], row['model_name']
             except Exception as e:
                 print(f"⚠️ 读取 CSV 文件 {filename} 失败: {e}")
-                
-            print(f"   -> 已从 {filename} 收集 {len(processed_albums)} 个相册的任务。")
+            print(f"   -> 已从 {filename} 收集 {len(albums)} 个相册的任务。")
 
+    # 2. 启动异步下载 (在途任务有上限，并提供简单进度)
+    finished = 0
 
-    if not all_tasks:
-        print("❌ 未在指定 CSV 文件中找到任何下载任务或目标文件。请检查配置。")
-        return
-
-    total_tasks = len(all_tasks)
-    print(f"\n🎉 总共收集到 {total_tasks} 个下载任务。")
+    def on_done(task, result, exc):
+        nonlocal finished
+        finished += 1
+        if exc:
+            print(f"⚠️ 下载任务异常 {task[0]}: {exc}")
+        if finished % 50 == 0:
+            print(f"   下载进度: 已完成 {finished} 个任务")
 
-    # 2. 启动异步下载
-    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as executor:
-        # 提交所有任务到线程池
-        futures = [executor.submit(download_worker, *task) for task in all_tasks]
+    total_tasks = run_bounded(lambda task: download_worker(*task), iter_tasks(),
+                              max_workers=MAX_DOWNLOAD_WORKERS, on_done=on_done)
 
-        # 等待所有下载任务完成 (并提供简单进度)
-        for i, future in enumerate(futures):
-            future.result() 
-            if (i + 1) % 50 == 0 or (i + 1) == total_tasks:
-                print(f"   下载进度: {i + 1}/{total_tasks} ({((i + 1) / total_tasks) * 100:.2f}%)")
+    if not total_tasks:
+        print("❌ 未在指定 CSV 文件中找到任何下载任务或目标文件。请检查配置。")
+        return
 
+    print(f"\n🎉 总共处理 {total_tasks} 个下载任务。")
     print("\n✅ 所有异步下载任务完成。")
 
 # --- 程序入口 ---
@@ -14,6 +14,10 @@ from selenium.common.exceptions import WebDriverException, TimeoutException
 from concurrent.futures import ThreadPoolExecutor
 from queue import Queue
 from typing import Optional, Set, Dict, List, Tuple
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # --- 配置常量 ---
 BASE_URL = 'https://en.girlstop.info/'
@@ -168,7 +172,7 @@ class GirlstopSpider:
             return False
 
         try:
-            response = requests.get(url, headers=self.headers, stream=True, verify=False, timeout=20)
+            response = http_client.get(url, headers=self.headers, stream=True, verify=False, timeout=20)
             response.raise_for_status()
             with self.csv_lock:
                 with open(save_path, 'wb') as f:
@@ -5,7 +5,6 @@ import time
 import random
 import traceback
 import threading
-import requests
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from selenium import webdriver
@@ -13,6 +12,10 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 
 # ---------------- 配置 ----------------
@@ -100,7 +103,7 @@ class XChinaSpider:
             return
         for _ in range(retries):
             try:
-                r = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
+                r = http_client.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout)
                 if r.status_code == 200 and r.content:
                     with open(save_path, 'wb') as f:
                         f.write(r.content)
@@ -1,11 +1,9 @@
 import os
 import re
-import csv
 import time
 import random
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Set, Iterator
 from threading import Lock
 
 # 导入 undetected_chromedriver
@@ -13,21 +11,13 @@ import undetected_chromedriver as uc
 from selenium.webdriver.support.ui import WebDriverWait
 # 忽略不安全请求警告
 import urllib3
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_tasks import iter_csv_rows, run_bounded
+from spider_common.session_bridge import SessionBridge
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# ✅ 新增：导入 fake-useragent 库
-try:
-    from fake_useragent import UserAgent
-    # 初始化 UserAgent 实例，它会缓存 User-Agent 列表
-    UA = UserAgent()
-except ImportError:
-    # 如果库未安装，提供一个兜底方案
-    print("[⚠️ 警告] 缺少 fake-useragent 库。请运行 pip install fake-useragent")
-    class UserAgentFallback:
-        def random(self):
-            return 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36'
-    UA = UserAgentFallback()
-
 
 # ---------------- 配置 ----------------
 CUSTOM_BROWSER_PATH = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
@@ -55,17 +45,16 @@ file_lock = Lock()
 
 class XChinaDownloader:
     def __init__(self):
-        self.executor = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS)
         self.download_tasks: List[Dict[str, str]] = []
         self.driver = None
-        self.session_cookies: Dict[str, str] = {} 
+        self.session: SessionBridge = None
         self.download_count = 0
         self.failed_downloads = 0
         self._init_driver_and_session()
 
     def _init_driver_and_session(self):
         """
-        初始化 Undetected-Chromedriver 并获取会话 Cookie
+        初始化 Undetected-Chromedriver 并建立会话桥（Cookie 失效时自动刷新）
         """
         print("[i] 正在初始化 Undetected-Chromedriver...")
         
@@ -89,9 +78,10 @@ class XChinaDownloader:
                 lambda driver: driver.execute_script("return document.readyState") == "complete"
             )
             
-            cookies = self.driver.get_cookies()
-            self.session_cookies = {c['name']: c['value'] for c in cookies}
-            print(f"[✔] 成功获取 {len(self.session_cookies)} 个会话 Cookie")
+            # 浏览器保持运行作为 Cookie 来源：下载遇到挑战页/403 时访问一次并同步 Cookie 和 UA，所有下载线程共享
+            # （cf_clearance 与通过挑战时的 UA 绑定，因此下载统一使用浏览器的 UA）
+            self.session = SessionBridge(self.driver, BASE_URL, headers={'Referer': BASE_URL})
+            print(f"[✔] 成功获取 {len(self.session.cookies)} 个会话 Cookie")
 
         except Exception as e:
             print(f"[✗] 启动或获取 Cookie 失败: {e}")
@@ -104,14 +94,13 @@ class XChinaDownloader:
         """清理文件名中的非法字符"""
         return re.sub(r'[\\/*?:"<>|]', '_', name)
 
-    def _get_all_urls_from_csv(self) -> List[Dict[str, str]]:
-        # ... (CSV 读取和限制逻辑保持不变) ...
+    def _get_all_urls_from_csv(self) -> Iterator[Dict[str, str]]:
+        """逐行产出下载任务（生成器），边读边下载，不把所有 CSV 读入内存"""
         print(f"[i] 正在从目录 {CSV_OUTPUT_DIR} 读取 URL...")
-        all_tasks: List[Dict[str, str]] = []
         
         if not os.path.exists(CSV_OUTPUT_DIR):
             print(f"[✗] 错误: CSV 目录不存在: {CSV_OUTPUT_DIR}")
-            return []
+            return
 
         file_list = os.listdir(CSV_OUTPUT_DIR)
         
@@ -122,6 +111,7 @@ class XChinaDownloader:
             file_list = [f for f in file_list if f.endswith('.csv')]
             print(f"[i] 未指定目标，将处理目录下所有 {len(file_list)} 个 CSV 文件。")
 
+        album_limit = ALBUM_LIMIT_PER_CSV if ALBUM_LIMIT_PER_CSV > 0 else None
 
         for filename in file_list:
             if not filename.endswith('.csv'):
@@ -132,43 +122,28 @@ class XChinaDownloader:
             
             albums_processed: Set[str] = set()
             
-            print(f"[→] 处理文件: {filename} (限制相册数: {ALBUM_LIMIT_PER_CSV if ALBUM_LIMIT_PER_CSV > 0 else '无限制'})")
+            print(f"[→] 处理文件: {filename} (限制相册数: {album_limit or '无限制'})")
             
-            with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                reader = csv.reader(f)
-                try:
-                    header = next(reader) # 读取标题行
-                    url_idx = header.index('URL')
-                    title_idx = header.index('Title')
-                except (StopIteration, ValueError):
-                    print(f"[✗] 错误: CSV 文件 {filename} 格式不正确或为空。")
-                    continue
-                    
-                for row in reader:
-                    if len(row) > max(url_idx, title_idx):
-                        title = row[title_idx]
-                        
-                        if ALBUM_LIMIT_PER_CSV > 0:
-                            if len(albums_processed) >= ALBUM_LIMIT_PER_CSV and title not in albums_processed:
-                                continue 
-                        
-                        albums_processed.add(title)
-                        
-                        all_tasks.append({
-                            'url': row[url_idx],
-                            'title': title,
-                            'model_name': model_name
-                        })
+            try:
+                # 超出相册限制的行跳过（同一相册的行不一定连续）
+                for row in iter_csv_rows(csv_path, required=['URL', 'Title'],
+                                         album_key='Title', album_limit=album_limit):
+                    albums_processed.add(row['Title'])
+                    yield {
+                        'url': row['URL'],
+                        'title': row['Title'],
+                        'model_name': model_name
+                    }
+            except (OSError, ValueError) as e:
+                print(f"[✗] 错误: CSV 文件 {filename} 格式不正确或为空: {e}")
+                continue
                         
             print(f"[i] 文件 {filename} 采集了 {len(albums_processed)} 个相册的任务。")
 
-        print(f"[i] 共加载 {len(all_tasks)} 个下载任务")
-        return all_tasks
-
     # ----------------- 下载部分 -----------------
     def _download_image(self, task: Dict[str, str]):
         """
-        使用 requests 携带浏览器获取的 Cookie 下载图片，并引入延迟。
+        通过会话桥（浏览器的 Cookie 和 UA）下载图片，并引入延迟。
         """
         # 引入随机延迟
         delay = random.uniform(MIN_DELAY_BETWEEN_REQUESTS, MAX_DELAY_BETWEEN_REQUESTS)
@@ -187,18 +162,11 @@ class XChinaDownloader:
             if os.path.exists(save_path):
                 return 
 
-        # 🚀 关键修改：使用 fake-useragent 动态生成 User-Agent
-        headers = {
-            'User-Agent': UA.random, # <-- 从库中获取随机 UA
-            'Referer': BASE_URL, 
-        }
-
         for attempt in range(DOWNLOAD_RETRIES):
             try:
-                r = requests.get(
+                # Cookie/UA 由会话桥统一提供，挑战页或 403 时会话桥先刷新一次再重试
+                r = self.session.get(
                     url, 
-                    headers=headers, 
-                    cookies=self.session_cookies, 
                     timeout=20, 
                     stream=True, 
                     verify=False 
@@ -219,8 +187,6 @@ class XChinaDownloader:
                 elif r.status_code == 429: 
                     print(f"[⚠️ 限速] 收到 429，休眠 30-60 秒后重试: {url}")
                     time.sleep(random.uniform(30, 60))
-                    # 切换新的 User-Agent 以进行下一次重试
-                    headers['User-Agent'] = UA.random
                     continue
                     
                 else:
@@ -238,28 +204,23 @@ class XChinaDownloader:
     # ----------------- 主执行流程 (保持不变) -----------------
     def run(self):
         """主执行流程"""
-        all_tasks = self._get_all_urls_from_csv()
-        
-        if not all_tasks:
-            print("[i] 没有下载任务，程序结束。")
-            return
+        print(f"\n[⏳] 开始多线程下载，使用 {MAX_DOWNLOAD_WORKERS} 个线程...")
+        finished = 0
 
-        print(f"\n[⏳] 开始多线程下载 {len(all_tasks)} 张图片，使用 {MAX_DOWNLOAD_WORKERS} 个线程...")
-        
-        futures = [self.executor.submit(self._download_image, task) for task in all_tasks]
-        
-        total = len(futures)
-        for i, future in enumerate(as_completed(futures)):
-            if (i + 1) % 100 == 0 or (i + 1) == total:
+        def on_done(task, result, exc):
+            nonlocal finished
+            finished += 1
+            if finished % 100 == 0:
                 with file_lock:
-                    print(f"[进度] 已完成 {i + 1}/{total} 个任务. 成功: {self.download_count}, 失败: {self.failed_downloads}")
-            try:
-                future.result()
-            except Exception as e:
-                pass
+                    print(f"[进度] 已完成 {finished} 个任务. 成功: {self.download_count}, 失败: {self.failed_downloads}")
 
-        self.executor.shutdown(wait=True)
+        # 在途任务有上限，读取 CSV 与下载同时进行
+        total = run_bounded(self._download_image, self._get_all_urls_from_csv(),
+                            max_workers=MAX_DOWNLOAD_WORKERS, on_done=on_done)
         
+        if not total:
+            print("[i] 没有下载任务，程序结束。")
+
         if self.driver:
             self.driver.quit()
             
@@ -269,7 +230,7 @@ class XChinaDownloader:
 
 # ----------------- 启动 -----------------
 if __name__ == "__main__":
-    print("🔨🤖 xchina.fit 独立下载器启动中 (基于 Undetected-Chromedriver Cookie + 随机 UA)...")
+    print("🔨🤖 xchina.fit 独立下载器启动中 (基于 Undetected-Chromedriver 会话桥，Cookie 自动刷新)...")
     try:
         downloader = XChinaDownloader()
         downloader.run()
@@ -1,5 +1,4 @@
 import os
-import csv
 import time
 import requests
 import redis
@@ -10,6 +9,13 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from bs4 import BeautifulSoup
 import undetected_chromedriver as uc
 from selenium.common.exceptions import WebDriverException
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.session_bridge import SessionBridge
+from spider_common.dedup import DedupSet
+from spider_common.fingerprint import url_fingerprint
+from spider_common.csv_sink import open_record_sink
 
 # --- 全局配置常量 ---
 BASE_URL = "https://www.v2ph.com"
@@ -43,13 +49,16 @@ class V2phSpider:
         初始化爬虫实例，集成 Redis/内存去重逻辑、线程锁和相册计数器。
         """
         self.driver = driver
-        self.cookies = cookies_dict
-        self.headers = headers
+        # 浏览器作为 Cookie 来源：requests 遇到挑战页/403 时由浏览器访问一次并同步 Cookie 和 UA，所有线程共享
+        self.session = SessionBridge(driver, BASE_URL, headers={'Referer': headers.get('Referer', BASE_URL + '/')},
+                                     cookies=cookies_dict)
         
         # 路径和锁初始化
         self.csv_dir_path = csv_dir_path
         self.csv_path = os.path.join(self.csv_dir_path, csv_filename)
-        self.csv_lock = Lock()
+        # 后台线程批量写入 CSV；写入失败时撤销这些 URL 的去重标记，下次重新采集
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'TAG'], site='v2ph',
+                                         on_error=lambda path, rows, e: self.dedup.discard_many([row[2] for row in rows]))
         
         # --- 相册计数器和限制 ---
         self.album_count = 0  
@@ -60,7 +69,6 @@ class V2phSpider:
         
         # --- 去重初始化逻辑 ---
         self.redis = None
-        self.visited_urls = set()
         try:
             self.redis = redis.StrictRedis(host=redis_host, port=redis_port, decode_responses=True)
             self.redis.ping()
@@ -68,80 +76,51 @@ class V2phSpider:
         except (redis.exceptions.ConnectionError, Exception) as e:
             print(f"⚠️ Redis 连接失败 ({e})，将使用内存去重。")
             self.redis = None
+        # 写入失败时要撤销标记（discard_many），不使用无法删除的本地 Bloom 层
+        self.dedup = DedupSet.fingerprinted(self.redis, REDIS_KEY, url_fingerprint, legacy_member=str,
+                                            local_dir=None)
 
-    def is_visited(self, url):
-        """检查 URL 是否已被访问。"""
-        if self.redis:
-            return self.redis.sismember(REDIS_KEY, url)
-        else:
-            return url in self.visited_urls
-
-    def add_visited(self, url):
-        """将 URL 添加到已访问集合。"""
-        if self.redis:
-            self.redis.sadd(REDIS_KEY, url)
-        else:
-            self.visited_urls.add(url)
-
-    def write_to_csv(self, title, name, url, tag):
+    def write_to_csv(self, rows, tag):
         """
-        写入 CSV 方法，已集成线程锁，确保线程安全。
-        数据列：['Title', 'ImageName', 'URL', 'TAG']
+        批量提交给后台写入线程，立即返回。
+        rows: [(title, name, url), ...]，数据列：['Title', 'ImageName', 'URL', 'TAG']
+        写入前已在去重集合中标记，写入失败时由写入器的 on_error 撤销标记。
         """
-        try:
-            # 1. 写入 CSV
-            with self.csv_lock:
-                os.makedirs(os.path.dirname(self.csv_path), exist_ok=True)
-                is_file_empty = not os.path.exists(self.csv_path) or os.stat(self.csv_path).st_size == 0
-                
-                with open(self.csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    
-                    if is_file_empty:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'TAG'])
-                        
-                    writer.writerow([title, name, url, tag])
-                    
-            # 2. 写入去重集合
-            self.add_visited(url) 
-
-        except Exception as e:
-            print(f"[{tag}] [✗] 写入 CSV 或更新去重集合出错: {e}")
+        self.csv_sink.write_many(self.csv_path, ([title, name, url, tag] for title, name, url in rows))
 
 
     def _fetch_page(self, url, tag, album_title=None):
         """
-        封装的页面请求方法：优先 requests，失败则回退到 driver (串行安全)。
+        封装的页面请求方法：走 requests，会话失效时由会话桥刷新 Cookie 后重试；
+        请求出错（超时、连接断开等）或刷新后仍被拦截时回退到 driver 取页面 (串行安全)。
         """
         context_name = album_title if album_title else tag
         
-        # 1. 尝试使用 requests
         try:
-            response = requests.get(url, headers=self.headers, cookies=self.cookies, verify=False, timeout=15)
-            
+            response = self.session.get(url, verify=False, timeout=15)
+        except requests.exceptions.RequestException as e:
+            print(f"[{context_name}] [!] Requests 请求出错 ({type(e).__name__}: {e})，回退到 Driver 获取页面内容...")
+        else:
             if response.status_code == 404:
                 return None
-            
-            response.raise_for_status() 
-            return response.text
-        
-        except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
-            # 2. 如果 requests 失败 (如 403)，回退到 driver 模式
-            print(f"[{context_name}] [!] Requests 失败 ({type(e).__name__})，回退到 Driver 获取页面内容...")
-            
-            try:
-                self.driver.get(url)
-                time.sleep(3) 
-                
-                if "/login" in self.driver.current_url.lower():
-                    print(f"[{context_name}] [✗] Cookies 已失效，Driver 跳转至登录页。爬虫终止。")
-                    return None
-                
-                return self.driver.page_source
-            
-            except Exception as driver_e:
-                print(f"[{context_name}] [✗] Driver 请求出错: {driver_e}")
+            if "/login" in response.url.lower():
+                print(f"[{context_name}] [✗] Cookies 已失效，请求被重定向至登录页。爬虫终止。")
                 return None
+            if response.ok:
+                return response.text
+            # 刷新会话后仍被拦截 (如 403)，回退到 driver 模式
+            print(f"[{context_name}] [!] Requests 仍失败 (HTTP {response.status_code})，回退到 Driver 获取页面内容...")
+
+        try:
+            page_source, current_url = self.session.page_source(url)
+        except Exception as driver_e:
+            print(f"[{context_name}] [✗] Driver 请求出错: {driver_e}")
+            return None
+
+        if "/login" in current_url.lower():
+            print(f"[{context_name}] [✗] Cookies 已失效，Driver 跳转至登录页。爬虫终止。")
+            return None
+        return page_source
 
 
     def parse_and_save_images(self, album_url, tag, album_title, album_page):
@@ -162,15 +141,20 @@ class V2phSpider:
             
         print(f"[{tag}/{album_title}] [✓] 正在解析第 {album_page} 页，找到 {len(image_containers)} 张图片...")
 
+        rows = []
         for img in image_containers:
             data_src = img.get('data-src')
             image_name = img.get('alt') or (os.path.basename(data_src) if data_src else "Unknown")
             
             if data_src:
                 image_url = urljoin(BASE_URL, data_src) 
-                
-                if not self.is_visited(image_url):
-                    self.write_to_csv(album_title, image_name, image_url, tag)
+                rows.append((album_title, image_name, image_url))
+
+        # 整页一次 Redis 往返：原子地检查并标记，多个线程不会重复写入同一张图片
+        duplicate_mask = self.dedup.check_and_add_many([url for _, _, url in rows])
+        new_rows = [row for row, is_duplicate in zip(rows, duplicate_mask) if not is_duplicate]
+        if new_rows:
+            self.write_to_csv(new_rows, tag)
 
         return True
 
@@ -368,6 +352,7 @@ def main():
     
     finally:
         # 5. 最终清理
+        spider.csv_sink.close()
         print(f"\n✅ 所有爬取任务已完成！总共提交 {spider.album_count} 个相册任务 (目标限制 {MAX_ALBUMS_PER_RUN})。")
         print("数据已保存到:", spider.csv_path)
         print("正在关闭浏览器实例...")
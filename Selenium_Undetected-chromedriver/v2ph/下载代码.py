@@ -3,6 +3,10 @@ import os
 import pandas as pd
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed # 引入多线程关键库
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common import http_client
 
 # === 1. 配置信息和路径设置 ===
 # **请根据你的实际情况修改以下变量**
@@ -52,7 +56,7 @@ def download_image(url, save_path, title_name):
 
     try:
         # 发起 HTTP GET 请求
-        response = requests.get(url, headers=HEADERS, stream=True, timeout=15)
+        response = http_client.get(url, headers=HEADERS, stream=True, timeout=15)
 
         # 检查响应状态码
         if response.status_code == 200:
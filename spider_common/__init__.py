@@ -0,0 +1,6 @@
+"""
+各爬虫 / 下载脚本共用的基础组件。
+
+脚本按目录独立运行，使用前需把仓库根目录加入 sys.path，例如：
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+"""
@@ -0,0 +1,124 @@
+"""
+持久化的本地 Bloom 过滤器：位数组放在内存映射文件中，进程退出后仍然保留。
+
+按容量 capacity 和误判率 error_rate 计算位数组大小和哈希函数个数，
+默认 1000 万条、误判率 0.1% 约需 17 MB 磁盘空间（单个站点足够；Windows 上文件不是稀疏的，
+会按完整大小占用磁盘），数据量更大的站点创建时传入 capacity。常驻内存的只有实际访问到的页。
+只会误判「已存在」（概率约为 error_rate），不会漏判，
+因此用作去重时的代价是偶尔跳过一个新 URL，而不会重复写入。
+
+线程安全（进程内加锁）；多个进程同时写同一个文件可能丢失少量位，应各自使用不同文件。
+Bloom 过滤器不支持删除。
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+
+_MAGIC = b"SPBLOOM1"
+_HEADER = struct.Struct("<8sQIdQ")   # magic, 位数, 哈希函数个数, 误判率, 容量
+_HEADER_SIZE = 64                    # 头部占用 64 字节，位数组从这里开始
+
+DEFAULT_CAPACITY = 10_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+
+def optimal_params(capacity: int, error_rate: float) -> tuple[int, int]:
+    """返回 (位数, 哈希函数个数)"""
+    bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    """
+    用法：
+        bloom = BloomFilter('dedup/pornpics_image_url_set.bloom')
+        if bloom.check_and_add(url): ...   # True 表示（很可能）已存在
+        bloom.close()
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.exists(path) and os.path.getsize(path) > _HEADER_SIZE:
+            # 已有文件：沿用创建时的参数，忽略传入的 capacity / error_rate
+            self._file = open(path, "r+b")
+            magic, self.bits, self.hashes, self.error_rate, self.capacity = _HEADER.unpack(
+                self._file.read(_HEADER.size))
+            if magic != _MAGIC:
+                self._file.close()
+                raise ValueError(f"不是 Bloom 过滤器文件: {path}")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.capacity = capacity
+            self.error_rate = error_rate
+            self.bits, self.hashes = optimal_params(capacity, error_rate)
+            self._file = open(path, "w+b")
+            self._file.write(_HEADER.pack(_MAGIC, self.bits, self.hashes, self.error_rate, self.capacity))
+            # 扩展到完整大小，未写入的部分为 0（大多数文件系统上为稀疏文件）
+            self._file.truncate(_HEADER_SIZE + (self.bits + 7) // 8)
+            self._file.flush()
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _positions(self, member: str):
+        # 双重哈希：一次 blake2b 得到两个 64 位值，组合出 hashes 个位置
+        digest = hashlib.blake2b(member.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def _check_and_add(self, member: str) -> bool:
+        mm = self._mm
+        present = True
+        for pos in self._positions(member):
+            index = _HEADER_SIZE + (pos >> 3)
+            mask = 1 << (pos & 7)
+            byte = mm[index]
+            if not byte & mask:
+                present = False
+                mm[index] = byte | mask
+        return present
+
+    def check_and_add(self, member: str) -> bool:
+        """加入 member，返回加入前是否（很可能）已存在"""
+        with self._lock:
+            return self._check_and_add(member)
+
+    def check_and_add_many(self, members) -> list[bool]:
+        with self._lock:
+            return [self._check_and_add(m) for m in members]
+
+    def contains(self, member: str) -> bool:
+        mm = self._mm
+        with self._lock:
+            return all(mm[_HEADER_SIZE + (pos >> 3)] & (1 << (pos & 7)) for pos in self._positions(member))
+
+    def __contains__(self, member: str) -> bool:
+        return self.contains(member)
+
+    def add_many(self, members):
+        with self._lock:
+            for m in members:
+                self._check_and_add(m)
+
+    def flush(self):
+        with self._lock:
+            self._mm.flush()
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.flush()
+                self._mm.close()
+                self._file.close()
+                self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,202 @@
+"""
+Selenium 浏览器池：预热 N 个 headless driver，在多个线程间复用。
+
+- 每个 driver 只用一个标签页，用完后关闭页面弹出的多余窗口并回到 about:blank；
+- 每个 driver 打开 max_pages 个页面后自动重建，避免长时间运行后内存膨胀；
+- driver 崩溃（非元素查找/超时类异常）时丢弃并重建；
+- wait_for_image 通过 img 的 load/error 事件等待图片解码完成，不再固定 sleep；
+- fetch_image_bytes 在页面内 fetch 图片地址（命中浏览器缓存），取回服务器返回的原始字节，
+  不需要像截图那样按 naturalWidth 调整窗口并重新编码为 PNG。
+
+用法：
+    pool = BrowserPool(make_driver, size=3, max_pages=200)
+    with pool.driver() as driver:
+        driver.get(url)
+        size = wait_for_image(driver)
+    pool.close()
+"""
+import base64
+import contextlib
+import queue
+import threading
+
+from selenium.common.exceptions import (
+    JavascriptException, NoSuchElementException, TimeoutException, WebDriverException,
+)
+
+# 等待第一张 img 出现并加载完成，返回 [naturalWidth, naturalHeight]，加载失败返回 null
+_WAIT_IMAGE_JS = """
+const done = arguments[arguments.length - 1];
+const finish = img => done(img && img.naturalWidth ? [img.naturalWidth, img.naturalHeight] : null);
+const watch = img => {
+    if (img.complete) { finish(img); return; }
+    img.addEventListener('load', () => finish(img), {once: true});
+    img.addEventListener('error', () => done(null), {once: true});
+};
+const img = document.querySelector('img');
+if (img) { watch(img); return; }
+new MutationObserver((_, observer) => {
+    const found = document.querySelector('img');
+    if (found) { observer.disconnect(); watch(found); }
+}).observe(document.documentElement, {childList: true, subtree: true});
+"""
+
+# 取回页面中图片的原始字节（优先从 HTTP 缓存读取），返回 base64；失败返回 null
+_FETCH_IMAGE_JS = """
+const done = arguments[arguments.length - 1];
+const img = document.querySelector('img');
+const src = (img && (img.currentSrc || img.src)) || location.href;
+fetch(src, {cache: 'force-cache', credentials: 'include'})
+    .then(resp => resp.ok ? resp.blob() : Promise.reject(new Error('HTTP ' + resp.status)))
+    .then(blob => {
+        const reader = new FileReader();
+        reader.onload = () => done(reader.result.slice(reader.result.indexOf(',') + 1));
+        reader.onerror = () => done(null);
+        reader.readAsDataURL(blob);
+    })
+    .catch(() => done(null));
+"""
+
+# 这些异常说明页面内容不符合预期，driver 本身仍可用
+_PAGE_ERRORS = (NoSuchElementException, TimeoutException, JavascriptException)
+
+
+def wait_for_image(driver, timeout: float = 15) -> tuple[int, int] | None:
+    """等待页面中的图片加载完成，返回原始尺寸 (宽, 高)；超时或加载失败返回 None"""
+    driver.set_script_timeout(timeout)
+    try:
+        size = driver.execute_async_script(_WAIT_IMAGE_JS)
+    except TimeoutException:
+        return None
+    return tuple(size) if size else None
+
+
+def fetch_image_bytes(driver, timeout: float = 30) -> bytes | None:
+    """取回当前页面图片的原始字节；跨域未授权（CORS）、超时或请求失败时返回 None，调用方可回退到截图"""
+    driver.set_script_timeout(timeout)
+    try:
+        data = driver.execute_async_script(_FETCH_IMAGE_JS)
+    except TimeoutException:
+        return None
+    return base64.b64decode(data) if data else None
+
+
+class _Entry:
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.home_handle = driver.current_window_handle
+
+
+class BrowserPool:
+    def __init__(self, driver_factory, size: int = 2, max_pages: int = 200, warm: bool = True):
+        """driver_factory: 无参函数，返回一个新的 webdriver；warm=True 时立即并行启动 size 个 driver"""
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_pages = max_pages
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        if warm:
+            self.warm()
+
+    def warm(self):
+        """并行启动剩余的 driver，启动失败的会在 acquire 时重试"""
+        with self._lock:
+            missing = self.size - self._created
+            self._created = self.size
+        threads = [threading.Thread(target=self._spawn, daemon=True) for _ in range(missing)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _spawn(self):
+        try:
+            self._idle.put(_Entry(self.driver_factory()))
+        except Exception as e:
+            print(f"[浏览器池] 启动 driver 失败: {e}")
+            with self._lock:
+                self._created -= 1
+
+    def _acquire(self) -> _Entry:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if not can_create:
+                # 定时醒来重新检查：其他线程的 driver 被丢弃后可以补建
+                try:
+                    return self._idle.get(timeout=1)
+                except queue.Empty:
+                    continue
+            try:
+                return _Entry(self.driver_factory())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _discard(self, entry: _Entry):
+        with self._lock:
+            self._created -= 1
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+
+    def _reset(self, entry: _Entry):
+        """关闭页面打开的其他标签页，回到空白页释放图片占用的内存"""
+        driver = entry.driver
+        for handle in driver.window_handles:
+            if handle != entry.home_handle:
+                driver.switch_to.window(handle)
+                driver.close()
+        driver.switch_to.window(entry.home_handle)
+        driver.get("about:blank")
+
+    def _release(self, entry: _Entry, broken: bool):
+        entry.pages += 1
+        if not broken and not self._closed and entry.pages < self.max_pages:
+            try:
+                self._reset(entry)
+                self._idle.put(entry)
+                return
+            except WebDriverException:
+                pass
+        self._discard(entry)
+
+    @contextlib.contextmanager
+    def driver(self):
+        """借出一个 driver，with 块结束后归还；块内抛出浏览器级异常时该 driver 会被重建"""
+        entry = self._acquire()
+        broken = False
+        try:
+            yield entry.driver
+        except WebDriverException as e:
+            broken = not isinstance(e, _PAGE_ERRORS)
+            raise
+        finally:
+            self._release(entry, broken)
+
+    def close(self):
+        """关闭所有空闲 driver；借出中的 driver 会在归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                entry = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,212 @@
+"""
+统一的本地数据目录（SQLite，WAL 模式）：采集记录、下载状态、爬取进度放在同一个库中。
+
+原来这三类数据分散在 all_records_*.csv、{tag}_records.csv / processed_tags.txt 和 Redis 中，
+每个下载脚本启动时都要重新读取 CSV 再关联一次；现在爬虫和下载脚本共用一个库，
+「某个 TAG 下所有失败的下载」之类的查询走索引，毫秒级返回。
+
+表结构：
+    images   (url 主键, site, tag, title, name, created_at)     采集到的图片
+    status   (url 主键, state, bytes, path, error, updated_at)  下载结果，state 为 done / failed
+    progress (site, tag 主键, page, done, updated_at)            按 TAG 的爬取进度
+
+写入均为批量事务（executemany）；WAL 模式下多个进程可以同时读，写入互不阻塞读取。
+
+用法：
+    catalog = Catalog(os.path.join(save_dir, 'catalog.sqlite3'))
+    catalog.add_images([{'url': url, 'site': 'yande', 'tag': tag, 'title': title, 'name': name}])
+    status_journal.add_listener(catalog.on_journal_batch)
+    failed = catalog.failed(tag='landscape')
+"""
+import csv
+import os
+import sqlite3
+import threading
+import time
+
+SUCCESS_STATUS = "✅成功"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    url        TEXT PRIMARY KEY,
+    site       TEXT,
+    tag        TEXT,
+    title      TEXT,
+    name       TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_images_site_tag ON images (site, tag);
+CREATE TABLE IF NOT EXISTS status (
+    url        TEXT PRIMARY KEY,
+    state      TEXT NOT NULL,
+    bytes      INTEGER,
+    path       TEXT,
+    error      TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_status_state ON status (state);
+CREATE TABLE IF NOT EXISTS progress (
+    site       TEXT NOT NULL,
+    tag        TEXT NOT NULL,
+    page       INTEGER,
+    done       INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL,
+    PRIMARY KEY (site, tag)
+);
+"""
+
+_IMAGE_FIELDS = ("url", "site", "tag", "title", "name")
+
+
+class Catalog:
+    def __init__(self, db_path):
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")   # 多个进程同时写入时等待而不是报错
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _write(self, sql, rows):
+        with self._lock:
+            cursor = self._conn.executemany(sql, rows)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ---------- 采集记录 ----------
+    def add_images(self, rows):
+        """批量加入采集记录（dict，键为 url/site/tag/title/name），已存在的 URL 忽略，返回新增条数"""
+        now = time.time()
+        return self._write(
+            "INSERT OR IGNORE INTO images (url, site, tag, title, name, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [tuple(row.get(f) for f in _IMAGE_FIELDS) + (now,) for row in rows if row.get("url")],
+        )
+
+    def contains_many(self, urls):
+        """返回与 urls 等长的列表，True 表示已在 images 表中"""
+        urls = list(urls)
+        found = set()
+        # SQLite 单条语句的参数个数有限，分批查询
+        for i in range(0, len(urls), 500):
+            chunk = urls[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(url for (url,) in self._query(
+                f"SELECT url FROM images WHERE url IN ({placeholders})", chunk))
+        return [url in found for url in urls]
+
+    def import_csv(self, path, site, url_col="URL", tag_col="TAG", title_col="Title", name_col="ImageName",
+                   batch_size=5000):
+        """导入已有的采集 CSV（all_records_*.csv），返回新增条数"""
+        added = 0
+        batch = []
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                batch.append({"url": row.get(url_col), "site": site, "tag": row.get(tag_col),
+                              "title": row.get(title_col), "name": row.get(name_col)})
+                if len(batch) >= batch_size:
+                    added += self.add_images(batch)
+                    batch = []
+        if batch:
+            added += self.add_images(batch)
+        return added
+
+    # ---------- 下载状态 ----------
+    def set_status(self, rows):
+        """批量写入下载结果，rows 为 (url, state, bytes, path, error)，同一 URL 以最后一次为准"""
+        now = time.time()
+        return self._write(
+            "INSERT INTO status (url, state, bytes, path, error, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET state=excluded.state, bytes=excluded.bytes, "
+            "path=excluded.path, error=excluded.error, updated_at=excluded.updated_at",
+            [tuple(row) + (now,) for row in rows],
+        )
+
+    def on_journal_batch(self, batch):
+        """StatusJournal 回调：把本批下载状态写入 status 表，同时补全 images 表中缺少的记录"""
+        images = []
+        statuses = []
+        for _, row in batch:
+            url = str(row.get("URL") or "")
+            if not url:
+                continue
+            images.append({"url": url, "tag": row.get("TAG"), "title": row.get("Title"),
+                           "name": row.get("ImageName")})
+            if row.get("Status") == SUCCESS_STATUS:
+                path = row.get("SavedPath") or ""
+                size = os.path.getsize(path) if path and os.path.exists(path) else None
+                statuses.append((url, STATE_DONE, size, path, None))
+            else:
+                statuses.append((url, STATE_FAILED, None, None, row.get("Message")))
+        self.add_images(images)
+        self.set_status(statuses)
+
+    def load_done(self):
+        """返回全部已成功下载的 URL 集合"""
+        return {url for (url,) in self._query("SELECT url FROM status WHERE state = ?", (STATE_DONE,))}
+
+    def failed(self, tag=None, site=None):
+        """返回失败的下载 [(url, tag, error), ...]，可按 tag / site 过滤"""
+        sql = ("SELECT s.url, i.tag, s.error FROM status s LEFT JOIN images i ON i.url = s.url "
+               "WHERE s.state = ?")
+        params = [STATE_FAILED]
+        if tag is not None:
+            sql += " AND i.tag = ?"
+            params.append(tag)
+        if site is not None:
+            sql += " AND i.site = ?"
+            params.append(site)
+        return self._query(sql, params)
+
+    def pending(self, site=None, tag=None):
+        """返回还未成功下载的采集记录 [(url, tag, title, name), ...]"""
+        sql = ("SELECT i.url, i.tag, i.title, i.name FROM images i LEFT JOIN status s ON s.url = i.url "
+               "WHERE (s.state IS NULL OR s.state != ?)")
+        params = [STATE_DONE]
+        if site is not None:
+            sql += " AND i.site = ?"
+            params.append(site)
+        if tag is not None:
+            sql += " AND i.tag = ?"
+            params.append(tag)
+        return self._query(sql, params)
+
+    # ---------- 爬取进度 ----------
+    def save_progress(self, site, tag, page=None, done=False):
+        """记录某个 TAG 爬到的页码；done=True 表示整个 TAG 已完成"""
+        self._write(
+            "INSERT INTO progress (site, tag, page, done, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(site, tag) DO UPDATE SET page=COALESCE(excluded.page, progress.page), "
+            "done=excluded.done, updated_at=excluded.updated_at",
+            [(site, tag, page, int(done), time.time())],
+        )
+
+    def done_tags(self, site):
+        """返回该站点已完成的 TAG 集合"""
+        return {tag for (tag,) in self._query("SELECT tag FROM progress WHERE site = ? AND done = 1", (site,))}
+
+    def last_page(self, site, tag):
+        """返回该 TAG 上次爬到的页码，没有记录时返回 None"""
+        rows = self._query("SELECT page FROM progress WHERE site = ? AND tag = ?", (site, tag))
+        return rows[0][0] if rows else None
+
+    def stats(self, site=None):
+        """返回 {'images': 采集数, 'done': 成功数, 'failed': 失败数}"""
+        where, params = ("WHERE i.site = ?", (site,)) if site is not None else ("", ())
+        images, done, failed = self._query(
+            "SELECT COUNT(*), SUM(s.state = 'done'), SUM(s.state = 'failed') "
+            f"FROM images i LEFT JOIN status s ON s.url = i.url {where}", params)[0]
+        return {"images": images, "done": done or 0, "failed": failed or 0}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
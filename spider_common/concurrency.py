@@ -0,0 +1,301 @@
+"""
+按 host 自适应的下载并发控制（AIMD：加性增、乘性减）。
+
+每个 host 维护一个并发上限：
+- 成功且延迟正常时，每完成「当前上限」个请求，上限 +1；
+- 遇到 429/503、超时或延迟突增（超过平均延迟的若干倍）时，上限乘以 DECREASE_FACTOR，
+  之后 COOLDOWN 秒内不重复下调（此前已发出的请求仍会返回同样的错误）。
+下载线程池的线程数只是上限的上限，真正的并发度由各 host 的控制器决定。
+
+线程用法：
+    controller = AdaptiveConcurrency()
+    with controller.slot(url) as slot:
+        resp = http_client.get(url, ...)
+        slot.feedback(resp.status_code)
+asyncio 用法：AsyncAdaptiveConcurrency，把 with 换成 async with。
+
+BoundedExecutor：排队任务数有上限的线程池。ThreadPoolExecutor 的任务队列无界，
+生产者（解析线程）比下载快时待执行的 Future 会无限堆积；这里队列满时 submit 阻塞，
+生产者随下载速度自动放慢，stats() 提供队列深度等指标。
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+CONGESTION_STATUS = (429, 503)
+DECREASE_FACTOR = 0.5
+LATENCY_SPIKE_FACTOR = 3.0     # 延迟超过平均值的倍数视为拥塞
+LATENCY_SPIKE_FLOOR = 1.0      # 低于该秒数的延迟不算突增
+LATENCY_EWMA_ALPHA = 0.2
+COOLDOWN = 2.0
+
+_CONNECTION_ERRORS = None   # 首次判断时生成，见 _connection_errors
+
+
+def _host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower() or url.lower()
+
+
+def _connection_errors() -> tuple:
+    errors = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+              asyncio.TimeoutError, TimeoutError, ConnectionError)
+    try:
+        # aiohttp 为可选依赖，只有 asyncio 下载模式才会用到
+        import aiohttp
+    except ImportError:
+        return errors
+    # ClientConnectorError / ServerDisconnectedError / ClientOSError 等都是它的子类
+    return errors + (aiohttp.ClientConnectionError,)
+
+
+def is_congestion_error(exc: BaseException) -> bool:
+    """超时和连接被拒绝视为拥塞信号；其他异常（如 404、解析错误）不影响并发上限"""
+    global _CONNECTION_ERRORS
+    if _CONNECTION_ERRORS is None:
+        _CONNECTION_ERRORS = _connection_errors()
+    if isinstance(exc, _CONNECTION_ERRORS):
+        return True
+    return getattr(exc, "status_code", None) in CONGESTION_STATUS
+
+
+class HostState:
+    """单个 host 的 AIMD 状态（不含锁，由控制器加锁后调用）"""
+
+    def __init__(self, initial, min_limit, max_limit):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.in_flight = 0
+        self.successes = 0
+        self.avg_latency = None
+        self.last_decrease = 0.0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.current_limit
+
+    def on_success(self, latency: float | None):
+        if latency is not None and self.avg_latency is not None:
+            if latency > LATENCY_SPIKE_FLOOR and latency > self.avg_latency * LATENCY_SPIKE_FACTOR:
+                self.on_congestion()
+                return
+        if latency is not None:
+            self.avg_latency = latency if self.avg_latency is None else (
+                LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.avg_latency)
+        self.successes += 1
+        if self.successes >= self.current_limit:
+            self.successes = 0
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def on_congestion(self):
+        now = time.monotonic()
+        if now - self.last_decrease < COOLDOWN:
+            return
+        self.last_decrease = now
+        self.successes = 0
+        self.limit = max(self.min_limit, self.limit * DECREASE_FACTOR)
+
+
+class Slot:
+    """一次请求占用的并发名额；feedback() 报告状态码，未报告时按耗时记为成功"""
+
+    def __init__(self, host):
+        self.host = host
+        self.start = time.monotonic()
+        self.status = None
+        self.latency = None
+
+    def feedback(self, status_code: int, latency: float | None = None):
+        """status_code: HTTP 状态码；latency: 首字节延迟（默认取从占用名额到调用时的耗时）"""
+        self.status = status_code
+        self.latency = latency if latency is not None else time.monotonic() - self.start
+
+
+class AdaptiveConcurrency:
+    def __init__(self, initial=4, min_limit=1, max_limit=32):
+        self.initial = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self._hosts = {}
+        self._cond = threading.Condition()
+
+    def _state(self, host) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.initial, self.min_limit, self.max_limit)
+        return state
+
+    def _record(self, state: HostState, slot: Slot, exc: BaseException | None):
+        state.in_flight -= 1
+        if exc is not None:
+            if is_congestion_error(exc):
+                state.on_congestion()
+        elif slot.status in CONGESTION_STATUS:
+            state.on_congestion()
+        elif slot.status is None or slot.status < 500:
+            state.on_success(slot.latency if slot.latency is not None else time.monotonic() - slot.start)
+
+    def slot(self, url: str):
+        return _ThreadSlot(self, _host_of(url))
+
+    def limits(self) -> dict:
+        """当前各 host 的并发上限"""
+        with self._cond:
+            return {host: state.current_limit for host, state in self._hosts.items()}
+
+    def snapshot(self) -> dict:
+        """各 host 的 (并发上限, 在途请求数)"""
+        with self._cond:
+            return {host: (state.current_limit, state.in_flight) for host, state in self._hosts.items()}
+
+
+class _ThreadSlot:
+    def __init__(self, controller: AdaptiveConcurrency, host: str):
+        self.controller = controller
+        self.host = host
+        self.slot = None
+
+    def __enter__(self) -> Slot:
+        with self.controller._cond:
+            state = self.controller._state(self.host)
+            while not state.has_capacity():
+                self.controller._cond.wait()
+            state.in_flight += 1
+        self.slot = Slot(self.host)
+        return self.slot
+
+    def __exit__(self, exc_type, exc, tb):
+        with self.controller._cond:
+            self.controller._record(self.controller._state(self.host), self.slot, exc)
+            self.controller._cond.notify_all()
+        return False
+
+
+class AsyncAdaptiveConcurrency(AdaptiveConcurrency):
+    """asyncio 版本：等待名额时让出事件循环，只能在单个事件循环中使用"""
+
+    def __init__(self, initial=4, min_limit=1, max_limit=32):
+        super().__init__(initial, min_limit, max_limit)
+        self._async_cond = None
+
+    def slot(self, url: str):
+        return _AsyncSlot(self, _host_of(url))
+
+
+class _AsyncSlot:
+    def __init__(self, controller: AsyncAdaptiveConcurrency, host: str):
+        self.controller = controller
+        self.host = host
+        self.slot = None
+
+    async def __aenter__(self) -> Slot:
+        if self.controller._async_cond is None:
+            self.controller._async_cond = asyncio.Condition()
+        cond = self.controller._async_cond
+        async with cond:
+            state = self.controller._state(self.host)
+            await cond.wait_for(state.has_capacity)
+            state.in_flight += 1
+        self.slot = Slot(self.host)
+        return self.slot
+
+    async def __aexit__(self, exc_type, exc, tb):
+        cond = self.controller._async_cond
+        async with cond:
+            self.controller._record(self.controller._state(self.host), self.slot, exc)
+            cond.notify_all()
+        return False
+
+
+class BoundedExecutor:
+    """
+    用法：
+        executor = BoundedExecutor(max_workers=10, max_pending=100, thread_name_prefix='Downloader')
+        executor.submit(download, url, path)   # 已有 max_pending 个任务未完成时阻塞
+        print(executor.stats())
+        executor.shutdown(wait=True)
+    """
+
+    def __init__(self, max_workers, max_pending=None, thread_name_prefix=''):
+        """max_pending: 已提交但未完成（排队 + 执行中）的任务上限，默认 max_workers 的 4 倍"""
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 4
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._peak_pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._blocked = 0
+        self._blocked_seconds = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """提交任务；队列已满时阻塞直到有任务完成（背压）"""
+        if not self._slots.acquire(blocking=False):
+            start = time.monotonic()
+            self._slots.acquire()
+            with self._lock:
+                self._blocked += 1
+                self._blocked_seconds += time.monotonic() - start
+        with self._lock:
+            self._pending += 1
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, self._pending)
+        try:
+            future = self._executor.submit(self._call, fn, args, kwargs)
+        except BaseException:
+            self._release(failed=False)
+            raise
+        future.add_done_callback(lambda f: self._release(failed=f.cancelled() or f.exception() is not None))
+        return future
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, failed):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._failed += int(failed)
+        self._slots.release()
+
+    @property
+    def queue_depth(self) -> int:
+        """已提交但还未开始执行的任务数"""
+        with self._lock:
+            return self._pending - self._running
+
+    def stats(self) -> dict:
+        """队列深度（queued）、执行中（running）、峰值、累计提交/完成/失败数，以及 submit 被阻塞的次数和总秒数"""
+        with self._lock:
+            return {
+                "queued": self._pending - self._running, "running": self._running,
+                "pending": self._pending, "max_pending": self.max_pending, "peak_pending": self._peak_pending,
+                "submitted": self._submitted, "completed": self._completed, "failed": self._failed,
+                "blocked": self._blocked, "blocked_seconds": round(self._blocked_seconds, 3),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
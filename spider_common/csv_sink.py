@@ -0,0 +1,199 @@
+"""
+爬虫结果的后台 CSV 写入：工作线程只把行放入有界队列，由写入线程批量落盘。
+
+原来每写一行都要加锁、makedirs、stat 检查表头、打开文件、写入、关闭；
+现在每个 CSV 文件只在第一次写入时检查表头并保持句柄打开，
+按「满 batch_size 行或超过 flush_interval 秒」批量写入并 flush。
+队列满时 write 才会阻塞（写入线程跟不上时的背压），正常情况下爬虫线程不等待磁盘。
+进程退出（atexit）或调用 close() 时写入剩余的行。
+
+open_record_sink 按 fmt 或环境变量 SPIDER_OUTPUT_FORMAT（csv / parquet）选择输出格式，
+Parquet 输出见 parquet_sink.py。
+"""
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+_STOP = object()
+_FLUSH = object()
+
+# 爬取结果的默认输出格式，可通过环境变量 SPIDER_OUTPUT_FORMAT=parquet 切换
+OUTPUT_FORMAT = os.environ.get('SPIDER_OUTPUT_FORMAT', 'csv').lower()
+
+
+class CsvSink:
+    """
+    用法：
+        sink = CsvSink(['Title', 'ImageName', 'URL', 'TAG'])
+        sink.write(csv_path, [title, name, url, tag])
+        sink.flush()   # 需要立即读取 CSV 时（如爬取结束后开始下载）
+        sink.close()
+    """
+
+    def __init__(self, header, maxsize=10000, batch_size=500, flush_interval=1.0,
+                 encoding='utf-8-sig', max_open_files=64, on_error=None):
+        """
+        header: 表头，新文件或空文件写入第一行前写入一次。
+        on_error: 写入失败时在写入线程中调用 on_error(path, rows, exc)，例如撤销去重标记。
+        """
+        self.header = list(header)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.encoding = encoding
+        self.max_open_files = max_open_files
+        self.on_error = on_error
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._handles = OrderedDict()  # path -> (file, csv.writer)，按最近使用排序
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='CsvSink', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, path, row):
+        """提交一行（列表或元组），立即返回"""
+        self.write_many(path, [row])
+
+    def write_many(self, path, rows):
+        """提交同一文件的多行，作为一个队列项"""
+        if self._closed:
+            raise RuntimeError("CsvSink 已关闭")
+        rows = [list(row) for row in rows]
+        if rows:
+            self._queue.put((path, rows))
+
+    def flush(self):
+        """等待已提交的行全部写入磁盘"""
+        if self._closed:
+            return
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """写入剩余的行并关闭所有文件句柄，可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 写入线程 ----------
+    def _run(self):
+        pending = []
+        pending_rows = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(pending)
+                self._queue.task_done()
+                break
+            if item is not None and item is not _FLUSH:
+                pending.append(item)
+                pending_rows += len(item[1])
+
+            if item is _FLUSH or pending_rows >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                pending_rows = 0
+                deadline = time.monotonic() + self.flush_interval
+            if item is _FLUSH:
+                self._sync()
+                self._queue.task_done()
+
+        self._close_handles()
+
+    def _sync(self):
+        """flush() 时调用：_flush 已经对每个文件 flush，CSV 不需要额外处理"""
+
+    def _close_handles(self):
+        for f, _ in self._handles.values():
+            f.close()
+        self._handles.clear()
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        touched = set()
+        for path, rows in pending:
+            try:
+                _, writer = self._get_writer(path)
+                writer.writerows(rows)
+                touched.add(path)
+            except (OSError, csv.Error) as e:
+                print(f"[CSV 写入失败] {path} -> {e}")
+                if self.on_error:
+                    try:
+                        self.on_error(path, rows, e)
+                    except Exception as callback_error:
+                        print(f"[CSV 写入失败回调出错] {callback_error}")
+        for path in touched:
+            handle = self._handles.get(path)
+            if handle:
+                handle[0].flush()
+        # 数据项在写入后才标记完成，flush() 依赖这一点
+        for _ in pending:
+            self._queue.task_done()
+
+    def _get_writer(self, path):
+        handle = self._handles.get(path)
+        if handle:
+            self._handles.move_to_end(path)
+            return handle
+
+        if len(self._handles) >= self.max_open_files:
+            _, (old_f, _) = self._handles.popitem(last=False)
+            old_f.close()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        need_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        f = open(path, 'a', newline='', encoding=self.encoding)
+        writer = csv.writer(f)
+        if need_header:
+            writer.writerow(self.header)
+        self._handles[path] = (f, writer)
+        return f, writer
+
+
+def failed_rows_reporter(header, column='ImageName', limit=20):
+    """返回一个 on_error 回调，列出未能写入的行（按 column 列，如图片文件名），便于之后补采"""
+    index = header.index(column) if column in header else None
+
+    def on_error(path, rows, exc):
+        names = [str(row[index]) for row in rows if index is not None and index < len(row)]
+        more = ' ...' if len(names) > limit else ''
+        print(f"[✗] {len(rows)} 行未写入 {path}: {', '.join(names[:limit])}{more}")
+    return on_error
+
+
+def open_record_sink(header, site=None, fmt=None, partition_col=None, **kwargs):
+    """
+    返回爬取结果的写入器，调用方式都是 sink.write(csv_path, row)。
+    fmt='parquet' 时写入 csv_path 同名的 .parquet 数据集，按 site / TAG 分区（需要 pyarrow）。
+    write 只是放入队列，未传 on_error 时写入失败由 failed_rows_reporter 列出丢失的行。
+    """
+    header = list(header)
+    kwargs.setdefault('on_error', failed_rows_reporter(header))
+    fmt = (fmt or OUTPUT_FORMAT).lower()
+    if fmt == 'parquet':
+        from .parquet_sink import ParquetSink
+        return ParquetSink(header, site=site, partition_col=partition_col, **kwargs)
+    if fmt != 'csv':
+        raise ValueError(f"未知的输出格式: {fmt}")
+    return CsvSink(header, **kwargs)
@@ -0,0 +1,137 @@
+"""
+流式读取 CSV 下载任务：边读边提交，内存占用与 CSV 大小无关。
+
+- detect_encoding 只读取文件开头的一段字节判断编码（BOM / UTF-8 / GBK），
+  不再为了猜编码把整个文件读两三遍；
+- iter_csv_rows 逐行产出 dict，支持必填列检查、行数限制和相册（按某一列去重计数）限制，
+  后面的行不符合开头判断出的编码时换下一个候选编码重读，不会把字符替换成乱码；
+- run_bounded 把任务逐个提交到线程池，在途任务数有上限（有界队列），
+  第一个任务在读到第一行后立即开始下载，不必等整个 CSV 读完。
+
+用法：
+    rows = iter_csv_rows(csv_path, required=['URL', 'TAG'], album_key='Title', album_limit=10)
+    run_bounded(lambda row: download(row['URL']), rows, max_workers=8)
+"""
+import codecs
+import csv
+import threading
+
+from .concurrency import BoundedExecutor
+
+ENCODINGS = ('utf-8-sig', 'utf-8', 'gbk', 'gb18030')
+SAMPLE_SIZE = 64 * 1024
+
+
+class MissingColumns(ValueError):
+    """CSV 表头中缺少必需的列"""
+
+
+def detect_encoding(path, candidates=ENCODINGS, sample_size=SAMPLE_SIZE) -> str:
+    """根据文件开头 sample_size 字节判断编码，都无法解码时返回最后一个候选"""
+    with open(path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8) and 'utf-8-sig' in candidates:
+        return 'utf-8-sig'
+    for encoding in candidates:
+        if encoding == 'utf-8-sig':
+            continue
+        try:
+            # final=False：样本末尾被截断的多字节字符不算解码失败
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return candidates[-1]
+
+
+def _fallback_encodings(encoding) -> list:
+    """解码失败后依次改用的编码：ENCODINGS 中排在 encoding 之后的（UTF-8 的两种写法只算一种）"""
+    if encoding not in ENCODINGS:
+        return []
+    return [e for e in ENCODINGS[ENCODINGS.index(encoding) + 1:] if not e.startswith('utf-8')]
+
+
+def iter_csv_rows(path, required=(), encoding=None, limit=None, album_key=None, album_limit=None,
+                  albums_contiguous=False):
+    """
+    逐行产出 CSV 记录（dict）。
+    required: 必需的列名，表头缺少时抛出 MissingColumns，值为空的行跳过。
+    limit: 最多产出的行数。
+    album_key / album_limit: 只产出前 album_limit 个不同 album_key 值（相册）的行；
+        albums_contiguous=True 表示同一相册的行是连续的，遇到超出限制的新相册时直接停止读取。
+
+    按严格模式解码，不替换字符：编码只根据文件开头判断，后面的行解码失败时换下一个候选编码从头重读，
+    跳过已经读过的行继续产出；所有候选都失败时抛出 UnicodeDecodeError。
+    """
+    required = list(required)
+    encoding = encoding or detect_encoding(path)
+    encodings = [encoding] + _fallback_encodings(encoding)
+    fieldnames = None
+    albums = set()
+    produced = 0
+    consumed = 0    # 已读过的数据行数（含被跳过的行），换编码重读时跳过这些行
+    for index, encoding in enumerate(encodings):
+        try:
+            with open(path, 'r', newline='', encoding=encoding) as f:
+                # 重读时沿用第一次解析的表头，避免 BOM 等按新编码解码后列名变化
+                reader = csv.DictReader(f, fieldnames=fieldnames)
+                if fieldnames is None:
+                    fieldnames = reader.fieldnames or []
+                    missing = [c for c in required if c not in fieldnames]
+                    if missing:
+                        raise MissingColumns(f"{path} 缺少列: {', '.join(missing)}（编码: {encoding}）")
+                else:
+                    next(reader.reader, None)
+                for line, row in enumerate(reader):
+                    if line < consumed:
+                        continue
+                    consumed += 1
+                    if limit is not None and produced >= limit:
+                        return
+                    if required and not all(row.get(c) for c in required):
+                        continue
+                    if album_key and album_limit:
+                        album = row.get(album_key)
+                        if album not in albums:
+                            if len(albums) >= album_limit:
+                                if albums_contiguous:
+                                    return
+                                continue
+                            albums.add(album)
+                    produced += 1
+                    yield row
+            return
+        except UnicodeDecodeError as e:
+            if index + 1 >= len(encodings):
+                raise UnicodeDecodeError(
+                    e.encoding, e.object, e.start, e.end,
+                    f"{path} 第 {consumed} 条记录之后有无法解码的内容（已尝试: {', '.join(encodings)}）") from e
+            print(f"[CSV] {path} 第 {consumed} 条记录之后有无法按 {encoding} 解码的内容，"
+                  f"改用 {encodings[index + 1]} 重读（跳过已读的 {consumed} 行）")
+
+
+def run_bounded(fn, tasks, max_workers=8, max_pending=None, on_done=None) -> int:
+    """
+    逐个从 tasks（可以是生成器）取任务提交到 BoundedExecutor，在途任务不超过 max_pending（默认 max_workers 的 4 倍）。
+    on_done(task, result, exc) 在任务结束后调用（调用之间互斥，可以直接累加计数），返回提交的任务数。
+    """
+    callback_lock = threading.Lock()
+    submitted = 0
+
+    def finished(task, future):
+        exc = future.exception()
+        result = None if exc else future.result()
+        if on_done is None:
+            if exc:
+                print(f"[任务异常] {task!r}: {exc}")
+            return
+        with callback_lock:
+            on_done(task, result, exc)
+
+    with BoundedExecutor(max_workers, max_pending) as executor:
+        for task in tasks:
+            # 在途任务已满时阻塞读取，CSV 不会被一次性读入内存
+            future = executor.submit(fn, task)
+            future.add_done_callback(lambda fut, task=task: finished(task, fut))
+            submitted += 1
+    return submitted
@@ -0,0 +1,211 @@
+"""
+批量去重：一页 20~100 个 URL 只需一次 Redis 往返。
+
+check_and_add_many 在一个 pipeline 中对每个成员执行 SADD，
+SADD 本身是原子的「检查并加入」，返回 0 表示已存在，
+因此多个线程 / 多个进程同时处理同一批 URL 时，每个成员只会被判定为「新」一次
+（原来的 sismember + sadd 两步之间存在竞争）。
+
+本地层：每个 Redis key 对应一个持久化的 Bloom 过滤器文件（见 bloom.py）。
+Redis 可用时以 Redis 为准（清空 Redis 集合即可重新采集，新 URL 不会因 Bloom 误判被丢弃），
+判定结果同步写入 Bloom；Redis 不可用或操作失败时才用 Bloom 判定，程序重启后仍然有效
+（原来的内存 set 退出即丢失）。Bloom 过滤器按 error_rate 的概率把新成员误判为重复，不会把重复判为新。
+local_dir=None 时不使用本地层，Redis 不可用时退回带锁的内存集合。
+Bloom 不支持删除，依赖 discard_many 回滚的爬虫应传 local_dir=None。
+
+指纹模式（DedupSet.fingerprinted）：成员为 64 位整数指纹，按高位分片保存到 {key}:fp:{分片} 中，
+见 fingerprint.py；迁移完成前同时查询旧集合，未迁移时不会重复采集。
+
+用法：
+    dedup = DedupSet(redis_conn, 'image_md5_set_yande.re', member=md5_hex)
+    dedup = DedupSet.fingerprinted(redis_conn, 'image_md5_set_yande.re', md5_fingerprint, legacy_member=md5_hex)
+    duplicate_mask = dedup.check_and_add_many(urls)
+    new_urls = [u for u, dup in zip(urls, duplicate_mask) if not dup]
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import defaultdict
+
+from .bloom import BloomFilter, DEFAULT_CAPACITY, DEFAULT_ERROR_RATE
+from .fingerprint import SHARD_BITS, fingerprint_key, shard_key
+
+# 本地 Bloom 过滤器文件目录，可通过环境变量 SPIDER_DEDUP_DIR 修改
+DEFAULT_LOCAL_DIR = os.environ.get(
+    'SPIDER_DEDUP_DIR', os.path.join(os.path.expanduser('~'), '.spider_common', 'dedup'))
+
+_blooms = {}   # 路径 -> BloomFilter，同一进程内同一个 key 共用一个映射
+_blooms_lock = threading.Lock()
+
+
+def md5_hex(value: str) -> str:
+    """原有爬虫在 Redis 中保存的成员格式：URL 的 32 位 MD5"""
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def open_local_filter(key: str, local_dir: str = DEFAULT_LOCAL_DIR, capacity: int = DEFAULT_CAPACITY,
+                      error_rate: float = DEFAULT_ERROR_RATE) -> BloomFilter:
+    """返回 key 对应的本地 Bloom 过滤器（同一进程内复用）"""
+    path = os.path.abspath(os.path.join(local_dir, re.sub(r'[^\w.-]', '_', key) + '.bloom'))
+    with _blooms_lock:
+        bloom = _blooms.get(path)
+        if bloom is None:
+            bloom = _blooms[path] = BloomFilter(path, capacity, error_rate)
+        return bloom
+
+
+class DedupSet:
+    def __init__(self, redis_conn, key: str, member=None, local_dir=DEFAULT_LOCAL_DIR,
+                 capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE,
+                 shard_bits: int | None = None, legacy_key: str | None = None, legacy_member=None):
+        """
+        redis_conn: redis.Redis 实例，None 表示只用本地去重。
+        member: 把传入的值转换为集合成员的函数（如 md5_hex），默认原样保存。
+        local_dir: 本地 Bloom 过滤器目录，None 表示不使用本地层。
+        capacity / error_rate: 首次创建过滤器文件时的容量和误判率。
+        shard_bits: 成员为 64 位整数指纹时按高位分片，Redis key 为 {key}:{分片}。
+        legacy_key / legacy_member: 迁移前的旧集合及其成员格式，未命中时一并查询。
+        """
+        self.redis = redis_conn
+        self.key = key
+        self.member = member or (lambda value: value)
+        self.shard_bits = shard_bits
+        self.legacy_key = legacy_key
+        self.legacy_member = legacy_member or self.member
+        self.bloom = None
+        if local_dir:
+            try:
+                self.bloom = open_local_filter(key, local_dir, capacity, error_rate)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ 本地去重文件不可用: {e}，使用内存去重。")
+        self._local = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fingerprinted(cls, redis_conn, key: str, fingerprint, legacy_member=None,
+                      shard_bits: int = SHARD_BITS, **kwargs):
+        """
+        指纹模式：key 为原集合名，新数据写入 {key}:fp:{分片}；
+        legacy_member 为原集合的成员格式（如 md5_hex 或原样 URL），给出时同时查询原集合。
+        """
+        return cls(redis_conn, fingerprint_key(key), member=fingerprint, shard_bits=shard_bits,
+                   legacy_key=key if legacy_member else None, legacy_member=legacy_member, **kwargs)
+
+    def _redis_key(self, member) -> str:
+        return shard_key(self.key, member, self.shard_bits) if self.shard_bits else self.key
+
+    def _group_by_key(self, members) -> dict:
+        groups = defaultdict(list)
+        for m in members:
+            groups[self._redis_key(m)].append(m)
+        return groups
+
+    def _local_check_and_add(self, members) -> list[bool]:
+        if self.bloom is None:
+            with self._lock:
+                mask = []
+                for m in members:
+                    mask.append(m in self._local)
+                    self._local.add(m)
+                return mask
+        return self.bloom.check_and_add_many([str(m) for m in members])
+
+    def _local_add(self, members):
+        """记录 Redis 已判定的成员，Redis 之后不可用时本地层仍然知道它们"""
+        if self.bloom is not None:
+            self.bloom.add_many([str(m) for m in members])
+        else:
+            with self._lock:
+                self._local.update(members)
+
+    def check_and_add_many(self, values) -> list[bool]:
+        """逐个检查并加入，返回与 values 等长的列表，True 表示已存在（重复，包括同一批中的重复项）"""
+        values = list(values)
+        members = [self.member(value) for value in values]
+        if not members:
+            return []
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for m in members:
+                    pipe.sadd(self._redis_key(m), m)
+                if self.legacy_key:
+                    for value in values:
+                        pipe.sismember(self.legacy_key, self.legacy_member(value))
+                results = pipe.execute()
+                legacy = results[len(members):] or [False] * len(members)
+                self._local_add(members)
+                return [added == 0 or bool(in_legacy) for added, in_legacy in zip(results, legacy)]
+            except Exception as e:
+                print(f"⚠️ Redis 操作失败: {e}，临时使用本地去重。")
+        return self._local_check_and_add(members)
+
+    def check_and_add(self, value) -> bool:
+        """单个值的版本，已存在返回 True"""
+        return self.check_and_add_many([value])[0]
+
+    def contains_many(self, values) -> list[bool]:
+        """只检查不加入（SMISMEMBER 需要 Redis 6.2，这里用 pipeline 兼容旧版本）"""
+        values = list(values)
+        members = [self.member(value) for value in values]
+        if not members:
+            return []
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for m in members:
+                    pipe.sismember(self._redis_key(m), m)
+                if self.legacy_key:
+                    for value in values:
+                        pipe.sismember(self.legacy_key, self.legacy_member(value))
+                results = pipe.execute()
+                legacy = results[len(members):] or [False] * len(members)
+                return [bool(found) or bool(in_legacy) for found, in_legacy in zip(results, legacy)]
+            except Exception as e:
+                print(f"⚠️ Redis 操作失败: {e}，临时使用本地去重。")
+        if self.bloom is not None:
+            return [self.bloom.contains(str(m)) for m in members]
+        with self._lock:
+            return [m in self._local for m in members]
+
+    def add_many(self, values):
+        """只加入不检查（用于「处理成功后才标记已访问」的爬虫）"""
+        members = [self.member(value) for value in values]
+        if not members:
+            return
+        self._local_add(members)
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, group in self._group_by_key(members).items():
+                    pipe.sadd(key, *group)
+                pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Redis 操作失败: {e}，临时使用本地去重。")
+
+    def discard_many(self, values):
+        """撤销标记（如写入 CSV 失败，下次需要重新采集）；Bloom 无法撤销，调用方应使用 local_dir=None 创建"""
+        values = list(values)
+        members = [self.member(value) for value in values]
+        if not members:
+            return
+        if self.redis is not None:
+            try:
+                pipe = self.redis.pipeline(transaction=False)
+                for key, group in self._group_by_key(members).items():
+                    pipe.srem(key, *group)
+                if self.legacy_key:
+                    pipe.srem(self.legacy_key, *[self.legacy_member(v) for v in values])
+                pipe.execute()
+            except Exception as e:
+                print(f"⚠️ Redis 操作失败: {e}")
+        if self.bloom is not None:
+            print("⚠️ 本地 Bloom 去重层无法撤销标记，这些成员在 Redis 不可用时仍会被判为重复。")
+        with self._lock:
+            self._local.difference_update(members)
+
+    def flush(self):
+        """把本地过滤器写回磁盘（进程正常退出时操作系统也会写回）"""
+        if self.bloom is not None:
+            self.bloom.flush()
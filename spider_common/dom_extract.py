@@ -0,0 +1,99 @@
+"""
+一次 execute_script 批量提取页面上的图片卡片。
+
+逐个卡片调用 find_element / get_attribute 时，每次调用都是一次 WebDriver HTTP 往返，
+滚动加载几百张卡片就是几千次往返，并且元素随时可能失效（StaleElementReferenceException）。
+extract_cards 把选择器规则交给浏览器执行，一次返回所有卡片的 dict 列表。
+
+字段规则：{字段名: (规则, 备选规则, ...)}，每条规则为 (卡片内的 CSS 选择器, 属性)：
+- 选择器为 '' 表示卡片元素本身；
+- 属性 'text' 取可见文本（与 WebElement.text 一致），'href' / 'src' 取浏览器解析后的绝对地址，其余取属性原始值；
+- 依次尝试各条规则，取第一个非空值，都为空时为 ''；
+- 规则写成 (选择器, 属性, True) 时取所有匹配元素的值，结果为列表。
+
+用法：
+    cards = extract_cards(driver, 'figure', IMAGE_FIELDS, start=processed_count)
+    for card in cards:
+        url = largest_srcset_url(card['srcset']) or card['url']
+"""
+
+# 默认字段：图片地址、srcset、alt 和标题
+IMAGE_FIELDS = {
+    'url': (('img', 'src'),),
+    'srcset': (('img', 'srcset'),),
+    'alt': (('img', 'alt'),),
+    'title': (('', 'title'), ('a', 'title'), ('img', 'title')),
+}
+
+# readCards(cards, fields)：按字段规则读取一组卡片元素，scroll_loader 的滚动脚本也复用这段 JS
+READ_CARDS_JS = """
+function readCards(cards, fields) {
+    function read(el, attr) {
+        var value;
+        if (attr === 'text') {
+            value = el.innerText || '';
+        } else if (attr === 'href' || attr === 'src') {
+            value = typeof el[attr] === 'string' && el[attr] ? el[attr] : el.getAttribute(attr);
+        } else {
+            value = el.getAttribute(attr);
+        }
+        return value ? String(value).trim() : '';
+    }
+    return cards.map(function (card) {
+        var out = {};
+        Object.keys(fields).forEach(function (name) {
+            var rules = fields[name];
+            var value = '';
+            for (var i = 0; i < rules.length && !(value && value.length); i++) {
+                var selector = rules[i][0], attr = rules[i][1], many = rules[i][2];
+                if (many) {
+                    var els = selector ? card.querySelectorAll(selector) : [card];
+                    value = Array.prototype.map.call(els, function (el) { return read(el, attr); })
+                        .filter(function (v) { return v; });
+                } else {
+                    var el = selector ? card.querySelector(selector) : card;
+                    value = el ? read(el, attr) : '';
+                }
+            }
+            out[name] = value;
+        });
+        return out;
+    });
+}
+"""
+
+_EXTRACT_JS = READ_CARDS_JS + """
+var cards = Array.prototype.slice.call(document.querySelectorAll(arguments[0]), arguments[2] || 0);
+return readCards(cards, arguments[1]);
+"""
+
+
+def field_spec(fields):
+    """把字段规则转换成可传给 execute_script 的 JSON 结构（元组转列表）"""
+    return {name: [list(rule) for rule in rules] for name, rules in fields.items()}
+
+
+def extract_cards(driver, card_selector, fields=None, start=0):
+    """
+    一次 WebDriver 往返提取所有匹配 card_selector 的卡片，返回 [dict, ...]。
+    start: 跳过前 start 张卡片（滚动加载时只提取新出现的卡片）。
+    """
+    return driver.execute_script(_EXTRACT_JS, card_selector, field_spec(fields or IMAGE_FIELDS), start) or []
+
+
+def largest_srcset_url(srcset):
+    """从 srcset 中选出宽度（或像素密度）最大的地址；没有描述符时取最后一项"""
+    best_url, best_size = '', -1.0
+    for candidate in (srcset or '').split(','):
+        parts = candidate.strip().split()
+        if not parts:
+            continue
+        size = 0.0
+        if len(parts) > 1 and parts[-1][-1:] in ('w', 'x'):
+            try:
+                size = float(parts[-1][:-1])
+            except ValueError:
+                pass
+        if size >= best_size:
+            best_url, best_size = parts[0], size
+    return best_url
@@ -0,0 +1,420 @@
+"""
+共享下载路径：流式写入 .downloading 临时文件，支持 HTTP Range 断点续传。
+
+临时文件旁的 .downloading.meta 记录 ETag / Last-Modified / 总长度。
+续传时发送 Range: bytes=N- 与 If-Range，服务器内容已变化或不支持 Range（返回 200）时自动从头下载，
+返回 206 时校验 Content-Range 的起点和总长度后追加写入。
+PartialFile 只依赖状态码和响应头，requests 与 aiohttp 两种下载方式共用。
+
+大文件分段下载：首个响应声明 Accept-Ranges: bytes 且长度超过 SEGMENT_THRESHOLD 时，
+预分配临时文件，拆成 SEGMENT_COUNT 段并行请求，每段写入自己的偏移位置；
+各段进度记录在 meta 的 segments 中，中断后只补未完成的部分。
+"""
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from . import http_client
+
+TEMP_SUFFIX = ".downloading"
+META_SUFFIX = ".meta"
+CHUNK_SIZE = 64 * 1024
+SNIFF_SIZE = 512
+SEGMENT_THRESHOLD = 16 * 1024 * 1024   # 超过该大小的文件分段并行下载
+SEGMENT_COUNT = 4
+
+# 文件头魔数 -> 扩展名
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"BM", ".bmp"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+]
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+
+
+class DownloadError(requests.exceptions.RequestException):
+    """下载失败的基类，沿用 RequestException，现有的 except 分支无需修改"""
+
+
+class HTTPStatusError(DownloadError):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP Status Code {status_code}")
+        self.status_code = status_code
+
+
+class ContentTypeError(DownloadError):
+    """返回的是 HTML / 文本页面而不是文件"""
+
+
+class IncompleteDownload(DownloadError):
+    """传输中断或长度校验失败，已下载的部分保留在临时文件中，下次调用时续传"""
+
+
+class SourceChanged(IncompleteDownload):
+    """分段续传时服务器返回 200（文件已变化或不再支持 Range），已下载的分段作废"""
+
+
+# ---------- 文件类型识别 ----------
+def sniff_image_type(head: bytes) -> str | None:
+    """根据文件头的前几个字节判断图片类型，返回扩展名；无法识别返回 None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"hevc", b"mif1", b"msf1"):
+            return ".heic"
+        if brand in (b"avif", b"avis"):
+            return ".avif"
+    text_head = head.lstrip().lower()
+    if text_head.startswith(b"<?xml") or b"<svg" in text_head:
+        return ".svg"
+    return None
+
+
+def is_html_body(head: bytes) -> bool:
+    """Content-Type 声明为图片但实际返回 HTML 页面（防盗链/验证页）的情况"""
+    text_head = head.lstrip().lower()
+    return text_head.startswith(b"<!doctype html") or text_head.startswith(b"<html")
+
+
+def remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def parse_content_range(value: str | None) -> tuple[int, int | None] | None:
+    """解析 'bytes 100-199/2000'，返回 (起始偏移, 总长度)；总长度未知时为 None"""
+    match = _CONTENT_RANGE_RE.match(value or "")
+    if not match:
+        return None
+    total = match.group(3)
+    return int(match.group(1)), None if total == "*" else int(total)
+
+
+# ---------- 临时文件 ----------
+class PartialFile:
+    """
+    一个 .downloading 临时文件。
+    用法：
+        part = PartialFile(temp_path)
+        headers.update(part.request_headers())
+        part.begin(status, resp_headers)    # 决定追加还是从头写
+        for chunk in ...: part.write(chunk)
+        kind = part.finish()                # 校验长度，返回识别出的文件类型
+    """
+
+    def __init__(self, temp_path: str):
+        self.temp_path = temp_path
+        self.meta_path = temp_path + META_SUFFIX
+        self.meta = self._load_meta()
+        size = os.path.getsize(temp_path) if os.path.exists(temp_path) else 0
+        # 没有 meta（旧版程序留下的临时文件）无法校验内容是否一致，只能从头下载
+        self.offset = size if size and self.meta else 0
+        # 分段下载的临时文件已预分配，文件大小不代表进度，进度以 segments 为准
+        self.segments = self.meta.get("segments") if self.offset else None
+        if self.segments:
+            self.total = self.meta.get("total")
+            self.offset = 0
+        else:
+            self.total = self.meta.get("total") if self.offset else None
+        self.written = self.offset
+        self._file = None
+
+    def _load_meta(self) -> dict:
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    def request_headers(self) -> dict:
+        """续传请求头；Accept-Encoding: identity 保证字节偏移对应原始文件"""
+        headers = {"Accept-Encoding": "identity"}
+        if self.offset:
+            headers.update(self.range_headers(self.offset))
+        return headers
+
+    def range_headers(self, start: int, end: int | None = None) -> dict:
+        headers = {"Range": f"bytes={start}-{'' if end is None else end}"}
+        validator = self.meta.get("etag") or self.meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+        return headers
+
+    def is_complete(self) -> bool:
+        return bool(self.offset) and self.total == self.offset
+
+    def begin(self, status: int, headers):
+        """根据响应状态码和响应头打开临时文件；headers 为大小写不敏感的映射"""
+        if status == 206 and self.offset:
+            content_range = parse_content_range(headers.get("Content-Range"))
+            if (content_range is None or content_range[0] != self.offset
+                    or (self.total and content_range[1] and content_range[1] != self.total)):
+                self.discard()
+                raise IncompleteDownload(f"Content-Range 不匹配: {headers.get('Content-Range')}")
+            self.total = content_range[1] or self.total
+            mode = "ab"
+        elif status == 200:
+            # 服务器忽略 Range 或 If-Range 校验失败（文件已变化），从头下载
+            self.offset = 0
+            self.written = 0
+            length = headers.get("Content-Length")
+            self.total = int(length) if length and length.isdigit() else None
+            self._reset_meta(headers)
+            mode = "wb"
+        else:
+            raise HTTPStatusError(status)
+        self._file = open(self.temp_path, mode)
+
+    def _reset_meta(self, headers, segments=None):
+        etag = headers.get("ETag") or ""
+        self.meta = {
+            # 弱 ETag 不能用于 If-Range
+            "etag": etag if etag and not etag.startswith("W/") else None,
+            "last_modified": headers.get("Last-Modified"),
+            "total": self.total,
+        }
+        if segments:
+            self.meta["segments"] = segments
+        self._save_meta()
+
+    def plan_segments(self, headers, count: int):
+        """按首个 200 响应的长度预分配临时文件并拆分为 count 段，每段记为 [起点, 终点, 已写入]"""
+        self.total = int(headers["Content-Length"])
+        step = -(-self.total // count)
+        self.segments = [[start, min(start + step, self.total) - 1, 0] for start in range(0, self.total, step)]
+        with open(self.temp_path, "wb") as f:
+            f.truncate(self.total)
+        self._reset_meta(headers, self.segments)
+
+    def save_segments(self):
+        if self.segments:
+            self.meta["segments"] = self.segments
+            self._save_meta()
+
+    def segment_progress(self) -> int:
+        return sum(seg[2] for seg in self.segments)
+
+    def finish_segments(self) -> str | None:
+        """所有分段完成后校验总长度和文件头，返回识别出的文件类型"""
+        missing = [seg for seg in self.segments if seg[2] != seg[1] - seg[0] + 1]
+        if missing:
+            self.save_segments()
+            raise IncompleteDownload(f"分段未完成: {self.segment_progress()}/{self.total} 字节")
+        if os.path.getsize(self.temp_path) != self.total:
+            self.discard()
+            raise IncompleteDownload("分段合并后长度不一致")
+        with open(self.temp_path, "rb") as f:
+            head = f.read(SNIFF_SIZE)
+        if is_html_body(head):
+            self.discard()
+            raise ContentTypeError("Content-Type: text/html (文件头识别)")
+        remove_quietly(self.meta_path)
+        return sniff_image_type(head)
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        if self.written == 0 and is_html_body(chunk[:SNIFF_SIZE]):
+            self.discard()
+            raise ContentTypeError("Content-Type: text/html (文件头识别)")
+        self._file.write(chunk)
+        self.written += len(chunk)
+
+    def finish(self) -> str | None:
+        """关闭并校验长度；不完整时保留临时文件供续传并抛出 IncompleteDownload"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.total is not None and self.written != self.total:
+            if self.written > self.total:
+                self.discard()
+            raise IncompleteDownload(f"内容不完整: {self.written}/{self.total} 字节")
+        if self.written == 0:
+            self.discard()
+            raise IncompleteDownload("空响应")
+        with open(self.temp_path, "rb") as f:
+            kind = sniff_image_type(f.read(SNIFF_SIZE))
+        remove_quietly(self.meta_path)
+        return kind
+
+    def abort(self):
+        """传输异常：关闭文件，保留已写入的部分和 meta 供下次续传"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        if self.written == 0:
+            self.discard()
+
+    def discard(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        remove_quietly(self.temp_path)
+        remove_quietly(self.meta_path)
+        self.offset = self.written = 0
+        self.total = None
+        self.meta = {}
+        self.segments = None
+
+
+def check_content_type(headers, reject_content_types):
+    content_type = (headers.get("Content-Type") or "").lower()
+    if any(t in content_type for t in reject_content_types):
+        raise ContentTypeError(f"Content-Type: {content_type}")
+
+
+# ---------- requests 下载入口 ----------
+def can_segment(headers, segment_threshold: int) -> bool:
+    """服务器支持按字节 Range 且文件足够大（未压缩传输，偏移才对应原始文件）"""
+    length = headers.get("Content-Length") or ""
+    return ("bytes" in (headers.get("Accept-Ranges") or "").lower()
+            and not headers.get("Content-Encoding")
+            and length.isdigit() and int(length) > segment_threshold)
+
+
+def _fetch_segment(url, part, segment, headers, timeout, verify, chunk_size, progress, concurrency):
+    start, end, done = segment
+    req_headers = dict(headers)
+    req_headers.update(part.range_headers(start + done, end))
+    with concurrency.slot(url) if concurrency else contextlib.nullcontext() as slot, \
+            http_client.get(url, headers=req_headers, stream=True, timeout=timeout, verify=verify,
+                            status_retries=False) as resp:
+        if slot:
+            slot.feedback(resp.status_code)
+        if resp.status_code == 200:
+            raise SourceChanged("分段请求返回 200，重新下载")
+        if resp.status_code != 206:
+            raise HTTPStatusError(resp.status_code)
+        content_range = parse_content_range(resp.headers.get("Content-Range"))
+        if content_range is None or content_range[0] != start + done or content_range[1] != part.total:
+            raise IncompleteDownload(f"Content-Range 不匹配: {resp.headers.get('Content-Range')}")
+        with open(part.temp_path, "r+b") as f:
+            f.seek(start + done)
+            for chunk in resp.iter_content(chunk_size=chunk_size):
+                chunk = chunk[:end - start + 1 - segment[2]]
+                if not chunk:
+                    break
+                f.write(chunk)
+                segment[2] += len(chunk)
+                progress(len(chunk))
+
+
+def _fetch_segments(url, part, headers, timeout, verify, chunk_size, on_progress, concurrency) -> str | None:
+    """并行补齐 part.segments 中未完成的分段，各段用独立的文件句柄写入自己的偏移"""
+    pending = [seg for seg in part.segments if seg[2] < seg[1] - seg[0] + 1]
+    lock = threading.Lock()
+    written = [part.segment_progress()]
+
+    def progress(n):
+        if on_progress:
+            with lock:
+                written[0] += n
+                on_progress(written[0], part.total)
+
+    with ThreadPoolExecutor(max_workers=len(pending) or 1) as executor:
+        futures = [executor.submit(_fetch_segment, url, part, seg, headers, timeout, verify,
+                                   chunk_size, progress, concurrency) for seg in pending]
+        errors = [f.exception() for f in futures]
+    errors = [e for e in errors if e is not None]
+    if errors:
+        if any(isinstance(e, SourceChanged) for e in errors):
+            part.discard()
+        else:
+            part.save_segments()
+        raise errors[0]
+    return part.finish_segments()
+
+
+def fetch_to_temp(url: str, temp_path: str, headers: dict | None = None, timeout=(5, 60),
+                  verify: bool = True, retries: int = 1, retry_wait: float = 0.5,
+                  reject_content_types=(), chunk_size: int = CHUNK_SIZE, on_progress=None,
+                  concurrency=None, segments: int = SEGMENT_COUNT,
+                  segment_threshold: int = SEGMENT_THRESHOLD) -> str | None:
+    """
+    把 url 下载到 temp_path（已有部分时续传），完成后返回文件头识别出的类型，不做重命名。
+    网络中断和 429/5xx 时最多重试 retries 次，每次都从已写入的位置继续（状态码重试按 retry_wait 指数退避）。
+    ContentTypeError 和其他 HTTPStatusError 不重试。
+    concurrency: 可选的 AdaptiveConcurrency，传输期间占用该 host 的一个并发名额，并反馈状态码和首字节延迟。
+    segments: 大于 segment_threshold 且支持 Range 的文件拆成的并行分段数，1 表示不分段。
+    """
+    last_error = None
+    for attempt in range(retries + 1):
+        part = PartialFile(temp_path)
+        try:
+            if part.segments:
+                # 上次分段下载未完成，只补缺失的部分
+                return _fetch_segments(url, part, dict(headers or {}, **{"Accept-Encoding": "identity"}),
+                                       timeout, verify, chunk_size, on_progress, concurrency)
+            req_headers = dict(headers or {})
+            req_headers.update(part.request_headers())
+            with concurrency.slot(url) if concurrency else contextlib.nullcontext() as slot, \
+                    http_client.get(url, headers=req_headers, stream=True, timeout=timeout, verify=verify,
+                                    status_retries=False) as resp:
+                if slot:
+                    slot.feedback(resp.status_code)
+                if resp.status_code == 416 and part.offset:
+                    if part.is_complete():
+                        return part.finish()
+                    part.discard()
+                    raise IncompleteDownload("Range Not Satisfiable，重新下载")
+                if resp.status_code not in (200, 206):
+                    raise HTTPStatusError(resp.status_code)
+                check_content_type(resp.headers, reject_content_types)
+
+                if segments > 1 and resp.status_code == 200 and can_segment(resp.headers, segment_threshold):
+                    # 不读取这个响应体，关闭后按分段并行请求
+                    part.plan_segments(resp.headers, segments)
+                else:
+                    part.begin(resp.status_code, resp.headers)
+                    try:
+                        for chunk in resp.iter_content(chunk_size=chunk_size):
+                            part.write(chunk)
+                            if on_progress:
+                                on_progress(part.written, part.total)
+                    except Exception:
+                        part.abort()
+                        raise
+                    return part.finish()
+            return _fetch_segments(url, part, req_headers, timeout, verify, chunk_size, on_progress, concurrency)
+        except HTTPStatusError as e:
+            # 共享客户端不再按状态码隐式重试（并发控制要看到真实状态码），在这里释放并发名额后退避重试
+            if e.status_code not in http_client.RETRY_STATUS or attempt >= retries:
+                raise
+            last_error = e
+            time.sleep(retry_wait * 2 ** attempt)
+        except ContentTypeError:
+            raise
+        except requests.exceptions.RequestException as e:
+            last_error = e
+            if attempt < retries:
+                time.sleep(retry_wait)
+    raise last_error
+
+
+def download_file(url: str, save_path: str, **kwargs) -> str | None:
+    """下载到 save_path：先写入 save_path + '.downloading'，完成后原子重命名；参数同 fetch_to_temp"""
+    temp_path = save_path + TEMP_SUFFIX
+    kind = fetch_to_temp(url, temp_path, **kwargs)
+    os.replace(temp_path, save_path)
+    return kind
@@ -0,0 +1,63 @@
+"""
+紧凑的 64 位 URL 指纹，用于 Redis 去重集合。
+
+原来的去重集合保存完整 URL 或 32 位十六进制 MD5 字符串，每个成员在 Redis 中占用约 80~150 字节。
+改为 64 位有符号整数并按高位分片到 2^SHARD_BITS 个小集合后，
+每个分片保持 intset 编码（成员数不超过 set-max-intset-entries，默认 512），每个成员只占 8 字节。
+
+两种指纹：
+- url_fingerprint: 规范化 URL 后取 blake2b 的 8 字节摘要（保存完整 URL 的站点）；
+- md5_fingerprint: 原 MD5 的前 8 字节（保存 MD5 的站点，已有集合可以直接换算迁移）。
+旧集合的迁移工具见 migrate_fingerprints.py。
+"""
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+SHARD_BITS = 16          # 65536 个分片，约 3300 万条以内每个分片都是 intset 编码
+FINGERPRINT_SUFFIX = ":fp"
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def canonicalize_url(url: str) -> str:
+    """scheme/host 小写、去掉默认端口和 #片段、去掉跟踪参数并对查询参数排序"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(_TRACKING_PARAMS))
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _to_signed(value: int) -> int:
+    # Redis 的 intset 只接受有符号 64 位整数
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def url_fingerprint(url: str) -> int:
+    digest = hashlib.blake2b(canonicalize_url(url).encode("utf-8"), digest_size=8).digest()
+    return _to_signed(int.from_bytes(digest, "big"))
+
+
+def md5_hex_fingerprint(md5_hex: str) -> int:
+    """已保存的 32 位 MD5 字符串 -> 指纹（迁移旧集合用）"""
+    return _to_signed(int(md5_hex[:16], 16))
+
+
+def md5_fingerprint(url: str) -> int:
+    """与原来 hashlib.md5(url).hexdigest() 成员一一对应的指纹"""
+    return md5_hex_fingerprint(hashlib.md5(url.encode("utf-8")).hexdigest())
+
+
+def fingerprint_key(key: str) -> str:
+    """原集合名 -> 指纹集合的前缀，例如 image_md5_set_yande.re -> image_md5_set_yande.re:fp"""
+    return key + FINGERPRINT_SUFFIX
+
+
+def shard_key(prefix: str, fingerprint: int, shard_bits: int = SHARD_BITS) -> str:
+    """按指纹的高 shard_bits 位选择分片，例如 image_md5_set_yande.re:fp:1a2b"""
+    shard = (fingerprint & 0xFFFFFFFFFFFFFFFF) >> (64 - shard_bits)
+    return f"{prefix}:{shard:0{(shard_bits + 3) // 4}x}"
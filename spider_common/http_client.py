@@ -0,0 +1,121 @@
+"""
+共享 HTTP 客户端：按 host 复用的 requests.Session 连接池。
+
+每个 host 一个 Session（线程间共享，urllib3 连接池本身是线程安全的），
+统一配置连接池大小、重试退避和 keep-alive，站点可以注册默认请求头和 Referer。
+各爬虫用 http_client.get(...) 代替直接调用 requests.get(...)，同一 host 的请求复用 TCP/TLS 连接。
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+DEFAULT_TIMEOUT = (5, 30)   # (连接超时, 读取超时)
+POOL_MAXSIZE = 64           # 每个 host 保持的最大连接数，应不小于使用该 host 的线程数
+
+# 重试策略：与 Civitai 下载代码.py 一致，429/5xx 指数退避 (1s, 2s, 4s...)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 1
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_lock = threading.Lock()
+_sessions = {}       # (host, status_retries) -> requests.Session
+_site_headers = {}   # host -> 默认请求头
+
+
+def _host_of(url_or_host: str) -> str:
+    if "://" in url_or_host:
+        return urlsplit(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+def build_retry(status_retries: bool = True) -> Retry:
+    """
+    raise_on_status=False：重试用尽后仍返回最后一次响应，调用方照常检查 status_code。
+    status_retries=False 时只重试连接错误，429/5xx 立即返回给调用方：
+    自适应并发（slot.feedback）和会话桥要看到真实的状态码，不能被 urllib3 隐藏的退避重试吞掉。
+    """
+    return Retry(
+        total=RETRY_TOTAL,
+        backoff_factor=RETRY_BACKOFF,
+        status=None if status_retries else 0,
+        status_forcelist=RETRY_STATUS if status_retries else (),
+        respect_retry_after_header=status_retries,
+        allowed_methods=["HEAD", "GET", "OPTIONS"],
+        raise_on_status=False,
+    )
+
+
+def register_site(url_or_host: str, referer: str | None = None, headers: dict | None = None):
+    """
+    为某个 host 注册默认请求头 / Referer，之后该 host 的所有请求自动带上（单次请求传入的 headers 优先）。
+    只对完全相同的 host 生效，不包括子域名；图片 CDN 等其他 host 的请求头仍需在请求时传入。
+    """
+    host = _host_of(url_or_host)
+    site_headers = dict(headers or {})
+    if referer:
+        site_headers['Referer'] = referer
+    with _lock:
+        _site_headers.setdefault(host, {}).update(site_headers)
+        for status_retries in (True, False):
+            session = _sessions.get((host, status_retries))
+            if session is not None:
+                session.headers.update(site_headers)
+
+
+def get_session(url_or_host: str, status_retries: bool = True) -> requests.Session:
+    """返回该 host 的共享 Session，首次调用时创建；status_retries=False 的 Session 不按状态码重试"""
+    key = (_host_of(url_or_host), status_retries)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            host = key[0]
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE,
+                                  max_retries=build_retry(status_retries))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            session.headers.update(_site_headers.get(host, {}))
+            _sessions[key] = session
+    return session
+
+
+def request(method: str, url: str, status_retries: bool = True, **kwargs) -> requests.Response:
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    return get_session(url, status_retries).request(method, url, **kwargs)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def head(url: str, **kwargs) -> requests.Response:
+    # 与 requests.head 一致，默认不跟随重定向
+    kwargs.setdefault('allow_redirects', False)
+    return request("HEAD", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def close_all():
+    """关闭所有连接池（程序结束时调用，可选）"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,110 @@
+"""
+一次性迁移：把旧的去重集合（完整 URL 或 32 位 MD5 字符串）换算为 64 位指纹，写入分片集合 {key}:fp:{分片}。
+
+用法（在仓库根目录执行）：
+    python -m spider_common.migrate_fingerprints image_md5_set_yande.re image_md5_set_artstation
+    python -m spider_common.migrate_fingerprints pornpics_image_url_set --kind url --delete-source
+
+--kind auto 时按成员格式判断：32 位十六进制视为 MD5，其余视为 URL。
+迁移前后分别统计旧集合与指纹分片的 MEMORY USAGE 以及整个实例的 used_memory。
+源集合默认保留（爬虫在迁移后仍会查询它），确认无误后再加 --delete-source 删除。
+"""
+import argparse
+import re
+
+import redis
+
+from .fingerprint import SHARD_BITS, fingerprint_key, md5_hex_fingerprint, shard_key, url_fingerprint
+
+_MD5_RE = re.compile(r"^[0-9a-f]{32}$")
+BATCH_SIZE = 5000
+
+
+def to_fingerprint(member: str, kind: str) -> int:
+    if kind == "md5" or (kind == "auto" and _MD5_RE.match(member)):
+        return md5_hex_fingerprint(member)
+    return url_fingerprint(member)
+
+
+def shard_memory(conn, prefix: str) -> tuple[int, int]:
+    """返回 (分片数, 所有分片的 MEMORY USAGE 之和)"""
+    keys = total = 0
+    for key in conn.scan_iter(match=f"{prefix}:*", count=1000):
+        keys += 1
+        total += conn.memory_usage(key, samples=0) or 0
+    return keys, total
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.1f} {unit}" if unit != "B" else f"{n} B"
+        n /= 1024
+
+
+def migrate_key(conn, key: str, kind: str = "auto", shard_bits: int = SHARD_BITS,
+                delete_source: bool = False) -> dict:
+    prefix = fingerprint_key(key)
+    source_count = conn.scard(key)
+    source_memory = conn.memory_usage(key, samples=0) or 0
+    used_before = conn.info("memory")["used_memory"]
+
+    migrated = 0
+    batch = []
+
+    def flush():
+        pipe = conn.pipeline(transaction=False)
+        for fp in batch:
+            pipe.sadd(shard_key(prefix, fp, shard_bits), fp)
+        pipe.execute()
+        batch.clear()
+
+    for member in conn.sscan_iter(key, count=BATCH_SIZE):
+        if isinstance(member, bytes):
+            member = member.decode("utf-8", "replace")
+        batch.append(to_fingerprint(member, kind))
+        migrated += 1
+        if len(batch) >= BATCH_SIZE:
+            flush()
+            print(f"  [{key}] 已迁移 {migrated}/{source_count}", end="\r", flush=True)
+    if batch:
+        flush()
+
+    shards, fp_memory = shard_memory(conn, prefix)
+    if delete_source:
+        conn.unlink(key)
+    used_after = conn.info("memory")["used_memory"]
+    return {
+        "key": key, "members": source_count, "migrated": migrated, "shards": shards,
+        "source_memory": source_memory, "fingerprint_memory": fp_memory,
+        "used_before": used_before, "used_after": used_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把旧的 Redis 去重集合迁移为分片的 64 位指纹集合")
+    parser.add_argument("keys", nargs="+", help="旧集合名，如 image_md5_set_yande.re")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--db", type=int, default=0)
+    parser.add_argument("--kind", choices=("auto", "md5", "url"), default="auto", help="旧集合的成员格式")
+    parser.add_argument("--shard-bits", type=int, default=SHARD_BITS)
+    parser.add_argument("--delete-source", action="store_true", help="迁移后删除旧集合")
+    args = parser.parse_args()
+
+    conn = redis.Redis(host=args.host, port=args.port, db=args.db)
+    for key in args.keys:
+        if not conn.exists(key):
+            print(f"⚠️ 集合不存在，跳过: {key}")
+            continue
+        print(f"🔄 开始迁移: {key}")
+        r = migrate_key(conn, key, args.kind, args.shard_bits, args.delete_source)
+        ratio = r["fingerprint_memory"] / r["source_memory"] if r["source_memory"] else 0
+        print(f"\n✅ {key}: {r['migrated']}/{r['members']} 条 -> {r['shards']} 个分片")
+        print(f"   旧集合 MEMORY USAGE: {format_bytes(r['source_memory'])}")
+        print(f"   指纹分片 MEMORY USAGE: {format_bytes(r['fingerprint_memory'])} ({ratio:.1%})")
+        print(f"   实例 used_memory: {format_bytes(r['used_before'])} -> {format_bytes(r['used_after'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Parquet 输出：爬取记录按 站点/TAG 分区写入 Parquet 数据集，可替代 CSV。
+
+目录结构（Hive 分区，pyarrow / pandas / DuckDB 都能直接读取）：
+    all_records.parquet/site=yande/TAG=landscape/part-20251101-120000-1234-0.parquet
+
+- 与 CsvSink 接口相同（write(path, row)，path 仍传 CSV 路径，数据集目录为同名的 .parquet 目录）；
+- 与 CsvSink 一样按「满 batch_size 行或超过 flush_interval 秒」批量落盘，每次落盘把每个分区的行
+  写成一个完整的 part 文件（先写 . 开头的临时文件再改名），写完立即可读；
+  Parquet 文件要写完尾部才能读取，不能像 CSV 那样追加，因此默认间隔比 CSV 长，
+  进程崩溃时最多丢失最近 flush_interval 秒的行；
+- 不改写已有文件，列式存储 + zstd 压缩；
+- 读取用 read_records()，按列裁剪和按分区过滤，不需要猜测编码；同名 CSV 也存在时一并读取。
+
+依赖 pyarrow（pip install pyarrow），只在选择 Parquet 输出时才需要。
+"""
+import itertools
+import os
+import time
+from urllib.parse import quote
+
+from .csv_sink import CsvSink
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:   # 只使用 CSV 输出时不需要 pyarrow
+    pa = ds = pq = None
+
+DATASET_SUFFIX = '.parquet'
+TAG_COLUMNS = ('TAG', 'Tag', 'tag')
+
+
+def dataset_path(path: str) -> str:
+    """CSV 路径 -> 对应的 Parquet 数据集目录（all_records.csv -> all_records.parquet）"""
+    if path.endswith(DATASET_SUFFIX):
+        return path
+    return os.path.splitext(path)[0] + DATASET_SUFFIX
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Parquet 输出需要 pyarrow，请先执行 pip install pyarrow")
+
+
+class ParquetSink(CsvSink):
+    """
+    用法：
+        sink = ParquetSink(['Title', 'ImageName', 'URL', 'TAG'], site='yande')
+        sink.write(csv_path, [title, name, url, tag])
+        sink.close()
+    """
+
+    def __init__(self, header, site=None, partition_col=None, compression='zstd',
+                 batch_size=5000, flush_interval=10.0, **kwargs):
+        """
+        site: 第一级分区（site=...），None 表示不按站点分区。
+        partition_col: 第二级分区的列名，默认取表头中的 TAG 列。
+        batch_size / flush_interval: 落盘阈值，每次落盘每个有新行的分区生成一个 part 文件。
+        """
+        _require_pyarrow()
+        header = list(header)
+        if partition_col is None:
+            partition_col = next((c for c in TAG_COLUMNS if c in header), None)
+        self.site = site
+        self.partition_col = partition_col
+        self.compression = compression
+        self._part_index = header.index(partition_col) if partition_col else None
+        # 分区列由目录名表示，不重复写入文件
+        self._columns = [c for c in header if c != partition_col]
+        self._schema = pa.schema([(c, pa.string()) for c in self._columns])
+        self._run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self._seq = itertools.count()
+        super().__init__(header, batch_size=batch_size, flush_interval=flush_interval, **kwargs)
+
+    def _partition_dir(self, path, row):
+        parts = [dataset_path(path)]
+        if self.site:
+            parts.append(f"site={quote(str(self.site), safe='')}")
+        if self._part_index is not None:
+            value = row[self._part_index] if self._part_index < len(row) else ''
+            parts.append(f"{self.partition_col}={quote(str(value), safe='')}")
+        return os.path.join(*parts)
+
+    # ---------- 写入线程 ----------
+    def _flush(self, pending):
+        if not pending:
+            return
+        groups = {}   # 分区目录 -> (第一行的原 CSV 路径, 行列表)
+        for path, rows in pending:
+            for row in rows:
+                groups.setdefault(self._partition_dir(path, row), (path, []))[1].append(row)
+        for directory, (path, rows) in groups.items():
+            self._write_part(directory, path, rows)
+        # 数据项在写入后才标记完成，flush() 依赖这一点
+        for _ in pending:
+            self._queue.task_done()
+
+    def _write_part(self, directory, path, rows):
+        columns = {c: [] for c in self._columns}
+        for row in rows:
+            values = [v for i, v in enumerate(row) if i != self._part_index]
+            for c, v in itertools.zip_longest(self._columns, values):
+                if c is not None:
+                    columns[c].append(None if v is None else str(v))
+        name = f"part-{self._run_id}-{next(self._seq)}.parquet"
+        temp_path = os.path.join(directory, '.' + name + '.tmp')
+        try:
+            os.makedirs(directory, exist_ok=True)
+            pq.write_table(pa.table(columns, schema=self._schema), temp_path, compression=self.compression)
+            os.replace(temp_path, os.path.join(directory, name))
+        except (OSError, pa.ArrowException) as e:
+            print(f"[Parquet 写入失败] {directory} -> {e}")
+            if self.on_error:
+                try:
+                    self.on_error(path, rows, e)
+                except Exception as callback_error:
+                    print(f"[Parquet 写入失败回调出错] {callback_error}")
+
+
+def _partition_schema(parquet_path):
+    """按目录名（key=value）确定分区字段，统一为字符串类型，避免纯数字的 TAG 被推断为整数"""
+    keys = []
+    directory = parquet_path
+    while True:
+        subdirs = [d for d in os.listdir(directory) if '=' in d and os.path.isdir(os.path.join(directory, d))]
+        if not subdirs:
+            break
+        keys.append(subdirs[0].split('=', 1)[0])
+        directory = os.path.join(directory, subdirs[0])
+    return pa.schema([(k, pa.string()) for k in keys])
+
+
+def _read_csv(path, columns, tags):
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=(lambda c: c in columns) if columns else None)
+    if tags is not None:
+        tag_col = next((c for c in TAG_COLUMNS if c in df.columns), None)
+        if tag_col:
+            df = df[df[tag_col].isin(list(tags))]
+    return df
+
+
+def _read_parquet(parquet_path, columns, site, tags):
+    _require_pyarrow()
+    partitioning = ds.partitioning(_partition_schema(parquet_path), flavor='hive')
+    dataset = ds.dataset(parquet_path, format='parquet', partitioning=partitioning)
+    names = dataset.schema.names
+    condition = None
+    if site is not None and 'site' in names:
+        condition = ds.field('site') == site
+    if tags is not None:
+        tag_col = next((c for c in TAG_COLUMNS if c in names), None)
+        if tag_col:
+            tag_filter = ds.field(tag_col).isin([str(t) for t in tags])
+            condition = tag_filter if condition is None else condition & tag_filter
+    if columns:
+        columns = [c for c in columns if c in names]
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def read_records(path, columns=None, site=None, tags=None):
+    """
+    读取爬取记录，返回 pandas.DataFrame。
+    path 为 CSV 路径或其对应的 Parquet 数据集目录；两者都存在时（切换过输出格式）合并读取。
+    只加载 columns 指定的列，可按 tags 过滤，Parquet 还可按 site 过滤分区（CSV 没有 site 列，不过滤）。
+    """
+    import pandas as pd
+
+    parquet_path = dataset_path(path)
+    csv_path = os.path.splitext(parquet_path)[0] + '.csv' if path.endswith(DATASET_SUFFIX) else path
+    frames = []
+    if os.path.isdir(parquet_path):
+        frames.append(_read_parquet(parquet_path, columns, site, tags))
+    if os.path.exists(csv_path) or not frames:
+        # 都不存在时照常由 read_csv 抛出 FileNotFoundError
+        frames.append(_read_csv(csv_path, columns, tags))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,60 @@
+"""
+断点续传索引：把已成功下载的 URL 持久化到 SQLite。
+
+由 StatusJournal 的回调随写随更新，启动时一次查询即可得到已完成集合，
+不再逐个 TAG 读取 {tag}_records.csv。索引文件首次创建时会导入已有的状态 CSV。
+"""
+import csv
+import glob
+import os
+import sqlite3
+import threading
+
+SUCCESS_STATUS = "✅成功"
+
+
+class ResumeIndex:
+    def __init__(self, db_path, records_glob=None):
+        """
+        db_path: 索引文件路径
+        records_glob: 旧状态 CSV 的通配路径（如 download_dir/*_records.csv），仅在索引首次创建时导入
+        """
+        is_new = not os.path.exists(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS done (url TEXT PRIMARY KEY) WITHOUT ROWID")
+        self._conn.commit()
+        if is_new and records_glob:
+            self.import_status_csvs(glob.glob(records_glob))
+
+    def import_status_csvs(self, paths):
+        """一次性导入已有状态 CSV 中成功的 URL"""
+        for path in paths:
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as f:
+                    self.add_many(
+                        row["URL"] for row in csv.DictReader(f)
+                        if row.get("Status") == SUCCESS_STATUS and row.get("URL")
+                    )
+            except (OSError, KeyError, csv.Error) as e:
+                print(f"Warning: 无法导入 {path}. 错误: {e}")
+
+    def add_many(self, urls):
+        with self._lock:
+            self._conn.executemany("INSERT OR IGNORE INTO done (url) VALUES (?)", ((u,) for u in urls))
+            self._conn.commit()
+
+    def on_journal_batch(self, batch):
+        """StatusJournal 回调：把本批中成功的记录写入索引"""
+        self.add_many(str(row["URL"]) for _, row in batch if row.get("Status") == SUCCESS_STATUS)
+
+    def load_done(self):
+        """返回全部已完成 URL 的集合"""
+        with self._lock:
+            return {url for (url,) in self._conn.execute("SELECT url FROM done")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
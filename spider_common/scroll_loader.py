@@ -0,0 +1,147 @@
+"""
+事件驱动的无限滚动加载：用 MutationObserver 和在途请求计数代替固定 sleep。
+
+原来的滚动循环每次滚动后固定等待 1~3 秒再比较 scrollHeight：内容早就到了也要等满，
+内容来得慢又会误判为到底。ScrollLoader 第一次使用时向页面注入观察器：
+- MutationObserver 记录最后一次有节点插入的时间；
+- 包装 XMLHttpRequest / fetch，统计在途请求数。
+每轮滚动后在浏览器里轮询（execute_async_script，一轮只有一次 WebDriver 往返）：
+出现新卡片且 DOM 已安静 settle 秒就立即返回这批卡片；没有新卡片时，
+DOM 安静 quiet_period 秒且没有在途请求（或超过 max_wait）即结束本轮。
+已返回的卡片记在页面内的 WeakSet 中，每轮只返回新增的卡片。
+
+停止条件：连续 idle_rounds 轮没有新卡片并且已到底部（或滚动位置不再变化），或达到 max_rounds。
+
+用法：
+    loader = ScrollLoader(driver, 'figure', IMAGE_FIELDS, step=1080)
+    for batch in loader.rounds():      # 每批是新出现的卡片 dict（fields=None 时为 WebElement）
+        handle(batch)
+    cards = ScrollLoader(driver, 'a.card', fields).load_all()
+"""
+from .dom_extract import READ_CARDS_JS, field_spec
+
+_SCROLL_JS = READ_CARDS_JS + """
+var selector = arguments[0], fields = arguments[1], opts = arguments[2];
+var done = arguments[arguments.length - 1];
+var state = window.__scrollLoader;
+if (!state) {
+    state = window.__scrollLoader = {seen: new WeakSet(), last: Date.now(), pending: 0};
+    var touch = function () { state.last = Date.now(); };
+    var finish = function () { state.pending = Math.max(0, state.pending - 1); touch(); };
+    new MutationObserver(function (records) {
+        for (var i = 0; i < records.length; i++) {
+            if (records[i].addedNodes.length) { touch(); return; }
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++;
+        this.addEventListener('loadend', finish);
+        try {
+            return send.apply(this, arguments);
+        } catch (e) {
+            finish();
+            throw e;
+        }
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            state.pending++;
+            try {
+                return fetch.apply(this, arguments).finally(finish);
+            } catch (e) {
+                finish();
+                throw e;
+            }
+        };
+    }
+}
+var scroller = document.scrollingElement || document.documentElement;
+var start = Date.now(), startY = window.pageYOffset;
+if (opts.scroll) {
+    if (opts.step) {
+        window.scrollBy(0, opts.step);
+    } else {
+        window.scrollTo(0, scroller.scrollHeight);
+    }
+}
+function fresh() {
+    return Array.prototype.filter.call(document.querySelectorAll(selector), function (el) {
+        return !state.seen.has(el);
+    });
+}
+(function poll() {
+    var now = Date.now();
+    var calm = now - Math.max(state.last, start);
+    var cards = fresh();
+    var timeout = now - start >= opts.maxWait;
+    if (!(cards.length && calm >= opts.settle) && !(calm >= opts.quiet && state.pending <= 0) && !timeout) {
+        setTimeout(poll, opts.interval);
+        return;
+    }
+    cards.forEach(function (el) { state.seen.add(el); });
+    done({
+        cards: fields ? readCards(cards, fields) : cards,
+        moved: window.pageYOffset !== startY,
+        atBottom: window.innerHeight + window.pageYOffset >= scroller.scrollHeight - 2,
+        pending: state.pending,
+        waited: now - start
+    });
+})();
+"""
+
+
+class ScrollLoader:
+    def __init__(self, driver, card_selector, fields=None, step=None, settle=0.3, quiet_period=1.5,
+                 max_wait=10.0, idle_rounds=2, max_rounds=200, poll_interval=0.1):
+        """
+        card_selector: 卡片的 CSS 选择器；fields: dom_extract 的字段规则，为 None 时返回 WebElement。
+        step: 每轮滚动的像素数，为 None 时直接滚到底部。
+        settle: 出现新卡片后 DOM 需安静的秒数（等同批卡片插入完毕）；
+        quiet_period: 没有新卡片时，DOM 安静且无在途请求多少秒算本轮结束；max_wait: 单轮最长等待秒数。
+        """
+        self.driver = driver
+        self.card_selector = card_selector
+        self.fields = field_spec(fields) if fields else None
+        self.step = step
+        self.idle_rounds = idle_rounds
+        self.max_rounds = max_rounds
+        self.max_wait = max_wait
+        self._opts = {
+            'step': step, 'settle': int(settle * 1000), 'quiet': int(quiet_period * 1000),
+            'maxWait': int(max_wait * 1000), 'interval': int(poll_interval * 1000),
+        }
+        self.rounds_done = 0
+        self.total = 0
+        self.reached_bottom = False
+
+    def scroll_once(self, scroll=True) -> dict:
+        """滚动一次并等待本轮结束，返回 {cards, moved, atBottom, pending, waited}"""
+        self.driver.set_script_timeout(self.max_wait + 10)
+        opts = dict(self._opts, scroll=scroll)
+        return self.driver.execute_async_script(_SCROLL_JS, self.card_selector, self.fields, opts) or {}
+
+    def rounds(self):
+        """逐轮滚动，产出每轮新出现的卡片列表（第一轮不滚动，先取当前已渲染的卡片）"""
+        idle = 0
+        for index in range(self.max_rounds):
+            result = self.scroll_once(scroll=index > 0)
+            self.rounds_done = index + 1
+            self.reached_bottom = bool(result.get('atBottom'))
+            cards = result.get('cards') or []
+            if cards:
+                idle = 0
+                self.total += len(cards)
+                yield cards
+            elif self.reached_bottom or not result.get('moved'):
+                idle += 1
+                if idle >= self.idle_rounds:
+                    return
+
+    def load_all(self) -> list:
+        """滚动到停止条件满足，返回全部卡片"""
+        cards = []
+        for batch in self.rounds():
+            cards.extend(batch)
+        return cards
@@ -0,0 +1,138 @@
+"""
+浏览器到 requests 的会话桥：一个浏览器作为 Cookie 来源，所有 requests 工作线程共享它的 Cookie 和 UA。
+
+Cloudflare 的 cf_clearance 等 Cookie 会过期，并且与通过挑战时的 User-Agent 绑定。
+原来的脚本要么启动时取一次 Cookie 再也不更新，要么遇到任何错误就改用浏览器串行打开页面。
+SessionBridge 在响应像挑战页或会话失效（401/403、cf-mitigated: challenge、挑战页标记）时，
+让浏览器访问一次出错的地址、等待挑战通过，然后同步最新的 Cookie 和 UA 并重试请求，之后所有线程继续走 requests。
+多个线程同时发现失效时只刷新一次（按 generation 判断其他线程是否已刷新），
+两次刷新至少间隔 min_interval 秒，避免真正的 403（如文件无权限）反复打开浏览器。
+
+用法：
+    bridge = SessionBridge(driver, BASE_URL, headers={'Referer': BASE_URL + '/'})
+    resp = bridge.get(url, timeout=15)         # 任意线程调用
+    html = bridge.page_source(url)             # 仍被拦截时的最后手段：浏览器直接取页面
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import http_client
+
+DENIED_STATUS = (401, 403)
+CHALLENGE_STATUS = (403, 429, 503)
+CHALLENGE_MARKERS = ('_cf_chl_opt', 'challenge-platform', 'cf-challenge', 'Just a moment...', 'Attention Required!')
+CHALLENGE_TITLES = ('Just a moment', 'Attention Required', '请稍候')
+
+
+def is_challenge(resp) -> bool:
+    """响应是否为 Cloudflare 一类的挑战页"""
+    if resp.headers.get('cf-mitigated', '').lower() == 'challenge':
+        return True
+    if resp.status_code not in CHALLENGE_STATUS:
+        return False
+    content_type = resp.headers.get('Content-Type', '')
+    if 'html' not in content_type:
+        return False
+    head = resp.text[:20000]
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def needs_refresh(resp) -> bool:
+    """默认的失效判断：挑战页或 401/403"""
+    return resp.status_code in DENIED_STATUS or is_challenge(resp)
+
+
+class SessionBridge:
+    def __init__(self, driver, base_url, headers=None, cookies=None, expired=None,
+                 challenge_timeout=30.0, min_interval=30.0):
+        """
+        headers: 额外的固定请求头（如 Referer），User-Agent 始终取浏览器的 navigator.userAgent；
+        cookies: 已有的 Cookie，为 None 时立即从浏览器同步；
+        expired(resp): 判断响应是否需要刷新会话，默认 needs_refresh。
+        """
+        self.driver = driver
+        self.base_url = base_url
+        self.extra_headers = dict(headers or {})
+        self.expired = expired or needs_refresh
+        self.challenge_timeout = challenge_timeout
+        self.min_interval = min_interval
+        self._lock = threading.Lock()   # 浏览器只能串行使用
+        self.cookies = dict(cookies or {})
+        self.headers = dict(self.extra_headers)
+        self.generation = 0
+        self.refreshes = 0
+        self.last_refresh = 0.0
+        with self._lock:
+            self._sync(replace=cookies is None)
+
+    def _sync(self, replace=False):
+        """从浏览器读取当前页面域名下的 Cookie 和 UA（调用方持有 _lock）"""
+        cookies = {c['name']: c['value'] for c in self.driver.get_cookies()}
+        # 浏览器只返回当前域名的 Cookie，合并保留其他域名已取得的 Cookie
+        self.cookies = cookies if replace else {**self.cookies, **cookies}
+        user_agent = self.driver.execute_script("return navigator.userAgent")
+        self.headers = dict(self.extra_headers, **({'User-Agent': user_agent} if user_agent else {}))
+        self.generation += 1
+
+    def _wait_challenge(self) -> bool:
+        deadline = time.monotonic() + self.challenge_timeout
+        while True:
+            title = self.driver.title or ''
+            if not any(marker in title for marker in CHALLENGE_TITLES):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+    def refresh(self, generation=None, url=None) -> bool:
+        """
+        浏览器访问一次 url（默认 base_url），等待挑战通过后同步 Cookie 和 UA。
+        generation 与当前值不同说明其他线程已经刷新过，直接返回；距上次刷新不足 min_interval 秒时也不刷新。
+        返回本次调用后是否应重试请求。
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return True
+            if time.monotonic() - self.last_refresh < self.min_interval:
+                return False
+            target = url or self.base_url
+            print(f"[会话桥] 会话失效或遇到挑战页，浏览器重新访问: {target[:100]}")
+            self.driver.get(target)
+            passed = self._wait_challenge()
+            self._sync()
+            self.refreshes += 1
+            self.last_refresh = time.monotonic()
+            if not passed:
+                print(f"[会话桥] 等待 {self.challenge_timeout:.0f} 秒后仍停留在挑战页。")
+            return passed
+
+    def request(self, method, url, **kwargs):
+        """用共享的 Cookie/UA 请求；响应失效时刷新一次会话后重试"""
+        extra = kwargs.pop('headers', None) or {}
+        for attempt in range(2):
+            generation = self.generation
+            # 不按状态码重试：挑战页的 403/503 要立即交给 expired 判断，而不是先被退避重试几秒
+            resp = http_client.request(method, url, headers={**self.headers, **extra}, cookies=self.cookies,
+                                       status_retries=False, **kwargs)
+            if attempt or not self.expired(resp):
+                return resp
+            # 页面请求直接访问原地址；其他域名的资源访问该域名首页即可取得 Cookie
+            parts = urlsplit(url)
+            target = url if parts.netloc == urlsplit(self.base_url).netloc else f"{parts.scheme}://{parts.netloc}/"
+            if not self.refresh(generation, target):
+                return resp
+            resp.close()
+        return resp
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def page_source(self, url, wait=3.0):
+        """由浏览器直接打开页面并返回 HTML（串行、慢，只作最后手段），同时同步 Cookie"""
+        with self._lock:
+            self.driver.get(url)
+            self._wait_challenge()
+            time.sleep(wait)
+            self._sync()
+            return self.driver.page_source, self.driver.current_url
@@ -0,0 +1,131 @@
+"""
+下载状态日志：后台单线程批量写入 CSV。
+
+工作线程只把记录放入队列，由写入线程按「满 N 行或超过 T 秒」批量落盘，
+每个状态文件保持一个打开的句柄，关闭时保证所有记录都已写入。
+"""
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+_STOP = object()
+
+
+class StatusJournal:
+    """
+    用法：
+        journal = StatusJournal(["URL", "TAG", "Status"])
+        journal.record(csv_path, {"URL": url, "TAG": tag, "Status": "✅成功"})
+        journal.close()
+    """
+
+    def __init__(self, fieldnames, batch_size=200, flush_interval=0.5,
+                 encoding='utf-8-sig', max_open_files=256):
+        self.fieldnames = list(fieldnames)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.encoding = encoding
+        self.max_open_files = max_open_files
+        self._queue = queue.Queue()
+        self._handles = OrderedDict()  # path -> (file, csv.DictWriter)，按最近使用排序
+        self._listeners = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='StatusJournal', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add_listener(self, callback):
+        """注册回调 callback(batch)，batch 为 [(path, row), ...]，每批写入 CSV 后在写入线程中调用"""
+        self._listeners.append(callback)
+
+    def record(self, path, row):
+        """提交一行记录，立即返回，不等待磁盘写入"""
+        if self._closed:
+            raise RuntimeError("StatusJournal 已关闭")
+        self._queue.put((path, row))
+
+    def close(self):
+        """写入剩余记录并关闭所有文件句柄，可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 写入线程 ----------
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(pending)
+                break
+            if item is not None:
+                pending.append(item)
+
+            if len(pending) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+
+        for f, _ in self._handles.values():
+            f.close()
+        self._handles.clear()
+
+    def _flush(self, pending):
+        if not pending:
+            return
+        touched = set()
+        for path, row in pending:
+            try:
+                f, writer = self._get_writer(path)
+                writer.writerow(row)
+                touched.add(path)
+            except OSError as e:
+                print(f"[状态日志写入失败] {path} -> {e}")
+        for path in touched:
+            handle = self._handles.get(path)
+            if handle:
+                handle[0].flush()
+        for callback in self._listeners:
+            try:
+                callback(pending)
+            except Exception as e:
+                print(f"[状态日志回调失败] {e}")
+
+    def _get_writer(self, path):
+        handle = self._handles.get(path)
+        if handle:
+            self._handles.move_to_end(path)
+            return handle
+
+        if len(self._handles) >= self.max_open_files:
+            _, (old_f, _) = self._handles.popitem(last=False)
+            old_f.close()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        need_header = not os.path.exists(path) or os.path.getsize(path) == 0
+        f = open(path, 'a', newline='', encoding=self.encoding)
+        writer = csv.DictWriter(f, fieldnames=self.fieldnames, extrasaction='ignore')
+        if need_header:
+            writer.writeheader()
+        self._handles[path] = (f, writer)
+        return f, writer
@@ -0,0 +1,229 @@
+"""
+单浏览器多窗口池：少数几个 Chrome 进程为大量工作线程各提供一个窗口。
+
+每个线程启动一个完整 Chrome 时，20 个线程占用 6–10 GB 内存、启动要 30 秒以上。
+TabPool 只启动 browsers 个 Chrome，每个借用位置通过 debuggerAddress 附加一个 chromedriver 会话，
+并在同一个浏览器里打开自己的窗口：
+- 浏览器、GPU、网络进程和 HTTP 缓存由所有窗口共享，新开一个窗口只要几百毫秒；
+- 每个会话有自己的当前窗口，不同线程的命令可以并发执行（单个会话切换标签页就必须全局加锁，
+  一个线程的 execute_async_script 等待会卡住所有线程）；
+- 用独立窗口而不是后台标签页：后台标签页的定时器和渲染会被节流，无限滚动不再加载，
+  KEEP_ALIVE_ARGS 同时关闭了被遮挡窗口的降级。
+
+注意 window_handles 返回整个浏览器的所有窗口，借用方不要用 window_handles[0] / [-1] 切换窗口，
+也不要用 new_window('tab')（新标签页会开在最后激活的窗口里，把其他线程的页面挤到后台），
+在自己的窗口里直接 driver.get 即可。
+UA、headless 等启动参数对整个浏览器生效；性能日志等会话级能力要通过 capabilities 传给每个附加会话。
+
+用法：
+    pool = TabPool(make_options, make_service, size=20)
+    with pool.tab() as driver:
+        driver.get(url)
+    pool.close()
+"""
+import contextlib
+import queue
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from .browser_pool import _PAGE_ERRORS
+
+# 让不在前台的窗口保持正常的定时器和渲染
+KEEP_ALIVE_ARGS = (
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+)
+
+
+class _Browser:
+    """一个 Chrome 进程，由 owner 会话启动，owner 的初始窗口一直保留，关闭 owner 即关闭浏览器"""
+
+    def __init__(self, options, service):
+        for arg in KEEP_ALIVE_ARGS:
+            options.add_argument(arg)
+        self.owner = webdriver.Chrome(service=service, options=options)
+        # chromedriver 启动的浏览器会在能力中返回远程调试地址，附加会话直接使用
+        self.address = self.owner.capabilities['goog:chromeOptions']['debuggerAddress']
+        self.tabs = 0
+
+    def alive(self) -> bool:
+        try:
+            self.owner.current_window_handle
+            return True
+        except WebDriverException:
+            return False
+
+    def quit(self):
+        try:
+            self.owner.quit()
+        except Exception:
+            pass
+
+
+class _Tab:
+    def __init__(self, browser: _Browser, driver):
+        self.browser = browser
+        self.driver = driver
+        self.handle = driver.current_window_handle
+
+
+class TabPool:
+    def __init__(self, options_factory, service_factory, size: int = 8, browsers: int = 1,
+                 capabilities: dict | None = None, warm: bool = True):
+        """
+        options_factory: 无参函数，返回启动浏览器用的 ChromeOptions；
+        service_factory: 无参函数，返回新的 chromedriver Service（每个会话一个）；
+        size: 最多同时借出的窗口数，平均分到 browsers 个浏览器；
+        capabilities: 附加会话的能力，如 {'goog:loggingPrefs': {'performance': 'ALL'}}。
+        """
+        self.options_factory = options_factory
+        self.service_factory = service_factory
+        self.size = size
+        self.browsers = browsers
+        self.capabilities = dict(capabilities or {})
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._browser_lock = threading.Lock()   # 启动浏览器较慢，单独加锁，其他线程等它启动后再附加
+        self._browsers: list[_Browser] = []
+        self._created = 0
+        self._closed = False
+        if warm:
+            self.warm()
+
+    def warm(self):
+        """并行打开剩余的窗口，失败的会在借用时重试"""
+        with self._lock:
+            missing = self.size - self._created
+            self._created = self.size
+        threads = [threading.Thread(target=self._spawn, daemon=True) for _ in range(missing)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def _spawn(self):
+        try:
+            self._idle.put(self._open_tab())
+        except Exception as e:
+            print(f"[标签池] 打开窗口失败: {e}")
+            with self._lock:
+                self._created -= 1
+
+    def _pick_browser(self) -> _Browser:
+        """选出窗口最少的浏览器；已退出的浏览器被移除，数量不足 browsers 个时启动新的"""
+        with self._browser_lock:
+            for browser in [b for b in self._browsers if not b.alive()]:
+                print("[标签池] 浏览器已退出，将重新启动。")
+                self._browsers.remove(browser)
+                browser.quit()
+            if len(self._browsers) < self.browsers:
+                browser = _Browser(self.options_factory(), self.service_factory())
+                self._browsers.append(browser)
+            else:
+                browser = min(self._browsers, key=lambda b: b.tabs)
+            browser.tabs += 1
+            return browser
+
+    def _open_tab(self) -> _Tab:
+        browser = self._pick_browser()
+        options = webdriver.ChromeOptions()
+        options.debugger_address = browser.address
+        for name, value in self.capabilities.items():
+            options.set_capability(name, value)
+        driver = None
+        try:
+            driver = webdriver.Chrome(service=self.service_factory(), options=options)
+            driver.switch_to.new_window('window')
+            return _Tab(browser, driver)
+        except Exception:
+            with self._browser_lock:
+                browser.tabs -= 1
+            if driver is not None:
+                driver.quit()
+            raise
+
+    def _acquire(self) -> _Tab:
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if not can_create:
+                try:
+                    return self._idle.get(timeout=1)
+                except queue.Empty:
+                    continue
+            try:
+                return self._open_tab()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    def _discard(self, tab: _Tab):
+        """关闭窗口并断开会话；附加会话退出时不会关闭浏览器"""
+        with self._lock:
+            self._created -= 1
+        with self._browser_lock:
+            tab.browser.tabs -= 1
+        try:
+            tab.driver.switch_to.window(tab.handle)
+            tab.driver.close()
+        except Exception:
+            pass
+        try:
+            tab.driver.quit()
+        except Exception:
+            pass
+
+    def _release(self, tab: _Tab, broken: bool):
+        if not broken and not self._closed:
+            try:
+                # 回到空白页释放页面占用的内存，窗口留给下一个借用者
+                tab.driver.switch_to.window(tab.handle)
+                tab.driver.get("about:blank")
+                self._idle.put(tab)
+                return
+            except WebDriverException:
+                pass
+        self._discard(tab)
+
+    @contextlib.contextmanager
+    def tab(self):
+        """借出一个窗口（已切换到该窗口的 driver），with 块结束后归还；浏览器级异常时该窗口会被重建"""
+        tab = self._acquire()
+        broken = False
+        try:
+            yield tab.driver
+        except WebDriverException as e:
+            broken = not isinstance(e, _PAGE_ERRORS)
+            raise
+        finally:
+            self._release(tab, broken)
+
+    def close(self):
+        """断开空闲窗口的会话并关闭所有浏览器；借出中的窗口归还时丢弃"""
+        self._closed = True
+        while True:
+            try:
+                tab = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(tab)
+        with self._browser_lock:
+            for browser in self._browsers:
+                browser.quit()
+            self._browsers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,244 @@
+"""
+浏览器发现的 XHR 接口：用浏览器学会一次请求格式，之后用共享 HTTP 客户端直接翻页。
+
+原来的做法每页都要让浏览器滚动触发请求，再从性能日志 / selenium-wire 的全部请求里找目标接口，
+并对每个 JSON/HTML 响应调用 Network.getResponseBody。这里分成两步：
+- XhrCapture：只记录 URL 命中 patterns 的请求（selenium-wire 通过 driver.scopes 在代理层就过滤掉其他请求；
+  Chrome 性能日志按 URL 过滤后才取响应体），增量读取，跨多次 poll 拼接同一请求的日志事件；
+- XhrReplayer：从捕获的请求中取 URL、方法、请求头，从浏览器取 Cookie，之后由 http_client 按站点给出的
+  next_url(url, data) 逐页请求。只有回放返回 401/403 时才回到浏览器重新打开页面，更新请求头和 Cookie 后重试一次。
+
+Chrome 性能日志需要在启动时开启：options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})。
+
+用法：
+    capture = XhrCapture(driver, ['api/trpc/image.getInfinite'])
+    replayer = XhrReplayer(driver, capture, page_url=url)
+    if replayer.learn(lambda req: 'cursor%22%3Anull' in req.url):
+        for data in replayer.pages(next_url):
+            handle(data)
+"""
+import base64
+import json
+import re
+import time
+
+from . import http_client
+
+AUTH_STATUS = (401, 403)
+# 不回放的请求头：由 requests 计算的首部、浏览器自动加的连接首部；Cookie 改用浏览器当前的 Cookie
+_SKIP_HEADERS = {'host', 'content-length', 'cookie', 'accept-encoding', 'connection'}
+
+
+def _merge_headers(headers: dict, extra: dict) -> dict:
+    """合并请求头，同名（忽略大小写）时以 extra 为准"""
+    merged = {k: v for k, v in headers.items() if k.lower() not in {e.lower() for e in extra}}
+    merged.update(extra)
+    return merged
+
+
+class CapturedRequest:
+    """一条已完成且 URL 命中的请求"""
+
+    def __init__(self, url, method='GET', headers=None, body=None, status=None, mime_type='', request_id=None):
+        self.url = url
+        self.method = method
+        self.headers = headers or {}
+        self.body = body
+        self.status = status
+        self.mime_type = mime_type
+        self.request_id = request_id
+        self.text = None    # 响应体，poll(with_body=True) 时填充
+
+    def replay_headers(self) -> dict:
+        """可以直接交给 requests 的请求头（去掉 HTTP/2 伪首部和 _SKIP_HEADERS）"""
+        return {k: v for k, v in self.headers.items() if not k.startswith(':') and k.lower() not in _SKIP_HEADERS}
+
+    def json(self):
+        return json.loads(self.text) if self.text else None
+
+
+class XhrCapture:
+    def __init__(self, driver, patterns, mime_types=None, webview=None):
+        """
+        patterns: URL 子串列表，只记录命中其中之一的请求；
+        mime_types: 只保留这些响应类型（如 ('application/json',)），为 None 时不限；
+        webview: 只记录该窗口（window handle）的性能日志，多个会话附加到同一浏览器时传入（见 tab_pool）。
+        driver 为 selenium-wire 时读取 driver.requests，否则读取 Chrome 性能日志。
+        """
+        self.driver = driver
+        self.patterns = tuple(patterns)
+        self.mime_types = tuple(mime_types) if mime_types else None
+        # 旧版 chromedriver 的窗口句柄带 CDwindow- 前缀，日志中的 webview 是不带前缀的 target id
+        self.webview = webview.replace('CDwindow-', '') if webview else None
+        self.wire = hasattr(driver, 'requests') and hasattr(driver, 'scopes')
+        self._pending = {}
+        self._extra = {}
+        self._seen = set()
+        if self.wire:
+            driver.scopes = [re.escape(p) for p in self.patterns]
+
+    def matches(self, url: str) -> bool:
+        return any(p in url for p in self.patterns)
+
+    def poll(self, with_body=False) -> list:
+        """返回上次 poll 之后完成的匹配请求"""
+        done = self._poll_wire(with_body) if self.wire else self._poll_performance_log()
+        if with_body and not self.wire:
+            for req in done:
+                req.text = self._cdp_body(req.request_id)
+        return done
+
+    def wait_for(self, predicate=None, timeout=10.0, with_body=False, interval=0.25):
+        """等待第一条满足 predicate(req) 的请求，超时返回 None"""
+        deadline = time.monotonic() + timeout
+        while True:
+            for req in self.poll(with_body):
+                if predicate is None or predicate(req):
+                    return req
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+
+    def _poll_wire(self, with_body):
+        done = []
+        for request in self.driver.requests:
+            response = request.response
+            if response is None or request.id in self._seen or not self.matches(request.url):
+                continue
+            self._seen.add(request.id)
+            mime_type = (response.headers.get('Content-Type') or '').split(';')[0].strip()
+            if self.mime_types and mime_type not in self.mime_types:
+                continue
+            req = CapturedRequest(request.url, request.method, dict(request.headers.items()), request.body or None,
+                                  response.status_code, mime_type, request.id)
+            if with_body:
+                from seleniumwire.utils import decode
+                body = decode(response.body, response.headers.get('Content-Encoding', 'identity'))
+                req.text = body.decode('utf-8', errors='replace')
+            done.append(req)
+        return done
+
+    def _poll_performance_log(self):
+        done = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                data = json.loads(entry['message'])
+                message = data['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            if self.webview and data.get('webview', self.webview) != self.webview:
+                continue
+            method = message.get('method', '')
+            params = message.get('params') or {}
+            request_id = params.get('requestId')
+            if not request_id or not method.startswith('Network.'):
+                continue
+            if method == 'Network.requestWillBeSent':
+                request = params.get('request') or {}
+                if self.matches(request.get('url', '')):
+                    self._pending[request_id] = CapturedRequest(
+                        request['url'], request.get('method', 'GET'), dict(request.get('headers') or {}),
+                        request.get('postData'), request_id=request_id)
+            elif method == 'Network.requestWillBeSentExtraInfo':
+                # 完整的请求头（含 Cookie、sec-* 等），可能先于 requestWillBeSent 到达
+                self._extra[request_id] = params.get('headers') or {}
+            elif method == 'Network.responseReceived':
+                req = self._pending.get(request_id)
+                if req is not None:
+                    response = params.get('response') or {}
+                    req.status = response.get('status')
+                    req.mime_type = response.get('mimeType', '')
+            elif method in ('Network.loadingFinished', 'Network.loadingFailed'):
+                extra = self._extra.pop(request_id, None)
+                req = self._pending.pop(request_id, None)
+                if req is None or method == 'Network.loadingFailed':
+                    continue
+                if extra:
+                    req.headers = _merge_headers(req.headers, extra)
+                if self.mime_types and req.mime_type not in self.mime_types:
+                    continue
+                done.append(req)
+        return done
+
+    def _cdp_body(self, request_id):
+        try:
+            response = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception:
+            return ''
+        body = response.get('body', '')
+        if response.get('base64Encoded'):
+            return base64.b64decode(body).decode('utf-8', errors='ignore')
+        return body
+
+
+class XhrReplayer:
+    def __init__(self, driver, capture: XhrCapture, page_url=None, timeout=30, proxies=None):
+        """
+        page_url: 触发该接口的页面，回放被拒绝（401/403）时重新打开它；为 None 时刷新当前页；
+        proxies: 回放请求使用的代理（requests 格式），浏览器走代理时传入同一个代理，
+        否则回放请求从另一个出口 IP 发出，Cookie 和 IP 不一致会被站点拒绝。
+        """
+        self.driver = driver
+        self.capture = capture
+        self.page_url = page_url
+        self.timeout = timeout
+        self.proxies = proxies
+        self.template = None
+        self.headers = {}
+        self.cookies = {}
+        self.relearned = 0
+
+    def learn(self, predicate=None, timeout=20.0):
+        """等待浏览器发出一条满足 predicate 的请求，记下它作为回放模板并同步 Cookie"""
+        req = self.capture.wait_for(predicate, timeout)
+        if req is not None:
+            self.template = req
+            self.headers = req.replay_headers()
+            self.sync_cookies()
+        return req
+
+    def sync_cookies(self):
+        self.cookies = {c['name']: c['value'] for c in self.driver.get_cookies()}
+
+    def relearn(self, timeout=20.0):
+        """回到浏览器重新打开页面，用新捕获的请求头和浏览器 Cookie 替换旧的（URL 模板不变）"""
+        self.relearned += 1
+        print(f"[XHR 回放] 接口拒绝访问，回到浏览器刷新请求头和 Cookie（第 {self.relearned} 次）")
+        if self.page_url:
+            self.driver.get(self.page_url)
+        else:
+            self.driver.refresh()
+        req = self.capture.wait_for(None, timeout)
+        if req is not None:
+            self.headers = req.replay_headers()
+        self.sync_cookies()
+
+    def fetch(self, url, data=None, method=None, **kwargs):
+        """用学到的请求头和 Cookie 请求；401/403 时刷新一次后重试"""
+        method = method or (self.template.method if self.template else 'GET')
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('proxies', self.proxies)
+        for attempt in range(2):
+            resp = http_client.request(method, url, headers=self.headers, cookies=self.cookies, data=data, **kwargs)
+            if resp.status_code not in AUTH_STATUS or attempt:
+                return resp
+            self.relearn()
+        return resp
+
+    def pages(self, next_url, max_pages=None):
+        """
+        从模板请求开始逐页回放，产出每页解析后的 JSON。
+        next_url(url, data) 返回下一页 URL（POST 接口返回 (url, body)），为空时结束。
+        """
+        if self.template is None:
+            raise RuntimeError("尚未捕获到模板请求，请先调用 learn()")
+        url, body = self.template.url, self.template.body
+        count = 0
+        while url and (max_pages is None or count < max_pages):
+            resp = self.fetch(url, data=body)
+            resp.raise_for_status()
+            data = resp.json()
+            yield data
+            count += 1
+            following = next_url(url, data)
+            url, body = following if isinstance(following, tuple) else (following, body)
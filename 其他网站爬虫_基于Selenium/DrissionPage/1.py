@@ -11,10 +11,12 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import random 
 import re 
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
 
 # ----------------------------------------------------------------------
 # 配置项
@@ -70,7 +72,7 @@ class nylon:
             
         self.redis_key = 'image_md5_set_nylon'
         # 用于 CSV 写入的线程锁
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='nylon')
         
         # 用于同一次会话去重
         self.processed_elements_md5 = set() 
@@ -145,21 +147,9 @@ class nylon:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                file_exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
-                
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
-    
     def crawl_page(self, start_url, tag, csv_path):
         """
         核心爬取逻辑：分段滚动页面并解析新加载的图片元素。
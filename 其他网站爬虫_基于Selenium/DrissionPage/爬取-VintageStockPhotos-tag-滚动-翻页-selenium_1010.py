@@ -5,7 +5,18 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
-import os, time, hashlib, redis, csv, threading, random, re, urllib.parse
+import os, time, hashlib, redis, random, re, urllib.parse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.dom_extract import extract_cards
+
+# 卡片字段（一次 execute_script 提取）：缩略图地址和包含标题的 onmouseover 属性
+CARD_FIELDS = {
+    'src': (('a.image img', 'src'),),
+    'onmouseover': (('a.image img', 'onmouseover'),),
+}
 
 
 class VintageStockPhotos:
@@ -21,7 +32,7 @@ class VintageStockPhotos:
         self.driver = webdriver.Chrome(service=service, options=options)
 
         self.base_url = 'https://vintagestockphotos.com/'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'Tag'], site='vintagestockphotos')
         self.redis_key = 'image_md5_set_vintagestockphotos'
 
         try:
@@ -55,14 +66,16 @@ class VintageStockPhotos:
             last_count = len(image_elements)
             time.sleep(random.uniform(1.5, 2.5))
 
-        print(f"📸 共检测到 {len(image_elements)} 张图片。")
+        cards = extract_cards(self.driver, 'div.flex-images22 div.item', CARD_FIELDS)
+        print(f"📸 共检测到 {len(cards)} 张图片。")
         
-        # 遍历图片元素，提取信息
-        for card_ele in image_elements:
+        # 遍历卡片字段，提取信息
+        for card in cards:
             try:
-                img_ele = card_ele.find_element(By.CSS_SELECTOR, 'a.image img')
-                image_url = img_ele.get_attribute('src') or ""
-                mouse_attr = img_ele.get_attribute('onmouseover') or ""
+                image_url = card['src']
+                mouse_attr = card['onmouseover']
+                if not image_url:
+                    continue
 
                 # --- 从 onmouseover 中提取标题 ---
                 match = re.search(r"trailOn\('[^']*','([^']*)'", mouse_attr)
@@ -98,16 +111,8 @@ class VintageStockPhotos:
 
     # ---------------------- 写入 CSV ----------------------
     def write_to_csv(self, title, name, url, csv_path, tag):
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'Tag'])
-                    writer.writerow([title, name, url, tag])
-            print(f"💾 写入成功: {name}")
-        except Exception as e:
-            print(f"[✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f"💾 已加入写入队列: {name}")
 
     # ---------------------- 翻页逻辑 ----------------------
     def crawl_page(self, tag, csv_path):
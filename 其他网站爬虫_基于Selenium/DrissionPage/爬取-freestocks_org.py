@@ -9,10 +9,19 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import random
 import re  # 导入 re 模块用于 URL 清理
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.dom_extract import extract_cards
+
+# 卡片字段（一次 execute_script 提取）：<a> 的 title 属性和内部 img 的地址
+CARD_FIELDS = {
+    'title': (('a', 'title'),),
+    'src': (('a img', 'src'),),
+}
 
 class freestocks:
     def __init__(self, chrome_driver_path):
@@ -44,7 +53,7 @@ class freestocks:
         )
         self.redis_key = 'image_md5_set_freestocks'
         # 写入 CSV 的线程锁
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='freestocks')
 
     def get_images(self, tag, csv_path):
         """解析当前页面上的图片信息，处理滚动加载并存储 URL 和标题"""
@@ -92,23 +101,15 @@ class freestocks:
             last_count = current_count
             time.sleep(random.uniform(2.0, 4.0))
 
-        image_elements = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-        print(f"找到 {len(image_elements)} 个图片卡片进行解析。")
+        cards = extract_cards(self.driver, image_card_selector, CARD_FIELDS)
+        print(f"找到 {len(cards)} 个图片卡片进行解析。")
         
-        # 步骤 3: 解析图片信息
-        for card_ele in image_elements: 
+        # 步骤 3: 解析图片信息（字段已在浏览器内一次取回）
+        for card in cards: 
             try:
-                # 查找包含标题和图片的 <a> 标签
-                a_element = card_ele.find_element(By.TAG_NAME, 'a')
-                
-                # 从 <a> 标签中提取标题 (title 属性)
-                title = a_element.get_attribute('title') 
-                
-                # 在 <a> 标签内部查找 img 元素
-                img_element = a_element.find_element(By.TAG_NAME, 'img')
-                
-                # 从 img 元素的 src 属性中提取 URL
-                image_url = img_element.get_attribute('src')
+                # 从 <a> 标签中提取标题 (title 属性)，从 img 元素的 src 属性中提取 URL
+                title = card['title']
+                image_url = card['src']
                 
                 # 清理 URL: 使用正则表达式去除 "-数字x数字." 部分
                 # 例如：将 "-1024x683.jpg" 替换为 ".jpg"
@@ -131,17 +132,8 @@ class freestocks:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
     def crawl_page(self, tag, csv_path):
         """按页爬取，处理翻页逻辑和页面稳定性，使用 JavaScript 点击避免遮挡问题。"""
@@ -9,12 +9,23 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import random
 import re
 import urllib.parse
 from urllib.parse import urlparse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.dom_extract import extract_cards
+
+# 卡片字段（一次 execute_script 提取）：标题、缩略图地址、alt（含图像 ID）、标签列表
+CARD_FIELDS = {
+    'title': (('a.photoList__link h3.photoList__title', 'text'),),
+    'src': (('a.photoList__link img', 'src'),),
+    'alt': (('a.photoList__link img', 'alt'),),
+    'tags': (('ul.tagList li a', 'text', True),),
+}
 
 
 class girlydrop:
@@ -30,7 +41,7 @@ class girlydrop:
         self.driver = webdriver.Chrome(service=service, options=options)
 
         self.base_url = 'https://girlydrop.com/'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'Tag'], site='girlydrop')
 
         # Redis 初始化
         try:
@@ -74,17 +85,15 @@ class girlydrop:
             last_count = current_count
             time.sleep(random.uniform(1.5, 2.5))
 
-        # ✅ 遍历每个 <li.photoList__item>
-        for card_ele in self.driver.find_elements(By.CSS_SELECTOR, image_item_selector):
+        # ✅ 一次取回所有 <li.photoList__item> 的字段
+        for card in extract_cards(self.driver, image_item_selector, CARD_FIELDS):
             try:
                 # 获取主要信息
-                a_ele = card_ele.find_element(By.CSS_SELECTOR, 'a.photoList__link')
-                img_ele = a_ele.find_element(By.TAG_NAME, 'img')
-                title_ele = a_ele.find_element(By.CSS_SELECTOR, 'h3.photoList__title')
-
-                title = title_ele.text.strip()
-                image_url = img_ele.get_attribute('src')
-                alt_text = img_ele.get_attribute('alt') or ""
+                title = card['title']
+                image_url = card['src']
+                alt_text = card['alt']
+                if not image_url:
+                    continue
 
                 # 提取图像 ID
                 match = re.search(r'ID:(\d+)', alt_text)
@@ -95,8 +104,7 @@ class girlydrop:
                     image_url_cleaned = image_url
 
                 # 提取标签列表
-                tag_list_ele = card_ele.find_elements(By.CSS_SELECTOR, 'ul.tagList li a')
-                tag_texts = [t.text.strip() for t in tag_list_ele]
+                tag_texts = card['tags']
                 tags_joined = "、".join(tag_texts) if tag_texts else ""
 
                 # 生成唯一哈希用于去重
@@ -129,16 +137,8 @@ class girlydrop:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """写入 CSV"""
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'Tag'])
-                    writer.writerow([title, name, url, tag])
-            print(f"✔️ 写入成功: {name}")
-        except Exception as e:
-            print(f"[✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f"✔️ 已加入写入队列: {name}")
 
 
     def crawl_page(self, tag, csv_path):
@@ -8,9 +8,18 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import random
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.dom_extract import extract_cards
+
+# 卡片字段（一次 execute_script 提取）：<a> 上的标题和内部 img 的地址
+CARD_FIELDS = {
+    'title': (('', 'phx-value-title'),),
+    'src': (('img', 'src'),),
+}
 
 class nappy:
     def __init__(self, chrome_driver_path):
@@ -38,7 +47,7 @@ class nappy:
             decode_responses=True
         )
         self.redis_key = 'image_md5_set_nappy'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='nappy')
 
     def get_images(self, tag, csv_path):
         """解析按标签搜索出现的页面上的图片信息并存储 URL 和标题"""
@@ -76,19 +85,14 @@ class nappy:
             last_count = current_count
             time.sleep(random.uniform(2.0, 4.0))
 
-        image_elements = self.driver.find_elements(By.CSS_SELECTOR, image_card_selector)
-        print(f"找到 {len(image_elements)} 个图片卡片。")
+        cards = extract_cards(self.driver, image_card_selector, CARD_FIELDS)
+        print(f"找到 {len(cards)} 个图片卡片。")
         
-        for img_ele in image_elements:
+        for card in cards:
             try:
-                # 直接从 <a> 标签中提取标题
-                title = img_ele.get_attribute('phx-value-title')
-                
-                # 在 <a> 标签内部查找 img 元素
-                img_element = img_ele.find_element(By.TAG_NAME, 'img')
-                
-                # 从 img 元素的 src 属性中提取 URL
-                image_url = img_element.get_attribute('src')
+                # 直接从 <a> 标签中提取标题，从内部 img 元素的 src 属性中提取 URL
+                title = card['title']
+                image_url = card['src']
                 
                 # 清理 URL，去除查询参数以获取原图链接
                 image_url_cleaned = image_url.split('?')[0]
@@ -110,17 +114,8 @@ class nappy:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
     def crawl_page(self, tag, csv_path):
         """按页爬取"""
@@ -11,9 +11,11 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import random 
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
 
 # ----------------------------------------------------------------------
 # 配置项
@@ -62,7 +64,7 @@ class numero:
             
         self.redis_key = 'image_md5_set_numero'
         # 用于 CSV 写入的线程锁
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='numero')
 
 
     def get_images(self, tag, csv_path, image_elements_to_process):
@@ -115,22 +117,9 @@ class numero:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                # 检查文件是否存在，决定是否写入表头
-                file_exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
-                
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
-    
     def crawl_page(self, start_url, tag, csv_path):
         """
         核心爬取逻辑：导航、初始解析、循环点击“更多”、等待、精确滚动和分段解析。
@@ -5,7 +5,11 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
-import os, time, hashlib, redis, csv, threading, random, re, urllib.parse
+import os, time, hashlib, redis, random, re, urllib.parse
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
 
 
 class PixnioSpider:
@@ -19,7 +23,7 @@ class PixnioSpider:
         self.driver = webdriver.Chrome(service=service, options=options)
 
         self.base_url = 'https://pixnio.com/'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', 'Tag'], site='pixnio')
         self.redis_key = 'image_md5_set_pixnio'
 
         try:
@@ -112,16 +116,8 @@ class PixnioSpider:
 
     # ---------------------- 写入 CSV ----------------------
     def write_to_csv(self, title, name, url, csv_path, tag):
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', 'Tag'])
-                    writer.writerow([title, name, url, tag])
-            print(f"💾 写入成功: {name}")
-        except Exception as e:
-            print(f"[✗] 写入 CSV 出错: {e}")
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f"💾 已加入写入队列: {name}")
 
     # ---------------------- 翻页逻辑 ----------------------
     def crawl_page(self, tag, csv_path):
@@ -200,10 +200,12 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 import json
 import random
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
 
 class Theinspirationgrid:
     def __init__(self, chrome_driver_path):
@@ -232,7 +234,7 @@ class Theinspirationgrid:
             decode_responses=True
         )
         self.redis_key = 'image_md5_set_Theinspirationgrid'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='theinspirationgrid')
 
     def get_images(self, tag, csv_path):
         """解析按标签搜索出现的页面上的图片信息并存储 URL 和标题"""
@@ -317,17 +319,8 @@ class Theinspirationgrid:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
     def crawl_page(self, tag, csv_path):
         """按页爬取"""
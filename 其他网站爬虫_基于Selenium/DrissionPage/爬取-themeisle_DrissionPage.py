@@ -3,9 +3,11 @@ import os
 import time
 import hashlib
 import redis
-import csv
-import threading
 from typing import List
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
 
 class themeisle:
     def __init__(self, port=9527, max_workers=12):
@@ -19,7 +21,7 @@ class themeisle:
             decode_responses=True
         )
         self.redis_key = 'image_md5_set_themeisle'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='themeisle')
         
     def url(self, tag):
         """
@@ -66,17 +68,8 @@ class themeisle:
 
     def write_to_csv(self, title, name, url, csv_path):
         """将图片信息写入 CSV 文件"""
-        try:
-            with self.csv_lock:
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if f.tell() == 0:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow(['', name, url, title])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, ['', name, url, title])
+        print(f'[√] 已加入写入队列：{name}')
 
     def crawl_page(self, url, tag, csv_path):
         tab = self.browser.new_tab()
@@ -279,13 +279,14 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 from redis.exceptions import ConnectionError as RedisConnectionError
 
 import os
-import time
 import hashlib
 import redis
-import csv
-import threading
-import random
 import re 
+import sys
+# 共享模块位于仓库根目录的 spider_common 包
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from spider_common.csv_sink import open_record_sink
+from spider_common.scroll_loader import ScrollLoader
 
 # ----------------------------------------------------------------------
 # 配置项
@@ -296,9 +297,8 @@ TAG_NAME = 'wmagazine_Homepage_Data'
 CHROME_DRIVER_PATH = r'C:\Program Files\Google\1\chromedriver-win32\chromedriver.exe'
 
 # 滚动优化配置
-SCROLL_PAUSE_TIME = 2.0      # 每次滚动周期结束后等待新内容加载的时间（秒）
-SCROLL_STEPS = 5             # 在两次检查元素之间，执行的小幅度滚动次数
-SMALL_SCROLL_AMOUNT = 200    # 每次小滚动移动的像素距离
+SCROLL_STEP = 1000           # 每轮滚动的像素距离
+QUIET_PERIOD = 2.0           # 没有新卡片时，DOM 安静且无在途请求多少秒视为本轮结束
 MAX_SCROLLS = 100            # 最大滚动检查次数，防止无限循环
 # ----------------------------------------------------------------------
 
@@ -347,7 +347,7 @@ class wmagazine:
             raise
 
         self.redis_key = 'image_md5_set_wmagazine'
-        self.csv_lock = threading.Lock()
+        self.csv_sink = open_record_sink(['Title', 'ImageName', 'URL', "TAG"], site='wmagazine')
         
     def _clean_url(self, url):
         """
@@ -410,22 +410,9 @@ class wmagazine:
 
     def write_to_csv(self, title, name, url, csv_path, tag):
         """将图片信息写入 CSV 文件，确保线程安全。"""
-        try:
-            with self.csv_lock:
-                # 检查文件是否存在，决定是否写入表头
-                file_exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
-                
-                with open(csv_path, 'a', newline='', encoding='utf-8-sig') as f:
-                    writer = csv.writer(f)
-                    if not file_exists:
-                        writer.writerow(['Title', 'ImageName', 'URL', "TAG"])
-                    writer.writerow([title, name, url, tag])
-                    f.flush()
-            print(f'[√] 写入成功：{name}')
-        except Exception as e:
-            print(f'[✗] 写入 CSV 异常：{name} -> {e}')
+        self.csv_sink.write(csv_path, [title, name, url, tag])
+        print(f'[√] 已加入写入队列：{name}')
 
-    
     def crawl_page(self, start_url, tag, csv_path):
         """
         核心爬取逻辑：导航、初始解析、基于多次小幅度滚动的增量加载和分段解析。
@@ -448,70 +435,17 @@ class wmagazine:
             print(f"[✗] 初始加载失败: {e}")
             return False
 
-        processed_count = 0
-        scroll_cycle_count = 0
-        
-        # 获取顶级内容容器，后续所有搜索都将在这个容器内进行
-        try:
-            main_content_element = self.driver.find_element(By.CSS_SELECTOR, main_content_selector)
-        except NoSuchElementException:
-            print(f"[致命错误] 未找到顶级内容容器: {main_content_selector}。程序退出。")
-            return False
-
-        while scroll_cycle_count < MAX_SCROLLS:
-            print(f"\n==== 开始第 {scroll_cycle_count + 1} 轮滚动周期和解析 ====")
-            
-            # 1. 检查和增量解析 (分段存储点：在顶级容器内搜索所有卡片)
-            # 使用修正后的选择器查找所有包含 I2g 的卡片
-            all_elements = main_content_element.find_elements(By.CSS_SELECTOR, image_card_selector)
-            current_count = len(all_elements)
+        # 新卡片插入且 DOM 安静后立即解析并继续滚动；连续 2 轮无新卡片且到底部（或滚动条不再移动）时结束
+        loader = ScrollLoader(self.driver, f'{main_content_selector} {image_card_selector}', step=SCROLL_STEP,
+                              quiet_period=QUIET_PERIOD, max_rounds=MAX_SCROLLS)
+        for new_elements_to_process in loader.rounds():
+            print(f"\n==== 第 {loader.rounds_done} 轮滚动，新增 {len(new_elements_to_process)} 个图片卡片（共 {loader.total} 个） ====")
+            self.get_images(tag, csv_path, new_elements_to_process)
 
-            print(f"[INFO] 检查前，当前共有 {current_count} 个图片卡片，已处理 {processed_count} 个。")
-            
-            if current_count > processed_count:
-                # [存储数据]：发现新内容，立即进行解析和存储
-                print("[√] 新内容加载完成，正在进行增量解析和存储...")
-                new_elements_to_process = all_elements[processed_count:]
-                self.get_images(tag, csv_path, new_elements_to_process)
-                processed_count = current_count
-                
-                # 确保最后一个元素进入视图，准备滚动
-                last_element = all_elements[-1]
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", last_element)
-                time.sleep(SCROLL_PAUSE_TIME)
-            
-            # 2. 执行平滑、多次的小幅度滚动
-            scroll_before = self.driver.execute_script("return window.scrollY")
-            
-            print(f"[INFO] 执行 {SCROLL_STEPS} 次小幅度滚动以触发下一批增量加载...")
-            for step in range(SCROLL_STEPS):
-                # 每次滚动 SMALL_SCROLL_AMOUNT 像素
-                self.driver.execute_script(f"window.scrollBy(0, {SMALL_SCROLL_AMOUNT});")
-                # 小等待，模拟用户平滑滚动
-                time.sleep(0.5 + random.uniform(0.1, 0.5)) 
-            
-            scroll_after = self.driver.execute_script("return window.scrollY")
-            time.sleep(SCROLL_PAUSE_TIME) # 滚动结束后大等待，让新内容有时间加载
-
-            # 3. 检查是否到达页面底部 
-            final_elements = main_content_element.find_elements(By.CSS_SELECTOR, image_card_selector)
-            final_count = len(final_elements)
-            
-            if final_count == processed_count:
-                # 如果元素数量没有增加
-                if scroll_after <= scroll_before:
-                    # 且滚动条没有移动（或移动极少），说明已达底部
-                    print(f"[完成] 滚动条已达底部，且未发现新内容。已爬取到最后一页 (共 {final_count} 个卡片)。")
-                    break
-                else:
-                    # 滚动条移动了，但元素数量没变，继续下一轮尝试
-                    print("[INFO] 滚动条移动了，但元素数量未增加。继续下一轮尝试。")
-            
-            scroll_cycle_count += 1
-            
-            if scroll_cycle_count >= MAX_SCROLLS:
-                print(f"[警告] 已达到最大滚动次数 {MAX_SCROLLS}，停止爬取。")
-                break
+        if loader.rounds_done >= MAX_SCROLLS:
+            print(f"[警告] 已达到最大滚动次数 {MAX_SCROLLS}，停止爬取。")
+        else:
+            print(f"[完成] 滚动条已达底部，且未发现新内容。已爬取到最后一页 (共 {loader.total} 个卡片)。")
                 
         return True
 